@@ -0,0 +1,164 @@
+from flask import session
+
+import authorization_check
+from authorization_check import invalidate_user_rights, is_authorised
+from app import create_app
+from models import *
+from Tests.utils import count_queries
+
+app = create_app(start_services=False)
+
+def add_authorization_data(test_db):
+    """
+    an organization with an inventory admin, a physical object and an order
+    """
+    organization = Organization(name = "Authorization Organization", location = "Magdeburg")
+    user = User(first_name = "Authorization", last_name = "Tester", email = "authorization@ovgu.de", password_hash = "-")
+    organization.add_user(user, userRights.inventory_admin)
+    physical_object = PhysicalObject(   inv_num_internal = 1,
+                                        inv_num_external = 1,
+                                        deposit = 0,
+                                        storage_location = "Shelf",
+                                        name = "Authorization Object",
+                                        organization = organization)
+    test_db.add(physical_object)
+    test_db.commit()
+    return user.user_id, organization.organization_id, physical_object.phys_id
+
+#
+#  Test that the rights of a user are loaded once per request
+#
+def test_authorization_cache(client, test_db):
+    user_id, organization_id, phys_id = add_authorization_data(test_db)
+
+    with app.test_request_context():
+        session['user_id'] = user_id
+        with count_queries(test_db.get_bind()) as counter:
+            for _ in range(50):
+                assert(is_authorised(userRights.inventory_admin, user_id, organization_id = organization_id))
+                assert(not is_authorised(userRights.organization_admin, user_id, organization_id = organization_id))
+
+        msg = "Rights are not cached for the request"
+        assert(counter.count == 1), msg
+
+        with count_queries(test_db.get_bind()) as counter:
+            for _ in range(50):
+                assert(is_authorised(userRights.member, user_id, phys_id = phys_id))
+
+        msg = "Rights are loaded again for physical objects"
+        # only the organization of the physical object is looked up
+        assert(counter.count == 50), msg
+
+        # rights change inside of the request
+        test_db.query(Organization_User).filter(Organization_User.user_id == user_id).one().rights = userRights.organization_admin
+        test_db.commit()
+        invalidate_user_rights(user_id)
+        msg = "Changed rights are not used after invalidation"
+        assert(is_authorised(userRights.organization_admin, user_id, organization_id = organization_id)), msg
+
+    # every request loads the rights again without the ttl cache
+    for _ in range(2):
+        with app.test_request_context():
+            with count_queries(test_db.get_bind()) as counter:
+                is_authorised(userRights.member, user_id, organization_id = organization_id)
+            assert(counter.count == 1), "Rights are shared between requests"
+
+    # with the ttl cache the rights are reused by the next request
+    authorization_check.authorization_cache_ttl = 60
+    try:
+        counts = []
+        for _ in range(2):
+            with app.test_request_context():
+                with count_queries(test_db.get_bind()) as counter:
+                    is_authorised(userRights.member, user_id, organization_id = organization_id)
+                counts.append(counter.count)
+        assert(counts == [1, 0]), "Rights are not cached across requests"
+    finally:
+        authorization_check.authorization_cache_ttl = 0
+        invalidate_user_rights()
+
+def add_tagged_objects(test_db, prefix, organizations, count):
+    """
+    adds a tag and a group with count physical objects, spread over the given organizations
+    """
+    tag = Tag(name = prefix + " Tag")
+    group = Group(name = prefix + " Group", organization = organizations[0])
+    for i in range(count):
+        physical_object = PhysicalObject(   inv_num_internal = i,
+                                            inv_num_external = i,
+                                            deposit = 0,
+                                            storage_location = "Shelf",
+                                            name = prefix + " Object " + str(i),
+                                            organization = organizations[i % len(organizations)])
+        physical_object.tags.append(tag)
+        group.physicalobjects.append(physical_object)
+    test_db.add(group)
+    test_db.commit()
+    return tag.tag_id, group.group_id
+
+def counted_authorization(test_db, required_rights, user_id, **kwargs):
+    # new request, so the rights of the user are loaded again
+    with app.test_request_context():
+        with count_queries(test_db.get_bind()) as counter:
+            authorised = is_authorised(required_rights, user_id, **kwargs)
+    return authorised, counter.count
+
+#
+#  Test that tag and group checks run with a constant number of queries
+#
+def test_tag_group_authorization(client, test_db):
+    user = User(first_name = "Tag", last_name = "Admin", email = "tagadmin@ovgu.de", password_hash = "-")
+    organizations = [Organization(name = "Tag Organization " + str(i), location = "Magdeburg") for i in range(3)]
+    for organization in organizations[:2]:
+        organization.add_user(user, userRights.inventory_admin)
+    organizations[2].add_user(user, userRights.member)
+    test_db.add_all(organizations)
+    test_db.commit()
+    user_id = user.user_id
+
+    small_tag, small_group = add_tagged_objects(test_db, "small", organizations[:2], 2)
+    large_tag, large_group = add_tagged_objects(test_db, "large", organizations[:2], 300)
+    mixed_tag, mixed_group = add_tagged_objects(test_db, "mixed", organizations, 300)
+
+    results = {}
+    for name, kwargs in [   ("small tag", dict(tag_id = small_tag)),
+                            ("large tag", dict(tag_id = large_tag)),
+                            ("mixed tag", dict(tag_id = mixed_tag)),
+                            ("small group", dict(group_id = small_group)),
+                            ("large group", dict(group_id = large_group)),
+                            ("mixed group", dict(group_id = mixed_group))]:
+        results[name] = counted_authorization(test_db, userRights.inventory_admin, user_id, **kwargs)
+
+    msg = "Tag and group authorization is wrong"
+    assert(results["small tag"][0] and results["large tag"][0]), msg
+    assert(results["small group"][0] and results["large group"][0]), msg
+    assert(not results["mixed tag"][0] and not results["mixed group"][0]), msg
+
+    msg = "Tag and group authorization does not run with a constant number of queries"
+    # one query for the rights of the user, one for the objects of the tag or group
+    assert(set(count for _, count in results.values()) == {2}), msg + ": " + str(results)
+
+#
+#  Test that only system admins can read the metrics
+#
+def test_metrics_authorization(client, test_db):
+    user_id, organization_id, phys_id = add_authorization_data(test_db)
+    root_organization = Organization(name = "Metrics Root", location = "application")
+    admin = User(first_name = "Metrics", last_name = "Admin", email = "metrics@ovgu.de", password_hash = "-")
+    root_organization.add_user(admin, userRights.system_admin)
+    test_db.add(root_organization)
+    test_db.commit()
+    admin_id = admin.user_id
+
+    def status_code(session_user_id):
+        with app.test_request_context('/metrics'):
+            if session_user_id:
+                session['user_id'] = session_user_id
+            response = app.make_response(app.view_functions['metrics']())
+            invalidate_user_rights()
+            return response.status_code
+
+    msg = "Metrics can be read without the rights of a system admin"
+    assert(status_code(None) == 419), msg
+    assert(status_code(user_id) == 403), msg
+    assert(status_code(admin_id) == 200), "System admin can't read the metrics"
@@ -0,0 +1,104 @@
+from datetime import date, datetime
+
+from availability import availability, is_available, unavailable_objects
+from models import *
+from Tests.utils import count_queries
+
+def add_borrowed_objects(test_db):
+    """
+    three objects, the first is borrowed from 10th to 12th of may,
+    the second has a rejected order in the same time and the third is never borrowed
+    """
+    organization = Organization(name = "Availability Organization", location = "Magdeburg")
+    physical_objects = []
+    for i in range(3):
+        physical_object = PhysicalObject(   phys_id = "00000000-0000-0000-0000-00000000010" + str(i),
+                                            inv_num_internal = i,
+                                            inv_num_external = i,
+                                            deposit = 0,
+                                            storage_location = "Shelf",
+                                            name = "Available " + str(i),
+                                            organization = organization)
+        physical_objects.append(physical_object)
+        test_db.add(physical_object)
+
+    borrowed = Order(   creation_date = datetime(2024, 5, 1),
+                        from_date = datetime(2024, 5, 10, 10),
+                        till_date = datetime(2024, 5, 12, 16),
+                        organization = organization)
+    borrowed.addPhysicalObject(physical_objects[0], orderStatus.accepted)
+
+    rejected = Order(   creation_date = datetime(2024, 5, 1),
+                        from_date = datetime(2024, 5, 10, 10),
+                        till_date = datetime(2024, 5, 12, 16),
+                        organization = organization)
+    rejected.addPhysicalObject(physical_objects[1], orderStatus.rejected)
+
+    test_db.add(borrowed)
+    test_db.add(rejected)
+    test_db.commit()
+    return [physical_object.phys_id for physical_object in physical_objects]
+
+#
+#  Test the availability engine
+#
+def test_availability(client, test_db):
+    borrowed, rejected, free = add_borrowed_objects(test_db)
+
+    msg = "Single availability check failed"
+    assert(not is_available(borrowed, date(2024, 5, 12), date(2024, 5, 20))), msg
+    assert(not is_available(borrowed, date(2024, 5, 1), date(2024, 5, 10))), msg
+    assert(is_available(borrowed, date(2024, 5, 13), date(2024, 5, 20))), msg
+    assert(is_available(borrowed, date(2024, 5, 1), date(2024, 5, 9))), msg
+    assert(is_available(rejected, date(2024, 5, 10), date(2024, 5, 12))), msg
+
+    msg = "Exact times are not respected"
+    assert(is_available(borrowed, datetime(2024, 5, 12, 16), datetime(2024, 5, 13))), msg
+    assert(not is_available(borrowed, datetime(2024, 5, 12, 15), datetime(2024, 5, 13))), msg
+
+    msg = "Set based availability check failed"
+    assert(unavailable_objects([borrowed, rejected, free], date(2024, 5, 11), date(2024, 5, 11)) == {borrowed}), msg
+
+    ranges = [(date(2024, 5, 1), date(2024, 5, 9)), (date(2024, 5, 11), date(2024, 5, 11)), (date(2024, 5, 12), date(2024, 6, 1))]
+    with count_queries(test_db.get_bind()) as counter:
+        result = availability([borrowed, rejected, free], ranges)
+
+    msg = "Availability for many objects and ranges failed"
+    assert(counter.count == 1), msg
+    assert(result == {
+        (borrowed, 0): True, (borrowed, 1): False, (borrowed, 2): False,
+        (rejected, 0): True, (rejected, 1): True, (rejected, 2): True,
+        (free, 0): True, (free, 1): True, (free, 2): True,
+    }), msg
+
+#
+#  Test the occupancy calendar of an organization
+#
+def test_availability_calendar(client, test_db):
+    borrowed, rejected, free = add_borrowed_objects(test_db)
+    organization_id = test_db.query(PhysicalObject).filter(PhysicalObject.phys_id == borrowed).one().organization_id
+    test_db.expire_all()
+
+    with count_queries(test_db.get_bind()) as counter:
+        executed = client.execute('''
+        query{
+            availabilityCalendar(organizationId: "''' + organization_id + '''", startDate: "2024-05-08", endDate: "2024-05-14"){
+                days
+                physicalObjects{
+                    physId
+                    occupancy
+                }
+            }
+        }''')
+
+    msg = "Occupancy calendar is wrong"
+    assert('errors' not in executed), executed
+    calendar = executed['data']['availabilityCalendar']
+    assert(calendar['days'] == 7), msg
+    assert(calendar['physicalObjects'] == [
+        {'physId': borrowed, 'occupancy': "0011100"},
+        {'physId': rejected, 'occupancy': "0000000"},
+        {'physId': free, 'occupancy': "0000000"},
+    ]), msg
+    # one statement for the objects and one for the orders
+    assert(counter.count == 2), msg
@@ -0,0 +1,149 @@
+from datetime import datetime
+
+from models import *
+from Tests.fragments import *
+from Tests.utils import count_queries
+
+fragment_physicalobject_relations = '''
+    fragment physicalobject on PhysicalObject{
+        name
+        pictures{
+            edges{
+                node{
+                    path
+                }
+            }
+        }
+        tags{
+            edges{
+                node{
+                    name
+                }
+            }
+        }
+        groups{
+            edges{
+                node{
+                    name
+                }
+            }
+        }
+        organization{
+            name
+        }
+        orders{
+            edges{
+                node{
+                    orderStatus
+                    order{
+                        users{
+                            edges{
+                                node{
+                                    email
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        }
+    }'''
+
+filter_queries = [
+    ('filterPhysicalObjects', 'physicalobject', fragment_physicalobject_relations),
+    ('filterTags', 'tag', fragment_tag),
+    ('filterOrders', 'order', fragment_order),
+    ('filterUsers', 'user', fragment_user),
+    ('filterGroups', 'group', fragment_group),
+    ('filterOrganizations', 'organization', fragment_organization),
+]
+
+def add_lending_data(test_db, prefix, count):
+    """
+    adds count physical objects with pictures, tags, groups and orders to a new organization
+    """
+    organization = Organization(name = prefix + " Organization", location = "Magdeburg")
+    tag = Tag(name = prefix + " Tag")
+    group = Group(name = prefix + " Group", organization = organization)
+    user = User(first_name = prefix, last_name = "Tester", email = prefix + "@ovgu.de", password_hash = "-")
+    organization.add_user(user)
+
+    for i in range(count):
+        physical_object = PhysicalObject(   inv_num_internal = i,
+                                            inv_num_external = i,
+                                            deposit = 0,
+                                            storage_location = "Shelf " + str(i),
+                                            name = prefix + " Object " + str(i),
+                                            organization = organization)
+        physical_object.tags.append(tag)
+        physical_object.pictures.append(File(file_id = str(uuid.uuid4()), path = prefix + str(i) + ".jpg", file_type = "picture"))
+        group.physicalobjects.append(physical_object)
+
+        order = Order(  creation_date = datetime(2024, 1, 1),
+                        from_date = datetime(2024, 1, 2),
+                        till_date = datetime(2024, 1, 3),
+                        organization = organization,
+                        users = [user])
+        order.addPhysicalObject(physical_object)
+        test_db.add(order)
+
+    test_db.add(group)
+    test_db.commit()
+
+def execute_counted(client, test_db, query_name, fragment_name, fragment):
+    test_db.expire_all()
+    with count_queries(test_db.get_bind()) as counter:
+        executed = client.execute('''
+        query{
+            ''' + query_name + '''{
+                ...''' + fragment_name + '''
+            }
+        }''' + fragment)
+    assert('errors' not in executed), executed
+    return len(executed['data'][query_name]), counter.count
+
+#
+#  Test that relationships are loaded in batches
+#
+def test_filter_query_count(client, test_db):
+    add_lending_data(test_db, "small", 2)
+    small = {name: execute_counted(client, test_db, name, fragment_name, fragment) for name, fragment_name, fragment in filter_queries}
+
+    add_lending_data(test_db, "large", 50)
+    large = {name: execute_counted(client, test_db, name, fragment_name, fragment) for name, fragment_name, fragment in filter_queries}
+
+    for name, _, _ in filter_queries:
+        msg = name + " does not run with a constant number of queries"
+        assert(large[name][0] > small[name][0]), msg
+        assert(large[name][1] == small[name][1]), msg
+
+#
+#  Test that the filter resolvers eager load the selected relationships
+#
+def test_filter_eager_loading(client, test_db):
+    add_lending_data(test_db, "eager", 10)
+    test_db.expire_all()
+
+    with count_queries(test_db.get_bind()) as counter:
+        executed = client.execute('''
+        query{
+            filterPhysicalObjects(name: "eager"){
+                name
+                organization{
+                    name
+                }
+                tags{
+                    edges{
+                        node{
+                            name
+                        }
+                    }
+                }
+            }
+        }''')
+
+    msg = "filterPhysicalObjects did not eager load organization and tags"
+    assert('errors' not in executed), executed
+    assert(len(executed['data']['filterPhysicalObjects']) == 10), msg
+    # one statement for the objects joined with their organization, one for the tags
+    assert(counter.count == 2), msg
@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+
+from models import *
+import bootstrap
+from app import create_app
+
+#
+#  Test that importing the app doesn't connect anything and the root user is created once by bootstrap
+#
+def test_bootstrap(client, test_db):
+    backend_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    imported = subprocess.run([sys.executable, "-c", "import app, config; print(config._engine is None and config._scheduler is None)"],
+                              cwd=backend_directory, capture_output=True, text=True)
+    assert(imported.stdout.strip().endswith("True")), "Importing the app created the engine or the scheduler: " + imported.stderr[-500:]
+
+    config_root_user = bootstrap.application_root_user_name, bootstrap.application_root_user_password
+    bootstrap.application_root_user_name, bootstrap.application_root_user_password = "root@ovgu.de", "Passw0rd!"
+    try:
+        bootstrap.bootstrap()
+        bootstrap.bootstrap()
+    finally:
+        bootstrap.application_root_user_name, bootstrap.application_root_user_password = config_root_user
+
+    msg = "Root user was not created once"
+    root_users = test_db.query(User).filter(User.email == "root@ovgu.de").all()
+    assert(len(root_users) == 1), msg
+    assert(test_db.query(Organization).filter(Organization.name == "root_organization").count() == 1), msg
+    rights = test_db.query(Organization_User.rights).filter(Organization_User.user_id == root_users[0].user_id).all()
+    assert(rights == [(userRights.system_admin, )]), msg
+
+    response = create_app(start_services=False).test_client().get("/health")
+    assert(response.status_code == 200), "App of the factory doesn't answer"
@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, exc, text
+
+from db_pool import MeteredQueuePool, pool_metrics
+
+#
+#  Test that the connection pool reports waiting checkouts, its utilisation and opened and closed connections
+#
+def test_pool_metrics(client, test_db):
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "pool.db")
+    engine = create_engine("sqlite:///" + path, poolclass=MeteredQueuePool, pool_size=1, max_overflow=0,
+                           pool_timeout=1, connect_args={"check_same_thread": False})
+    try:
+        connection = engine.connect()
+        connection.execute(text("select 1"))
+        metrics = pool_metrics(engine)
+        msg = "Checked out connection is not reported"
+        assert(metrics["checkouts"] == 1 and metrics["connects"] == 1), msg
+        assert(metrics["checked_out"] == 1 and metrics["capacity"] == 1 and metrics["utilisation"] == 1), msg
+
+        # the second checkout waits until the connection is returned
+        waited = []
+        def checkout():
+            start = time.monotonic()
+            with engine.connect() as second:
+                second.execute(text("select 1"))
+            waited.append(time.monotonic() - start)
+        thread = threading.Thread(target=checkout)
+        thread.start()
+        time.sleep(0.3)
+        connection.close()
+        thread.join()
+
+        metrics = pool_metrics(engine)
+        msg = "Waiting checkout is not measured"
+        assert(metrics["checkouts"] == 2 and metrics["connects"] == 1), msg
+        assert(0.2 < metrics["max_wait_seconds"] <= waited[0]), msg
+        assert(metrics["checked_out"] == 0 and metrics["utilisation"] == 0), msg
+
+        connection = engine.connect()
+        try:
+            engine.connect()
+            assert(False), "Checkout of a full pool didn't time out"
+        except exc.TimeoutError:
+            pass
+        connection.close()
+        assert(pool_metrics(engine)["timeouts"] == 1), "Timeout is not counted"
+
+        # the counters are kept when the pool is replaced
+        engine.dispose()
+        engine.connect().close()
+        metrics = pool_metrics(engine)
+        msg = "Connection churn is not counted"
+        assert(metrics["closes"] == 1 and metrics["connects"] == 2 and metrics["checkouts"] == 4), msg + ": " + str(metrics)
+    finally:
+        engine.dispose()
+        shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,76 @@
+import io
+import os
+import shutil
+import tempfile
+import time
+
+from werkzeug.datastructures import FileStorage
+
+from models import *
+import file_storage
+import file_gc
+from Tests.file_tests import add_file_admin, upload
+
+def write(directory, name, content=b"stray", age=48 * 3600):
+    path = os.path.join(directory, name)
+    with open(path, "wb") as file:
+        file.write(content)
+    os.utime(path, (time.time() - age, time.time() - age))
+
+#
+#  Test that files without database entry are removed in batches, recent ones are kept
+#
+def test_file_garbage_collection(client, test_db):
+    picture_directory, pdf_directory, quarantine_directory = tempfile.mkdtemp(), tempfile.mkdtemp(), tempfile.mkdtemp()
+    config_storage = file_storage.picture_directory, file_storage.pdf_directory, file_gc.batch_size
+    file_storage.picture_directory, file_storage.pdf_directory = picture_directory, pdf_directory
+    # several batches per directory
+    file_gc.batch_size = 2
+    try:
+        user_id, organization, physical_object = add_file_admin(test_db)
+        kept = upload(client, user_id, physical_object, FileStorage(stream=io.BytesIO(b"kept picture"), filename="kept.jpg"))['file']['path']
+        dropped = upload(client, user_id, physical_object, FileStorage(stream=io.BytesIO(b"dropped picture"), filename="dropped.jpg"))['file']['path']
+        agb = upload(client, user_id, organization, FileStorage(stream=io.BytesIO(b"agb"), filename="agb.pdf"))['file']['path']
+        variant = os.path.splitext(kept)[0] + "_320.webp"
+        write(picture_directory, variant)
+        test_db.query(File).filter(File.path == kept).update({File.thumbnail_path: variant}, synchronize_session=False)
+
+        # deleting objects removes their File rows, but not the blobs and the content
+        test_db.query(File).filter(File.path == dropped).delete(synchronize_session=False)
+        test_db.commit()
+
+        for name in (kept, dropped):
+            os.utime(os.path.join(picture_directory, name), (time.time() - 48 * 3600, time.time() - 48 * 3600))
+        os.utime(os.path.join(pdf_directory, agb), (time.time() - 48 * 3600, time.time() - 48 * 3600))
+        write(picture_directory, ".upload-interrupted")
+        write(picture_directory, "1700000000.0_old.jpg")
+        write(picture_directory, "recent.jpg", age=60)
+        write(pdf_directory, "stray.pdf")
+
+        msg = "Dry run removed files"
+        result = file_gc.collect_garbage(min_age=24, dry_run=True)
+        assert(result == {"blobs": 1, "picture": {"scanned": 5, "removed": 2}, "pdf": {"scanned": 2, "removed": 1}}), msg + ": " + str(result)
+        assert(len(os.listdir(picture_directory)) == 6 and test_db.query(FileBlob).count() == 3), msg
+
+        msg = "Orphaned files were not removed"
+        result = file_gc.collect_garbage(min_age=24)
+        assert(result == {"blobs": 1, "picture": {"scanned": 5, "removed": 3}, "pdf": {"scanned": 2, "removed": 1}}), msg + ": " + str(result)
+        assert(sorted(os.listdir(picture_directory)) == sorted([kept, variant, "recent.jpg"])), msg
+        assert(os.listdir(pdf_directory) == [agb]), msg
+        assert(test_db.query(FileBlob).filter(FileBlob.path == dropped).count() == 0), "Unused blob was not deleted"
+
+        msg = "Orphaned file was not moved to the quarantine"
+        result = file_gc.collect_garbage(min_age=0, now=time.time() + 1, quarantine_directory=quarantine_directory)
+        assert(result["picture"]["removed"] == 1 and os.listdir(picture_directory) != []), msg
+        assert(os.listdir(os.path.join(quarantine_directory, "picture")) == ["recent.jpg"]), msg
+        assert(file_gc.collect_garbage(min_age=0, now=time.time() + 1)["picture"]["removed"] == 0), "Referenced file was removed"
+
+        msg = "Missing directory stopped the garbage collection"
+        write(picture_directory, "late orphan.jpg")
+        file_storage.pdf_directory = os.path.join(pdf_directory, "not mounted")
+        result = file_gc.collect_garbage(min_age=24)
+        assert(result["pdf"] == {"scanned": 0, "removed": 0} and result["picture"]["removed"] == 1), msg + ": " + str(result)
+    finally:
+        file_storage.picture_directory, file_storage.pdf_directory, file_gc.batch_size = config_storage
+        for directory in (picture_directory, pdf_directory, quarantine_directory):
+            shutil.rmtree(directory, ignore_errors=True)
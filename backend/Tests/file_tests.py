@@ -0,0 +1,173 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+
+from flask import session
+from werkzeug.datastructures import FileStorage
+
+from app import create_app
+from models import *
+import file_storage
+from file_storage import FileTooLarge, store_upload
+
+app = create_app(start_services=False)
+
+class CountingStream(io.BytesIO):
+    """
+    remembers the largest read, to check that uploads are read in chunks
+    """
+    largest_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.largest_read = max(self.largest_read, len(data))
+        return data
+
+def add_file_admin(test_db):
+    # upload_file only checks the rights without an organization, which only system admins pass
+    organization = Organization(name = "File Organization", location = "Magdeburg")
+    user = User(first_name = "File", last_name = "Admin", email = "file_admin@ovgu.de", password_hash = "-")
+    organization.add_user(user, userRights.system_admin)
+    physical_object = PhysicalObject(   inv_num_internal = 1,
+                                        inv_num_external = 1,
+                                        deposit = 0,
+                                        storage_location = "Shelf",
+                                        name = "File Object",
+                                        organization = organization)
+    test_db.add(physical_object)
+    test_db.commit()
+    return user.user_id, 'organizationId: "' + organization.organization_id + '"', 'physPictureId: "' + physical_object.phys_id + '"'
+
+def upload(client, user_id, target, file):
+    """
+    target are the arguments of the object the file belongs to, e.g. organizationId: "..."
+    """
+    with app.test_request_context():
+        session['user_id'] = user_id
+        executed = client.execute('''
+        mutation($file: Upload!){
+            uploadFile(file: $file, ''' + target + '''){
+                statusCode
+                infoText
+                file{
+                    path
+                    sha256
+                    size
+                }
+            }
+        }''', variables={"file": file})
+        return executed['data']['uploadFile']
+
+#
+#  Test that uploads are written in chunks with a limit and a content hash
+#
+def test_file_upload(client, test_db):
+    with tempfile.TemporaryDirectory() as directory:
+        content = os.urandom(300 * 1024)
+        stream = CountingStream(content)
+        sha256, size = store_upload(stream, directory, "chunks.pdf", max_size=len(content), chunk_size=64 * 1024)
+        msg = "Upload is not written in chunks"
+        assert(stream.largest_read == 64 * 1024), msg
+        assert((sha256, size) == (hashlib.sha256(content).hexdigest(), len(content))), msg
+        with open(os.path.join(directory, "chunks.pdf"), "rb") as file:
+            assert(file.read() == content), msg
+
+        msg = "Too large upload is not stopped while reading"
+        stream = CountingStream(content)
+        try:
+            store_upload(stream, directory, "large.pdf", max_size=100 * 1024, chunk_size=64 * 1024)
+            assert(False), msg
+        except FileTooLarge:
+            pass
+        assert(stream.tell() == 128 * 1024), msg
+        assert(os.listdir(directory) == ["chunks.pdf"]), "Incomplete upload was left behind"
+
+        config_directories = file_storage.picture_directory, file_storage.pdf_directory, file_storage.max_pdf_size
+        file_storage.picture_directory = file_storage.pdf_directory = directory
+        file_storage.max_pdf_size = 200 * 1024
+        try:
+            user_id, organization, _ = add_file_admin(test_db)
+
+            uploaded = upload(client, user_id, organization, FileStorage(stream=io.BytesIO(content[:1000]), filename="agb file.pdf"))
+            msg = "File was not uploaded"
+            assert(uploaded['statusCode'] == 200), msg + ": " + str(uploaded['infoText'])
+            assert(uploaded['file']['sha256'] == hashlib.sha256(content[:1000]).hexdigest() and uploaded['file']['size'] == 1000), msg
+            with open(os.path.join(directory, uploaded['file']['path']), "rb") as file:
+                assert(file.read() == content[:1000]), msg
+
+            uploaded = upload(client, user_id, organization, FileStorage(stream=io.BytesIO(content), filename="large.pdf"))
+            msg = "Too large pdf was uploaded"
+            assert(uploaded['statusCode'] == 413), msg
+            assert(test_db.query(File).count() == 1), msg
+            assert(len(os.listdir(directory)) == 2), msg
+        finally:
+            file_storage.picture_directory, file_storage.pdf_directory, file_storage.max_pdf_size = config_directories
+
+def delete(client, user_id, file_id):
+    with app.test_request_context():
+        session['user_id'] = user_id
+        executed = client.execute('''
+        mutation{
+            deleteFile(fileId: "''' + file_id + '''"){
+                statusCode
+            }
+        }''')
+        return executed['data']['deleteFile']['statusCode']
+
+#
+#  Test that the same content is stored once and removed with its last file
+#
+def test_file_deduplication(client, test_db):
+    directory = tempfile.mkdtemp()
+    config_storage = file_storage.picture_directory, file_storage.pdf_directory, file_storage.store_upload
+    file_storage.picture_directory = file_storage.pdf_directory = directory
+    writes = []
+
+    def counted_store_upload(*args, **kwargs):
+        writes.append(args[2])
+        return config_storage[2](*args, **kwargs)
+
+    file_storage.store_upload = counted_store_upload
+    try:
+        user_id, _, physical_object = add_file_admin(test_db)
+        photo = os.urandom(5000)
+
+        paths = [upload(client, user_id, physical_object, FileStorage(stream=io.BytesIO(photo), filename="uno" + str(i) + ".jpg"))['file']['path'] for i in range(3)]
+        upload(client, user_id, physical_object, FileStorage(stream=io.BytesIO(b"other"), filename="other.jpg"))
+
+        msg = "Same content was stored twice"
+        assert(len(set(paths)) == 1), msg
+        assert(len(writes) == 2), msg
+        assert(sorted(os.listdir(directory)) == sorted([paths[0], hashlib.sha256(b"other").hexdigest() + ".jpg"])), msg
+        assert(test_db.query(FileBlob).count() == 2), msg
+
+        files = [file_id for file_id, in test_db.query(File.file_id).filter(File.path == paths[0]).all()]
+        assert(len(files) == 3), msg
+
+        msg = "Content was removed although it is still used"
+        for file_id in files[:2]:
+            assert(delete(client, user_id, file_id) == 200), msg
+            assert(os.path.isfile(os.path.join(directory, paths[0]))), msg
+
+        msg = "Content was not removed with its last file"
+        assert(delete(client, user_id, files[2]) == 200), msg
+        assert(not os.path.isfile(os.path.join(directory, paths[0]))), msg
+        assert(test_db.query(FileBlob).count() == 1), msg
+
+        # uploading it again stores it again
+        upload(client, user_id, physical_object, FileStorage(stream=io.BytesIO(photo), filename="uno.jpg"))
+        assert(os.path.isfile(os.path.join(directory, paths[0]))), "Removed content was not stored again"
+
+        # files of older versions have their own path without a blob
+        with open(os.path.join(directory, "1700000000.0_old.pdf"), "wb") as file:
+            file.write(b"old")
+        old = File(path = "1700000000.0_old.pdf", file_type = "pdf")
+        test_db.add(old)
+        test_db.commit()
+        assert(delete(client, user_id, old.file_id) == 200)
+        assert(not os.path.isfile(os.path.join(directory, "1700000000.0_old.pdf"))), "File of an older version was not removed"
+    finally:
+        file_storage.picture_directory, file_storage.pdf_directory, file_storage.store_upload = config_storage
+        shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,37 @@
+import os
+
+from models import *
+import app as application
+import config
+
+#
+#  Test that a forked worker gets its own connections and starts its own services
+#
+def test_after_fork(client, test_db):
+    engine = config.get_engine()
+    parent_pool = engine.pool
+    users = test_db.query(User).count()
+    flask_app = application.create_app(start_services=False)
+
+    started = []
+    config_start = application.start_background_services
+    application.start_background_services = lambda: started.append(os.getpid())
+    try:
+        pid = os.fork()
+        if pid == 0:
+            status = 1
+            try:
+                application.after_fork(flask_app)
+                # 2: the pool of the master is used, 3: the scheduler of the master is kept, 4: no services
+                status = 2 if engine.pool is parent_pool else 3 if config._scheduler is not None else 4 if started != [os.getpid()] else 0
+            finally:
+                os._exit(status)
+
+        _, status = os.waitpid(pid, 0)
+        assert(os.waitstatus_to_exitcode(status) == 0), "Worker was not prepared after the fork: " + str(os.waitstatus_to_exitcode(status))
+    finally:
+        application.start_background_services = config_start
+
+    msg = "Connections of the master were closed by the worker"
+    assert(engine.pool is parent_pool and started == []), msg
+    assert(test_db.query(User).count() == users), msg
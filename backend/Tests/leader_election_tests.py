@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+import leader_election
+from leader_election import LeaderElection, release
+from models import *
+
+class FakeScheduler:
+    """
+    records the calls of the leader election instead of executing jobs
+    """
+    def __init__(self):
+        self.calls = []
+
+    def resume(self):
+        self.calls.append("resume")
+
+    def pause(self):
+        self.calls.append("pause")
+
+    def wakeup(self):
+        self.calls.append("wakeup")
+
+#
+#  Test that only one process executes the scheduled jobs and another one takes over
+#
+def test_leader_election(client, test_db):
+    first_scheduler, second_scheduler = FakeScheduler(), FakeScheduler()
+    first = LeaderElection(first_scheduler, duration = 30, holder = "first")
+    second = LeaderElection(second_scheduler, duration = 30, holder = "second")
+
+    msg = "More than one leader was elected"
+    assert(first.step()), msg
+    assert(not second.step()), msg
+    assert(first.step()), msg
+    assert(first_scheduler.calls == ["resume", "wakeup"]), msg
+    assert(second_scheduler.calls == []), msg
+
+    # the first process dies and doesn't renew its lease
+    test_db.query(SchedulerLease).update({SchedulerLease.expires_at: datetime.utcnow() - timedelta(seconds=1)})
+    test_db.commit()
+
+    msg = "Expired lease was not taken over"
+    assert(second.step()), msg
+    assert(second_scheduler.calls == ["resume"]), msg
+    assert(not first.step()), msg
+    assert(first_scheduler.calls == ["resume", "wakeup", "pause"]), msg
+
+    msg = "Released lease was not taken over"
+    release("second")
+    assert(first.step()), msg
+    assert(not second.step()), msg
+    assert(second_scheduler.calls == ["resume", "pause"]), msg
+
+class SkewedDatetime(datetime):
+    """
+    the clock of a container which is one hour ahead
+    """
+    @classmethod
+    def utcnow(cls):
+        return datetime.utcnow() + timedelta(hours=1)
+
+#
+#  Test that the lease is compared with the clock of the database, not with the one of the process
+#
+def test_lease_clock_skew(client, test_db):
+    first = LeaderElection(FakeScheduler(), duration = 30, holder = "first")
+    second = LeaderElection(FakeScheduler(), duration = 30, holder = "second")
+    assert(first.step()), "Lease was not taken"
+
+    # a process with a clock ahead mustn't see the lease as expired
+    leader_election.datetime = SkewedDatetime
+    try:
+        assert(not second.step()), "Lease was taken over because of a skewed clock"
+    finally:
+        del leader_election.datetime
+    assert(first.step()), "Leader lost the lease"
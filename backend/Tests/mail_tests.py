@@ -0,0 +1,208 @@
+import datetime
+import os
+import shutil
+import socket
+import socketserver
+import ssl
+import tempfile
+import threading
+import time
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+import sendMail
+from sendMail import SMTPPool, connect_mail_server
+
+def self_signed_context():
+    """
+    server side ssl context with a certificate for localhost
+    """
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = x509.CertificateBuilder() \
+        .subject_name(name).issuer_name(name).public_key(key.public_key()) \
+        .serial_number(x509.random_serial_number()) \
+        .not_valid_before(now - datetime.timedelta(days=1)).not_valid_after(now + datetime.timedelta(days=1)) \
+        .sign(key, hashes.SHA256())
+
+    directory = tempfile.mkdtemp()
+    certificate_path, key_path = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    with open(certificate_path, "wb") as file:
+        file.write(certificate.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as file:
+        file.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(certificate_path, key_path)
+    shutil.rmtree(directory, ignore_errors=True)
+    return context
+
+
+class FakeMailServer(socketserver.ThreadingTCPServer):
+    """
+    minimal smtp server over ssl which accepts every login and message
+    counts the connections and received messages
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("localhost", 0), FakeMailHandler)
+        self.context = self_signed_context()
+        self.connections = 0
+        self.messages = []
+        self.lock = threading.Lock()
+        self.sockets = []
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def get_request(self):
+        connection, address = super().get_request()
+        connection = self.context.wrap_socket(connection, server_side=True)
+        with self.lock:
+            self.connections += 1
+            self.sockets.append(connection)
+        return connection, address
+
+    def drop_connections(self):
+        """
+        closes all open sessions, like a mail server does after a timeout
+        """
+        with self.lock:
+            sockets, self.sockets = self.sockets, []
+        for connection in sockets:
+            try:
+                # close alone keeps the session open while the handler still reads from it
+                connection.shutdown(socket.SHUT_RDWR)
+                connection.close()
+            except OSError:
+                pass
+
+    def stop(self):
+        self.drop_connections()
+        self.shutdown()
+        self.server_close()
+
+
+class FakeMailHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write((line + "\r\n").encode("utf-8"))
+
+    def handle(self):
+        self.reply("220 localhost ESMTP")
+        while True:
+            try:
+                line = self.rfile.readline().decode("utf-8").strip()
+            except (OSError, ValueError):
+                return
+            if not line:
+                return
+            command = line.split(" ")[0].upper()
+            if command in ("EHLO", "HELO"):
+                self.reply("250-localhost")
+                self.reply("250 AUTH PLAIN LOGIN")
+            elif command == "AUTH":
+                self.reply("235 Authentication successful")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                for data_line in self.rfile:
+                    if data_line in (b".\r\n", b".\n"):
+                        break
+                    data.append(data_line)
+                with self.server.lock:
+                    self.server.messages.append(b"".join(data))
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                # MAIL, RCPT, NOOP, RSET
+                self.reply("250 OK")
+
+
+def connect_to(server):
+    # the certificate of the fake server is self signed
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return lambda: connect_mail_server("localhost", server.port, context)
+
+#
+#  Test that mails are sent over pooled connections
+#
+def test_mail_pool(client, test_db):
+    server = FakeMailServer()
+    config_pool = sendMail.mail_pool
+    # the fake server accepts any login, the credentials of the environment may not be set
+    config_credentials = sendMail.sender_email_address, sendMail.sender_email_password
+    sendMail.sender_email_address, sendMail.sender_email_password = "sender@ovgu.de", "secret"
+    sendMail.mail_pool = SMTPPool(connect_to(server), size=2, check_after=0)
+    try:
+        errors = sendMail.send_mails([("pool" + str(i) + "@ovgu.de", "Pool", "<p>" + str(i) + "</p>") for i in range(20)])
+        assert(errors == [None] * 20), "Mails were not sent"
+        for i in range(5):
+            sendMail.send_mails([("single@ovgu.de", "Pool", "<p>single</p>")])
+
+        msg = "Mails are not sent over one connection"
+        assert(len(server.messages) == 25), msg
+        assert(server.connections == 1), msg
+
+        # the mail server closes the session, the pool has to notice it and connect again
+        server.drop_connections()
+        sendMail.send_mails([("reconnect@ovgu.de", "Pool", "<p>reconnect</p>")])
+        msg = "Pool doesn't reconnect after the connection was closed"
+        assert(len(server.messages) == 26), msg
+        assert(server.connections == 2), msg
+
+        # without the NOOP check the broken connection is noticed while sending
+        sendMail.mail_pool.check_after = 60
+        server.drop_connections()
+        assert(sendMail.send_mails([("resend@ovgu.de", "Pool", "<p>resend</p>")]) == [None]), msg
+        assert(len(server.messages) == 27), msg
+        assert(server.connections == 3), msg
+    finally:
+        sendMail.mail_pool.close()
+        sendMail.mail_pool = config_pool
+        sendMail.sender_email_address, sendMail.sender_email_password = config_credentials
+        server.stop()
+
+
+def benchmark_mail_throughput(count=200):
+    """
+    messages per second with a new connection per message (as before the pool) and with the pool
+    """
+    server = FakeMailServer()
+    connect = connect_to(server)
+    try:
+        start = time.perf_counter()
+        for i in range(count):
+            mail_server = connect()
+            mail_server.sendmail("benchmark@ovgu.de", "receiver@ovgu.de", sendMail.build_message("receiver@ovgu.de", "Benchmark", "<p>" + str(i) + "</p>"))
+            mail_server.quit()
+        unpooled = count / (time.perf_counter() - start)
+
+        pool = SMTPPool(connect)
+        start = time.perf_counter()
+        for i in range(count):
+            with pool.connection() as mail_server:
+                mail_server.sendmail("benchmark@ovgu.de", "receiver@ovgu.de", sendMail.build_message("receiver@ovgu.de", "Benchmark", "<p>" + str(i) + "</p>"))
+        pooled = count / (time.perf_counter() - start)
+        pool.close()
+    finally:
+        server.stop()
+
+    return unpooled, pooled
+
+# python -m Tests.mail_tests runs the benchmark
+if __name__ == '__main__':
+    unpooled, pooled = benchmark_mail_throughput()
+    print("new connection per message: %.1f messages/s" % unpooled)
+    print("pooled connection:          %.1f messages/s" % pooled)
@@ -0,0 +1,141 @@
+import datetime
+import os
+import shutil
+import tempfile
+import threading
+
+from flask import session
+from sqlalchemy import create_engine, event
+
+from app import create_app
+from models import *
+
+app = create_app(start_services=False)
+
+def locking_engine(path):
+    """
+    file based sqlite engine which can be shared between threads
+    sqlite has no SELECT ... FOR UPDATE, BEGIN IMMEDIATE takes the write lock at the start of every transaction instead
+    """
+    engine = create_engine("sqlite:///" + path, connect_args={"check_same_thread": False, "timeout": 30})
+
+    @event.listens_for(engine, "connect")
+    def do_connect(dbapi_connection, connection_record):
+        # let sqlalchemy emit the BEGIN itself
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def do_begin(connection):
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+    return engine
+
+#
+#  Test that concurrent orders can't book the same object twice
+#
+def test_concurrent_order_creation(client, test_db, threads = 8):
+    directory = tempfile.mkdtemp()
+    engine = locking_engine(os.path.join(directory, "orders.db"))
+    Base.metadata.create_all(bind = engine)
+
+    original_bind = test_db.get_bind()
+    test_db.remove()
+    test_db.configure(bind = engine)
+    try:
+        organization = Organization(name = "Concurrent Organization", location = "Magdeburg")
+        physical_object = PhysicalObject(   inv_num_internal = 1,
+                                            inv_num_external = 1,
+                                            deposit = 0,
+                                            storage_location = "Shelf",
+                                            name = "Concurrent Object",
+                                            organization = organization)
+        users = [User(first_name = "Concurrent", last_name = str(i), email = "concurrent" + str(i) + "@ovgu.de", password_hash = "-") for i in range(threads)]
+        test_db.add(physical_object)
+        test_db.add_all(users)
+        test_db.commit()
+        phys_id = physical_object.phys_id
+        user_ids = [user.user_id for user in users]
+        test_db.remove()
+
+        barrier = threading.Barrier(threads)
+        status_codes = []
+
+        def book(user_id, day):
+            # every thread gets its own session from the scoped session
+            with app.test_request_context():
+                session['user_id'] = user_id
+                barrier.wait()
+                executed = client.execute('''
+                mutation{
+                    createOrder(physicalobjects: ["''' + phys_id + '''"], fromDate: "2024-07-''' + day + '''T10:00:00", tillDate: "2024-07-20T10:00:00"){
+                        statusCode
+                    }
+                }''')
+                status_codes.append(executed['data']['createOrder']['statusCode'])
+                test_db.remove()
+
+        workers = [threading.Thread(target = book, args = (user_id, str(10 + i))) for i, user_id in enumerate(user_ids)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        msg = "Overlapping orders were created concurrently"
+        booked = test_db.query(PhysicalObject_Order).filter(PhysicalObject_Order.phys_id == phys_id).count()
+        assert(booked == 1), msg
+        assert(status_codes.count(409) == threads - 1), msg + ": " + str(status_codes)
+        assert(test_db.query(Order).count() == 1), msg
+    finally:
+        test_db.remove()
+        test_db.configure(bind = original_bind)
+        engine.dispose()
+        shutil.rmtree(directory, ignore_errors = True)
+
+#
+#  Test that moved orders and added objects can't overlap other orders
+#
+def test_order_update_availability(client, test_db):
+    organization = Organization(name = "Update Organization", location = "Magdeburg")
+    objects = [PhysicalObject(  inv_num_internal = i,
+                                inv_num_external = i,
+                                deposit = 0,
+                                storage_location = "Shelf",
+                                name = "Update Object " + str(i),
+                                organization = organization) for i in range(3)]
+    user = User(first_name = "Update", last_name = "Test", email = "update@ovgu.de", password_hash = "-")
+    organization.add_user(user)
+    test_db.add_all(objects + [user])
+
+    def add_order(day, *physical_objects):
+        order = Order(creation_date = datetime.datetime(2024, 8, 1), from_date = datetime.datetime(2024, 8, day, 10), till_date = datetime.datetime(2024, 8, day + 2, 10), users = [user], organization = organization)
+        for physical_object in physical_objects:
+            order.addPhysicalObject(physical_object)
+        test_db.add(order)
+        return order
+
+    booked = add_order(10, objects[0], objects[1])
+    moved = add_order(20, objects[0])
+    add_order(22, objects[2])
+    test_db.commit()
+    phys_ids = [physical_object.phys_id for physical_object in objects]
+    booked_id, moved_id, user_id = booked.order_id, moved.order_id, user.user_id
+
+    def execute(mutation, arguments):
+        with app.test_request_context():
+            session['user_id'] = user_id
+            executed = client.execute('mutation{ ' + mutation + '(' + arguments + '){ statusCode } }')
+            test_db.remove()
+        return executed['data'][mutation]['statusCode']
+
+    msg = "Order was moved onto another order of its objects"
+    assert(execute("updateOrder", 'orderId: "' + moved_id + '", fromDate: "2024-08-11", tillDate: "2024-08-13"') == 409), msg
+    assert(test_db.query(Order).filter(Order.order_id == moved_id).one().from_date == datetime.datetime(2024, 8, 20, 10)), msg
+    assert(execute("updateOrder", 'orderId: "' + moved_id + '", tillDate: "2024-08-19"') == 400), "End before the start was accepted"
+    # the order doesn't block itself
+    assert(execute("updateOrder", 'orderId: "' + moved_id + '", fromDate: "2024-08-21", tillDate: "2024-08-25"') == 200), "Order could not be moved"
+
+    msg = "Booked object was added to an overlapping order"
+    assert(execute("addPhysicalObjectToOrder", 'orderId: "' + moved_id + '", physicalObjects: ["' + phys_ids[2] + '"]') == 409), msg
+    assert(execute("addPhysicalObjectToOrder", 'orderId: "' + moved_id + '", physicalObjects: ["' + phys_ids[1] + '"]') == 200), "Free object was not added"
+    assert(test_db.query(PhysicalObject_Order).filter(PhysicalObject_Order.order_id == moved_id).count() == 2), msg
+    assert(execute("updateOrder", 'orderId: "' + booked_id + '", tillDate: "2024-08-22"') == 409), "Order was extended onto another order"
@@ -0,0 +1,200 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+import outbox
+from models import *
+from Tests.order_tests import locking_engine
+
+class FakeSender:
+    """
+    records the sent mails, the receivers in reject are rejected
+    every call takes delay seconds like a slow mail server
+    """
+
+    def __init__(self, reject=(), delay=0):
+        self.reject = set(reject)
+        self.delay = delay
+        self.sent = []
+        self.lock = threading.Lock()
+        self.called = threading.Event()
+
+    def __call__(self, mails):
+        time.sleep(self.delay)
+        errors = []
+        for receiver, subject, body in mails:
+            if receiver in self.reject:
+                errors.append(Exception("550 rejected " + receiver))
+            else:
+                with self.lock:
+                    self.sent.append(receiver)
+                errors.append(None)
+        self.called.set()
+        return errors
+
+def outbox_mail(test_db, receiver):
+    return test_db.query(MailOutbox).filter(MailOutbox.receiver == receiver).one()
+
+#
+#  Test that queued mails are sent once and failed mails are retried with backoff
+#
+def test_mail_outbox(client, test_db):
+    # a moment after the mails were queued
+    now = outbox.local_now() + timedelta(seconds=1)
+    for i in range(30):
+        outbox.enqueue_mail("outbox" + str(i) + "@ovgu.de", "Outbox", "<p>" + str(i) + "</p>", key="outbox:" + str(i))
+    outbox.enqueue_mail("outbox0@ovgu.de", "Outbox", "<p>0</p>", key="outbox:0")
+    outbox.enqueue_mail("later@ovgu.de", "Outbox", "<p>later</p>", send_after=now + timedelta(days=1))
+    outbox.enqueue_mail("broken@ovgu.de", "Outbox", "<p>broken</p>")
+    test_db.commit()
+    assert(test_db.query(MailOutbox).count() == 32), "Mails with the same key were queued twice"
+
+    send = FakeSender(reject=["broken@ovgu.de"])
+    msg = "Due mails were not sent"
+    assert(outbox.drain_outbox(now=now, batch_size=7, send=send, workers=3) == 30), msg
+    assert(sorted(send.sent) == sorted("outbox" + str(i) + "@ovgu.de" for i in range(30))), msg
+    assert(outbox_mail(test_db, "outbox3@ovgu.de").status == mailStatus.sent), msg
+    assert(outbox_mail(test_db, "outbox3@ovgu.de").body == ""), "Body of a sent mail was kept"
+    assert(outbox_mail(test_db, "later@ovgu.de").status == mailStatus.pending), "Mail was sent too early"
+
+    msg = "Failed mail is not retried with backoff"
+    broken = outbox_mail(test_db, "broken@ovgu.de")
+    assert(broken.status == mailStatus.pending and broken.attempts == 1), msg
+    assert(broken.send_after == now + outbox.backoff_base), msg
+    assert("rejected" in broken.last_error), msg
+    assert(outbox.drain_outbox(now=now, send=send) == 0), "Mails were sent twice"
+    assert(len(send.sent) == 30), "Mails were sent twice"
+
+    # the delay doubles until the last attempt failed
+    broken = outbox_mail(test_db, "broken@ovgu.de")
+    attempts = 1
+    while broken.status == mailStatus.pending:
+        now = broken.send_after
+        outbox.drain_outbox(now=now, send=send)
+        broken = outbox_mail(test_db, "broken@ovgu.de")
+        attempts += 1
+        if broken.status == mailStatus.pending:
+            assert(broken.send_after - now == outbox.backoff(attempts)), msg
+    msg = "Failed mail is retried without limit"
+    assert(broken.status == mailStatus.failed), msg
+    assert(broken.body == ""), "Body of a failed mail was kept"
+    assert(broken.attempts == outbox.outbox_max_attempts), msg
+    assert(outbox.backoff(100) == outbox.backoff_max), msg
+
+    # mails of a dispatcher which died are claimed again after the timeout
+    outbox.enqueue_mail("claimed@ovgu.de", "Outbox", "<p>claimed</p>", send_after=now)
+    test_db.commit()
+    assert(len(outbox.claim_mails(now, 10)) == 1)
+    assert(outbox.drain_outbox(now=now, send=send) == 0), "Claimed mail was sent by two dispatchers"
+    assert(outbox.drain_outbox(now=now + outbox.claim_timeout, send=send) == 1), "Claimed mail was not sent after the timeout"
+
+    metrics = outbox.outbox_metrics()
+    msg = "Metrics don't match the outbox"
+    assert(metrics["sent"] == 31 and metrics["failed"] == 1 and metrics["pending"] == 1), msg
+    assert(metrics["process"]["failed"] >= 1 and metrics["process"]["retried"] >= outbox.outbox_max_attempts - 1), msg
+
+    # finished mails are deleted after the retention, pending ones are kept
+    msg = "Finished mails were not purged after the retention"
+    assert(outbox.purge_outbox(now=now, retention_days=1) == 0), "Mails were purged before the retention"
+    outbox.purge_batch_size = 7
+    try:
+        assert(outbox.purge_outbox(now=now + timedelta(days=2), retention_days=1) == 32), msg
+    finally:
+        outbox.purge_batch_size = 1000
+    assert(test_db.query(MailOutbox).count() == 1), msg
+    assert(outbox_mail(test_db, "later@ovgu.de").status == mailStatus.pending), "Pending mail was purged"
+
+#
+#  Test that two transactions queueing the same key commit both, the mail is queued once
+#
+def test_concurrent_mail_key(client, test_db):
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine("sqlite:///" + os.path.join(directory, "keys.db"))
+        Base.metadata.create_all(bind = engine)
+        first = Session(bind = engine)
+
+        class RacingSession(Session):
+            """
+            the first transaction commits the same key after the lookup of this one
+            """
+            def flush(self, objects=None):
+                if not first.query(MailOutbox).count():
+                    outbox.enqueue_mail("race@ovgu.de", "Race", "<p>first</p>", key="race:status", session=first)
+                    first.commit()
+                super().flush(objects)
+
+        # like the scoped session of the app, which doesn't flush before queries
+        second = RacingSession(bind = engine, autoflush = False)
+        try:
+            second.add(User(first_name = "Race", last_name = "Test", email = "race@ovgu.de", password_hash = "-"))
+            msg = "Mail which another transaction queued was queued again"
+            assert(outbox.enqueue_mail("race@ovgu.de", "Race", "<p>second</p>", key="race:status", session=second) is None), msg
+            second.commit()
+
+            assert(first.query(User).filter(User.email == "race@ovgu.de").count() == 1), "The change was rolled back because of the duplicate mail"
+            mails = first.query(MailOutbox).all()
+            assert(len(mails) == 1 and mails[0].body == "<p>first</p>"), msg
+        finally:
+            first.close()
+            second.close()
+            engine.dispose()
+
+#
+#  Test that the password reset doesn't wait for the mail server
+#
+def test_mail_delivery(client, test_db):
+    # the delivery thread needs a database shared between threads
+    directory = tempfile.mkdtemp()
+    engine = locking_engine(os.path.join(directory, "delivery.db"))
+    Base.metadata.create_all(bind = engine)
+
+    original_bind = test_db.get_bind()
+    test_db.remove()
+    test_db.configure(bind = engine)
+
+    send = FakeSender(delay=1)
+    outbox.mail_delivery = outbox.MailDelivery(drain=lambda: outbox.drain_outbox(send=send))
+    outbox.mail_delivery.start()
+    outbox.enable_mail_delivery()
+    try:
+        test_db.add(User(first_name = "Delivery", last_name = "Test", email = "delivery@ovgu.de", password_hash = "-"))
+        test_db.commit()
+
+        start = time.perf_counter()
+        executed = client.execute('''
+        mutation{
+            resetPassword(email: "delivery@ovgu.de"){
+                statusCode
+            }
+        }''')
+        duration = time.perf_counter() - start
+
+        assert(executed['data']['resetPassword']['statusCode'] == 200), "Password was not reset"
+        assert(duration < send.delay), "The request waited for the mail server"
+
+        msg = "Mail was not delivered after the commit"
+        assert(send.called.wait(10)), msg
+        assert(send.sent == ["delivery@ovgu.de"]), msg
+
+        # the new password is not kept in the outbox once it was sent
+        deadline = time.monotonic() + 10
+        while outbox_mail(test_db, "delivery@ovgu.de").status != mailStatus.sent and time.monotonic() < deadline:
+            test_db.commit()
+            time.sleep(0.05)
+        mail = outbox_mail(test_db, "delivery@ovgu.de")
+        assert(mail.status == mailStatus.sent and mail.body == ""), "The new password is kept in the outbox"
+    finally:
+        outbox.mail_delivery.stop()
+        outbox.mail_delivery.join()
+        outbox.mail_delivery = None
+        outbox._mail_delivery_enabled = False
+        test_db.remove()
+        test_db.configure(bind = original_bind)
+        engine.dispose()
+        shutil.rmtree(directory, ignore_errors = True)
@@ -0,0 +1,65 @@
+from Tests.batching_tests import add_lending_data
+from Tests.utils import count_queries
+
+query_page = '''
+    query{
+        filterPhysicalObjectsConnection(%s){
+            totalCount
+            pageInfo{
+                hasNextPage
+                hasPreviousPage
+                startCursor
+                endCursor
+            }
+            edges{
+                node{
+                    name
+                }
+            }
+        }
+    }'''
+
+def execute_page(client, args):
+    executed = client.execute(query_page % args)
+    assert('errors' not in executed), executed
+    return executed['data']['filterPhysicalObjectsConnection']
+
+def names(page):
+    return [edge['node']['name'] for edge in page['edges']]
+
+#
+#  Test cursor pagination of the filter connections
+#
+def test_filter_connection_pagination(client, test_db):
+    add_lending_data(test_db, "page", 7)
+
+    # walk forward through all objects
+    first_page = execute_page(client, 'name: "page", first: 3')
+    second_page = execute_page(client, 'name: "page", first: 3, after: "%s"' % first_page['pageInfo']['endCursor'])
+    third_page = execute_page(client, 'name: "page", first: 3, after: "%s"' % second_page['pageInfo']['endCursor'])
+
+    msg = "Forward pagination failed"
+    assert(first_page['totalCount'] == 7), msg
+    assert(len(names(first_page)) == 3 and len(names(second_page)) == 3 and len(names(third_page)) == 1), msg
+    assert(len(set(names(first_page) + names(second_page) + names(third_page))) == 7), msg
+    assert(first_page['pageInfo']['hasNextPage'] and not first_page['pageInfo']['hasPreviousPage']), msg
+    assert(not third_page['pageInfo']['hasNextPage'] and third_page['pageInfo']['hasPreviousPage']), msg
+
+    # walk backward from the end
+    last_page = execute_page(client, 'name: "page", last: 3')
+    before_page = execute_page(client, 'name: "page", last: 3, before: "%s"' % last_page['pageInfo']['startCursor'])
+
+    msg = "Backward pagination failed"
+    assert(names(last_page) == (names(second_page) + names(third_page))[-3:]), msg
+    assert(names(before_page) == (names(first_page) + names(second_page))[1:4]), msg
+    assert(before_page['pageInfo']['hasPreviousPage']), msg
+
+    # the number of statements depends on the page size, not on the number of rows
+    add_lending_data(test_db, "page more", 30)
+    with count_queries(test_db.get_bind()) as counter:
+        page = execute_page(client, 'name: "page", first: 3')
+
+    msg = "Pagination does not only fetch the requested page"
+    assert(page['totalCount'] == 37 and len(names(page)) == 3), msg
+    # one statement for the page, one for the total count
+    assert(counter.count == 2), msg
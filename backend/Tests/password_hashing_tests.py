@@ -0,0 +1,184 @@
+import statistics
+import threading
+import time
+
+from argon2 import PasswordHasher
+from flask import session
+
+from app import create_app
+import mutation_login
+from models import *
+import password_hashing
+from password_hashing import HashingPool, PasswordHashingBusy
+
+app = create_app(start_services=False)
+
+def login(client, email, password):
+    with app.test_request_context():
+        executed = client.execute('''
+        mutation{
+            login(email: "''' + email + '''", password: "''' + password + '''"){
+                statusCode
+            }
+        }''')
+        return executed['data']['login']['statusCode'], session.get('user_id')
+
+#
+#  Test that passwords are hashed on the bounded pool
+#
+def test_password_hashing(client, test_db):
+    config_pool = password_hashing.hashing_pool
+    # cheap parameters keep the test fast
+    password_hashing.hashing_pool = HashingPool(PasswordHasher(time_cost=1, memory_cost=1024, parallelism=1), workers=1, queue_limit=1)
+    try:
+        # the hash of an older version with other parameters
+        old_hash = PasswordHasher(time_cost=1, memory_cost=512, parallelism=1).hash("Passw0rd!")
+        user = User(first_name = "Hashing", last_name = "Test", email = "hashing@ovgu.de", password_hash = old_hash)
+        test_db.add(user)
+        test_db.commit()
+        user_id = user.user_id
+
+        msg = "Login with the pool failed"
+        assert(login(client, "hashing@ovgu.de", "Passw0rd!") == (200, user_id)), msg
+        assert(login(client, "hashing@ovgu.de", "wrong")[0] == 401), msg
+
+        user = test_db.query(User).filter(User.user_id == user_id).one()
+        msg = "Hash with old parameters was not renewed"
+        assert(user.password_hash != old_hash), msg
+        assert(not password_hashing.needs_rehash(user.password_hash)), msg
+        assert(login(client, "hashing@ovgu.de", "Passw0rd!")[0] == 200), msg
+
+        # one password is hashed and one waits, the next one is rejected
+        release = threading.Event()
+        blocked = [threading.Thread(target=password_hashing.hashing_pool.run, args=(release.wait, )) for i in range(2)]
+        for thread in blocked:
+            thread.start()
+        while password_hashing.hashing_metrics()["waiting"] < 2:
+            time.sleep(0.01)
+
+        msg = "Pool doesn't limit the waiting passwords"
+        assert(login(client, "hashing@ovgu.de", "Passw0rd!")[0] == 503), msg
+
+        # the other mutations which hash a password reject the request as well
+        msg = "Busy pool is not reported by the user mutations"
+        with app.test_request_context():
+            session['user_id'] = user_id
+            executed = client.execute('''
+            mutation{
+                createUser(email: "busy@ovgu.de", firstName: "Busy", lastName: "Test", password: "Passw0rd!"){
+                    statusCode
+                }
+                updateUser(userId: "''' + user_id + '''", firstName: "Busy", password: "Passw0rd!"){
+                    statusCode
+                }
+                resetPassword(email: "hashing@ovgu.de"){
+                    statusCode
+                }
+            }''')
+        assert([executed['data'][mutation]['statusCode'] for mutation in ("createUser", "updateUser", "resetPassword")] == [503, 503, 503]), msg
+        assert(test_db.query(User).filter(User.email == "busy@ovgu.de").count() == 0), msg
+        user = test_db.query(User).filter(User.user_id == user_id).one()
+        assert(user.first_name == "Hashing"), msg
+        assert(test_db.query(MailOutbox).count() == 0), "Reset mail was queued without a new password"
+        try:
+            password_hashing.hash_password("Passw0rd!")
+            assert(False), msg
+        except PasswordHashingBusy:
+            pass
+
+        release.set()
+        for thread in blocked:
+            thread.join()
+
+        metrics = password_hashing.hashing_metrics()
+        msg = "Metrics of the pool are wrong"
+        assert(metrics["rejected"] == 5), msg
+        assert(metrics["calls"] == 6 and metrics["waiting"] == 0), msg
+        # the second blocked call waited for the first one
+        assert(metrics["max_queue_seconds"] > 0), msg
+    finally:
+        password_hashing.hashing_pool.shutdown()
+        password_hashing.hashing_pool = config_pool
+
+
+def benchmark_login_latency(logins=32, concurrency=8, workers=2):
+    """
+    latency of logins arriving at once and of a short request running at the same time,
+    with every request verifying inline (as before) and with the pool
+    """
+    hasher = password_hashing.password_hasher
+    password_hash = hasher.hash("Passw0rd!")
+
+    def burst(verify):
+        latencies, other = [], []
+        done = threading.Event()
+
+        def logins_of_thread(count):
+            for i in range(count):
+                start = time.perf_counter()
+                verify(password_hash, "Passw0rd!")
+                latencies.append(time.perf_counter() - start)
+
+        def other_requests():
+            # a request which only needs the python interpreter for a moment
+            while not done.is_set():
+                start = time.perf_counter()
+                sum(range(20000))
+                other.append(time.perf_counter() - start)
+
+        threads = [threading.Thread(target=logins_of_thread, args=(logins // concurrency, )) for i in range(concurrency)]
+        other_thread = threading.Thread(target=other_requests)
+        other_thread.start()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        done.set()
+        other_thread.join()
+        return latencies, other
+
+    def percentile(values, p):
+        return statistics.quantiles(values, n=100)[p - 1] * 1000
+
+    pool = HashingPool(hasher, workers=workers, queue_limit=0)
+    results = {}
+    for name, verify in (("inline", hasher.verify), ("pool", pool.verify)):
+        latencies, other = burst(verify)
+        results[name] = (percentile(latencies, 50), percentile(latencies, 95), percentile(other, 95))
+    results["queue"] = pool.metrics()
+    pool.shutdown()
+    return results
+
+# python -m Tests.password_hashing_tests runs the benchmark
+if __name__ == '__main__':
+    results = benchmark_login_latency()
+    for name in ("inline", "pool"):
+        print("%-6s login p50 %.1f ms, login p95 %.1f ms, other request p95 %.2f ms" % ((name, ) + results[name]))
+    print("average queue time of the pool: %.1f ms" % (results["queue"]["average_queue_seconds"] * 1000))
+
+#
+#  Test that a busy pool skips the renewal of an old hash but not the login
+#
+def test_rehash_busy(client, test_db):
+    old_hash = PasswordHasher(time_cost=1, memory_cost=512, parallelism=1).hash("Passw0rd!")
+    user = User(first_name = "Rehash", last_name = "Test", email = "rehash@ovgu.de", password_hash = old_hash)
+    test_db.add(user)
+    test_db.commit()
+    user_id = user.user_id
+
+    # the pool fills up between the verification and the new hash
+    def busy(password):
+        raise PasswordHashingBusy("busy")
+    original_hash_password = mutation_login.hash_password
+    mutation_login.hash_password = busy
+    try:
+        assert(login(client, "rehash@ovgu.de", "Passw0rd!") == (200, user_id)), "Login failed because the hash couldn't be renewed"
+    finally:
+        mutation_login.hash_password = original_hash_password
+
+    user = test_db.query(User).filter(User.user_id == user_id).one()
+    assert(user.password_hash == old_hash), "Hash was changed without renewal"
+    # the next login renews it
+    assert(login(client, "rehash@ovgu.de", "Passw0rd!")[0] == 200)
+    test_db.expire_all()
+    assert(test_db.query(User).filter(User.user_id == user_id).one().password_hash != old_hash), "Hash was not renewed by the next login"
@@ -0,0 +1,64 @@
+from app import create_app
+import rate_limit
+from rate_limit import MemoryBucketStore, RateLimiter
+from Tests.utils import count_queries
+
+app = create_app(start_services=False)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def execute_from(client, ip, mutation, email):
+    with app.test_request_context(environ_base={"REMOTE_ADDR": ip}):
+        executed = client.execute('''
+        mutation{
+            ''' + mutation + '''(email: "''' + email + '''"''' + (''', password: "wrong"''' if mutation == "login" else "") + '''){
+                statusCode
+                infoText
+            }
+        }''')
+        return executed['data'][mutation]
+
+#
+#  Test that logins and password resets are limited per ip and per account
+#
+def test_rate_limit(client, test_db):
+    config_limiter, config_limits = rate_limit.limiter, dict(rate_limit.rate_limits)
+    clock = FakeClock()
+    # the buckets are kept in the memory of the test instead of redis
+    rate_limit.limiter = RateLimiter(MemoryBucketStore(), clock=clock)
+    rate_limit.rate_limits["login"] = (rate_limit.parse_limit("4/60"), rate_limit.parse_limit("3/60"))
+    rate_limit.rate_limits["reset_password"] = (rate_limit.parse_limit("2/60"), rate_limit.parse_limit("1/3600"))
+    try:
+        msg = "Logins of one account are not limited"
+        codes = [execute_from(client, "10.0.0." + str(i), "login", "limited@ovgu.de")["statusCode"] for i in range(4)]
+        assert(codes == [404, 404, 404, 429]), msg + ": " + str(codes)
+
+        # other accounts of the same ip are limited by the ip
+        msg = "Logins of one ip are not limited"
+        codes = [execute_from(client, "10.0.1.1", "login", "other" + str(i) + "@ovgu.de")["statusCode"] for i in range(5)]
+        assert(codes == [404, 404, 404, 404, 429]), msg + ": " + str(codes)
+
+        msg = "Limited request did database work"
+        with count_queries(test_db.get_bind()) as counter:
+            rejected = execute_from(client, "10.0.1.1", "login", "another@ovgu.de")
+        assert(rejected["statusCode"] == 429 and "Sekunden" in rejected["infoText"]), msg
+        assert(counter.count == 0), msg
+
+        # the buckets are refilled over time
+        clock.now += 20
+        assert(execute_from(client, "10.0.0.9", "login", "limited@ovgu.de")["statusCode"] == 404), "Bucket is not refilled"
+        assert(execute_from(client, "10.0.0.9", "login", "LIMITED@ovgu.de")["statusCode"] == 429), "Account limit depends on the case of the email"
+
+        msg = "Password resets are not limited"
+        assert(execute_from(client, "10.0.2.1", "resetPassword", "reset@ovgu.de")["statusCode"] == 404), msg
+        assert(execute_from(client, "10.0.2.2", "resetPassword", "reset@ovgu.de")["statusCode"] == 429), msg
+        clock.now += 3600
+        assert(execute_from(client, "10.0.2.2", "resetPassword", "reset@ovgu.de")["statusCode"] == 404), msg
+    finally:
+        rate_limit.limiter = config_limiter
+        rate_limit.rate_limits.update(config_limits)
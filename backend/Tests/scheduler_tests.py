@@ -0,0 +1,167 @@
+import time
+from datetime import datetime, timedelta
+
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.schedulers.background import BackgroundScheduler
+
+import config
+import file_gc
+import scheduler as reminders
+from config import timezone
+from models import *
+from sendMail import sendMail
+from Tests.utils import count_queries
+
+def add_orders(test_db, prefix, count, start, end):
+    """
+    adds count orders from start till end with one user each
+    """
+    organization = Organization(name = prefix + " Organization", location = "Magdeburg")
+    orders = []
+    for i in range(count):
+        user = User(first_name = prefix, last_name = str(i), email = prefix + str(i) + "@ovgu.de", password_hash = "-")
+        physical_object = PhysicalObject(   inv_num_internal = i,
+                                            inv_num_external = i,
+                                            deposit = 0,
+                                            storage_location = "Shelf",
+                                            name = prefix + " Object " + str(i),
+                                            organization = organization)
+        order = Order(  creation_date = start - timedelta(days=7),
+                        from_date = start,
+                        till_date = end,
+                        organization = organization,
+                        users = [user])
+        order.addPhysicalObject(physical_object)
+        test_db.add(order)
+        orders.append(order)
+    test_db.commit()
+    return [order.order_id for order in orders]
+
+def dispatch_counted(test_db, now):
+    """
+    runs the dispatcher and returns the reminders it queued in the outbox
+    """
+    with count_queries(test_db.get_bind()) as counter:
+        reminders.dispatch_reminders(now = now)
+
+    queued = test_db.query(MailOutbox).filter(MailOutbox.subject == "Ovgu Ausleihsystem Reminder", MailOutbox.status == mailStatus.pending).all()
+    mails = [(mail.receiver, mail.body) for mail in queued]
+    # mark them as sent, so the next run only returns new reminders
+    for mail in queued:
+        mail.status = mailStatus.sent
+    test_db.commit()
+    return mails, counter.count
+
+#
+#  Test that one dispatcher sends all due reminders once
+#
+def test_reminder_dispatcher(client, test_db):
+    now = datetime(2024, 6, 1, 12)
+    picked_up = add_orders(test_db, "pickup", 3, now + timedelta(hours=20), now + timedelta(days=5))
+    returned = add_orders(test_db, "return", 2, now - timedelta(days=5), now + timedelta(hours=6, minutes=30))
+    later = add_orders(test_db, "later", 4, now + timedelta(days=3), now + timedelta(days=5))
+    due_ids = set(picked_up + returned)
+    later_ids = set(later)
+
+    mails, small_count = dispatch_counted(test_db, now)
+    msg = "Due reminders were not queued"
+    assert(len(mails) == 5), msg
+    assert(sorted(receiver for receiver, _ in mails) == ["pickup0@ovgu.de", "pickup1@ovgu.de", "pickup2@ovgu.de", "return0@ovgu.de", "return1@ovgu.de"]), msg
+    assert(any("18:30" in body for _, body in mails)), msg
+    reminded = set(order_id for order_id, in test_db.query(OrderReminder.order_id))
+    assert(reminded == due_ids), msg
+    assert(not reminded & later_ids), "Reminders of later orders were queued too early"
+
+    msg = "Reminders were queued twice"
+    assert(dispatch_counted(test_db, now)[0] == []), msg
+    assert(test_db.query(OrderReminder).count() == 5), msg
+
+    # the pickup of the later orders is due two days later
+    add_orders(test_db, "more", 40, now + timedelta(days=2, hours=20), now + timedelta(days=10))
+    mails, large_count = dispatch_counted(test_db, now + timedelta(days=2))
+    msg = "Reminders of the later orders were not queued"
+    assert(len(mails) == 44), msg
+    assert(large_count == small_count), "The dispatcher doesn't run with a constant number of queries"
+
+    # moved orders get their reminder again
+    reminders.reset_reminders(picked_up[0])
+    test_db.commit()
+    assert(len(dispatch_counted(test_db, now + timedelta(minutes=5))[0]) == 1), "Reset reminders were not queued again"
+
+    # reminders of cancelled orders are not sent anymore
+    reminders.reset_reminders(picked_up[1])
+    test_db.commit()
+    reminders.dispatch_reminders(now = now + timedelta(minutes=10))
+    reminders.CancelJob(picked_up[1])
+    test_db.commit()
+    assert(test_db.query(MailOutbox).filter(MailOutbox.idempotency_key.like(picked_up[1] + ":%"), MailOutbox.status == mailStatus.pending).count() == 0), "Reminders of cancelled orders were not removed from the outbox"
+
+#
+#  Test that status mails are queued once per order and minute and that old jobs are migrated
+#
+def test_status_mails(client, test_db):
+    now = datetime.now()
+    order_id = add_orders(test_db, "status", 1, now + timedelta(days=10), now + timedelta(days=20))[0]
+    order = test_db.query(Order).filter(Order.order_id == order_id).one()
+
+    def status_mails():
+        return test_db.query(MailOutbox).filter(MailOutbox.idempotency_key.like(order_id + ":status:%")).all()
+
+    reminders.status_change(order)
+    reminders.status_change(order)
+    test_db.commit()
+    msg = "Status mails were queued twice"
+    assert(len(status_mails()) == 1), msg
+    assert(status_mails()[0].receiver == "status0@ovgu.de"), msg
+
+    reminders.CancelJob(order_id)
+    test_db.commit()
+    assert(status_mails() == []), "Status mails were not cancelled"
+
+    # the jobs of the test are kept in memory and never executed
+    config_scheduler = reminders.get_scheduler
+    scheduler = BackgroundScheduler(jobstores={'default': MemoryJobStore()}, timezone=timezone)
+    scheduler.start(paused=True)
+    reminders.get_scheduler = lambda: scheduler
+    try:
+        # jobs of the old format only have the order id as name
+        pickup = reminders.local_time(order.from_date) - timedelta(days=1)
+        returned = reminders.local_time(order.till_date) - timedelta(days=1)
+        scheduler.add_job(name=order_id, func=sendMail, args=("status0@ovgu.de", "Ovgu Ausleihsystem Reminder", ""), trigger='date', run_date=pickup)
+        scheduler.add_job(name=order_id, func=sendMail, args=("status0@ovgu.de", "Ovgu Ausleihsystem Reminder", ""), trigger='date', run_date=returned)
+        scheduler.add_job(name=order_id, func=sendMail, args=("status0@ovgu.de", "Ovgu Ausleihsystem Statusänderung", ""), trigger='date', run_date=returned)
+
+        msg = "Old jobs were not migrated"
+        assert(reminders.migrate_jobs() == 3), msg
+        assert(reminders.migrate_jobs() == 0), msg
+        jobs = {job.id: job.trigger.run_date for job in scheduler.get_jobs()}
+        assert(jobs == {order_id + ":status": returned}), msg
+    finally:
+        scheduler.shutdown(wait=False)
+        reminders.get_scheduler = config_scheduler
+
+#
+#  Test that restarts don't move the next run of the periodic jobs
+#
+def test_periodic_jobs(client, test_db):
+    # the jobs of the test are kept in memory and never executed
+    config_scheduler = config._scheduler
+    scheduler = BackgroundScheduler(jobstores={'default': MemoryJobStore()}, timezone=timezone)
+    scheduler.start(paused=True)
+    config._scheduler = scheduler
+    try:
+        file_gc.schedule_file_gc()
+        next_run_time = scheduler.get_job(file_gc.job_id).next_run_time
+        time.sleep(0.01)
+
+        # the start of another worker adds the jobs again
+        file_gc.schedule_file_gc()
+        msg = "Next run of a periodic job was moved by a restart"
+        assert(scheduler.get_job(file_gc.job_id).next_run_time == next_run_time), msg
+        assert(len(scheduler.get_jobs()) == 1), msg
+
+        config.add_periodic_job(file_gc.job_id, "File garbage collection", file_gc.collect_garbage, hours=1)
+        assert(scheduler.get_job(file_gc.job_id).trigger.interval == timedelta(hours=1)), "Changed interval was not applied"
+    finally:
+        scheduler.shutdown(wait=False)
+        config._scheduler = config_scheduler
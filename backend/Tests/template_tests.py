@@ -0,0 +1,52 @@
+import os
+import tempfile
+
+from app import create_app
+import template_registry
+from template_registry import TemplateRegistry, legal_page_response
+
+app = create_app(start_services=False)
+
+#
+#  Test that templates are read once and again after they changed
+#
+def test_template_registry(client, test_db):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "mail.html")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write("<p>Hallo $name</p>")
+
+        registry = TemplateRegistry(directory)
+        first = registry.get("mail.html")
+        msg = "Template is read again although it didn't change"
+        assert(registry.get("mail.html") is first), msg
+        assert(registry.render("mail.html", name="Max") == "<p>Hallo Max</p>"), msg
+
+        with open(path, "w", encoding="utf-8") as file:
+            file.write("<p>Guten Tag $name</p>")
+        # file systems with a coarse modification time would hide the change otherwise
+        os.utime(path, ns=(first.mtime_ns + 10**9, first.mtime_ns + 10**9))
+        msg = "Changed template is not read again"
+        assert(registry.render("mail.html", name="Max") == "<p>Guten Tag Max</p>"), msg
+        assert(registry.get("mail.html").etag != first.etag), msg
+
+    # the legal pages are served from the registry
+    executed = client.execute('''
+    query{
+        getImprint
+    }''')
+    assert(executed['data']['getImprint'] == template_registry.template_registry.text("imprint.html")), "Imprint is not served from the registry"
+
+    with app.test_request_context('/legal/imprint'):
+        response = legal_page_response("imprint")
+        etag = response.get_etag()[0]
+        assert(response.status_code == 200 and etag), "Page has no ETag"
+
+    msg = "Unchanged page is transferred again"
+    with app.test_request_context('/legal/imprint', headers={"If-None-Match": '"' + etag + '"'}):
+        assert(legal_page_response("imprint").status_code == 304), msg
+    with app.test_request_context('/legal/imprint', headers={"If-Modified-Since": response.headers["Last-Modified"]}):
+        assert(legal_page_response("imprint").status_code == 304), msg
+
+    with app.test_request_context('/legal/unknown'):
+        assert(legal_page_response("unknown").status_code == 404), "Unknown page was served"
@@ -0,0 +1,112 @@
+import io
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+from models import *
+import file_storage
+import thumbnails
+from Tests.file_tests import add_file_admin, upload, delete
+
+def picture(width, height, format="JPEG"):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 40, 40)).save(buffer, format=format)
+    return buffer.getvalue()
+
+class BrokenExecutor:
+    """
+    pool whose processes died
+    """
+    def submit(self, *args):
+        raise BrokenProcessPool("A process in the process pool was terminated abruptly")
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+#
+#  Test that the background job creates the downscaled variants of pictures
+#
+def test_picture_variants(client, test_db):
+    directory = tempfile.mkdtemp()
+    config_directory = file_storage.picture_directory
+    file_storage.picture_directory = directory
+    # the pictures are processed in this process, the pool of the job is tested by its use
+    executor = ThreadPoolExecutor(max_workers=2)
+    try:
+        user_id, _, physical_object = add_file_admin(test_db)
+        photo = picture(2000, 1000)
+        first = upload(client, user_id, physical_object, FileStorage(stream=io.BytesIO(photo), filename="photo.jpg"))
+        svg = upload(client, user_id, physical_object, FileStorage(stream=io.BytesIO(b"<svg xmlns='http://www.w3.org/2000/svg'/>"), filename="logo.svg"))
+
+        msg = "Pictures were not processed"
+        assert(thumbnails.process_pending_pictures(executor=executor) == 2), msg
+        assert(thumbnails.process_pending_pictures(executor=executor) == 0), "Pictures were processed twice"
+
+        file = test_db.query(File).filter(File.path == first['file']['path']).one()
+        msg = "Variants are missing or too large"
+        for path, size in ((file.thumbnail_path, 320), (file.thumbnail_jpeg_path, 320), (file.preview_path, 960), (file.preview_jpeg_path, 960)):
+            with Image.open(os.path.join(directory, path)) as variant:
+                assert(variant.size == (size, size // 2)), msg
+        assert(file.thumbnail_path.endswith(".webp") and file.thumbnail_jpeg_path.endswith(".jpg")), msg
+        assert(file.placeholder.startswith("data:image/jpeg;base64,")), "Placeholder is missing"
+
+        msg = "Picture which can't be scaled doesn't use the original"
+        logo = test_db.query(File).filter(File.path == svg['file']['path']).one()
+        assert(logo.thumbnail_path == logo.preview_jpeg_path == logo.path and logo.placeholder == ""), msg
+
+        file_id, logo_id, placeholder = file.file_id, logo.file_id, file.placeholder
+        variants = [file.thumbnail_path, file.thumbnail_jpeg_path, file.preview_path, file.preview_jpeg_path]
+
+        # pictures which can't be read are tried again, a broken pool is replaced
+        with open(os.path.join(directory, "later.png"), "wb") as later:
+            later.write(picture(400, 400, "PNG"))
+        test_db.add_all([File(path = "missing.jpg", file_type = "picture"), File(path = "later.png", file_type = "picture")])
+        test_db.commit()
+        config_executor, thumbnails._executor = thumbnails._executor, BrokenExecutor()
+        try:
+            assert(thumbnails.process_pending_pictures() == 0), "Pictures of a broken pool were processed"
+            assert(thumbnails._executor is None), "Broken pool was not replaced"
+        finally:
+            thumbnails._executor = config_executor
+        assert(thumbnails.process_pending_pictures(executor=executor) == 1), "Picture was not processed after the pool was replaced"
+        msg = "Missing picture was not left for the next run"
+        assert(test_db.query(File.thumbnail_path).filter(File.path == "missing.jpg").scalar() is None), msg
+        assert(test_db.query(File.thumbnail_path).filter(File.path == "later.png").scalar() == "later_320.webp"), msg
+
+        # too large pictures are not decoded
+        config_pixels, thumbnails.max_pixels = thumbnails.max_pixels, 100 * 100
+        try:
+            huge = upload(client, user_id, physical_object, FileStorage(stream=io.BytesIO(picture(200, 200)), filename="huge.jpg"))
+            assert(thumbnails.process_pending_pictures(executor=executor) == 1)
+        finally:
+            thumbnails.max_pixels = config_pixels
+        huge_file = test_db.query(File).filter(File.path == huge['file']['path']).one()
+        assert(huge_file.thumbnail_path == huge_file.path), "Too large picture was decoded"
+
+        for file_path in ("missing.jpg", "later.png", huge['file']['path']):
+            assert(delete(client, user_id, test_db.query(File.file_id).filter(File.path == file_path).scalar()) == 200)
+
+        # the same content uploaded again gets the existing variants without processing it again
+        again = upload(client, user_id, physical_object, FileStorage(stream=io.BytesIO(photo), filename="again.jpg"))
+        files_before = sorted(os.listdir(directory))
+        assert(thumbnails.process_pending_pictures(executor=executor) == 1)
+        copied = test_db.query(File).filter(File.path == again['file']['path'], File.file_id != file_id).one()
+        msg = "Variants of the same content were not reused"
+        assert(copied.thumbnail_path == variants[0] and copied.placeholder == placeholder), msg
+        assert(sorted(os.listdir(directory)) == files_before), msg
+
+        msg = "Variants were not removed with their content"
+        for id in (file_id, copied.file_id):
+            assert(delete(client, user_id, id) == 200), msg
+        assert(not any(os.path.exists(os.path.join(directory, path)) for path in variants)), msg
+        assert(delete(client, user_id, logo_id) == 200)
+        assert(os.listdir(directory) == []), msg
+    finally:
+        executor.shutdown()
+        file_storage.picture_directory = config_directory
+        shutil.rmtree(directory, ignore_errors=True)
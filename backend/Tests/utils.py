@@ -1,3 +1,5 @@
+from sqlalchemy import event
+
 #https://github.com/graphql-python/graphene-sqlalchemy/blob/master/graphene_sqlalchemy/tests/utils.py
 
 # ONLY USE FOR TESTING QUERIES ETC. WHERE YOU KNOW THAT IF THERE ARE NESTED DICTS AND LISTS THEY HAVE THE SAME KEYs
@@ -35,4 +37,22 @@ def find_key_to_sort(val):
         if not isinstance(tmp[k], (dict, list)):
             sortby = k
             break
-    return sortby
\ No newline at end of file
+    return sortby
+
+class count_queries:
+    """Context manager which counts the SQL statements executed on the given engine.\n
+    with count_queries(engine) as counter: ... counter.count
+    """
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _count(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._count)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._count)
@@ -0,0 +1,25 @@
+"""Add index on the time range of orders
+
+Revision ID: a4c1d7e2b9f3
+Revises: 6d4f068e9d8a
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4c1d7e2b9f3'
+down_revision: Union[str, None] = '6d4f068e9d8a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_order_from_date_till_date', 'order', ['from_date', 'till_date'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_order_from_date_till_date', table_name='order')
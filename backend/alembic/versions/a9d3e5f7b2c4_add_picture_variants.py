@@ -0,0 +1,35 @@
+"""Add downscaled variants of pictures
+
+Revision ID: a9d3e5f7b2c4
+Revises: f8c2d4e6a1b3
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9d3e5f7b2c4'
+down_revision: Union[str, None] = 'f8c2d4e6a1b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # existing pictures get their variants from the thumbnail job
+    op.add_column('file', sa.Column('thumbnail_path', sa.String(length=600), nullable=True))
+    op.add_column('file', sa.Column('thumbnail_jpeg_path', sa.String(length=600), nullable=True))
+    op.add_column('file', sa.Column('preview_path', sa.String(length=600), nullable=True))
+    op.add_column('file', sa.Column('preview_jpeg_path', sa.String(length=600), nullable=True))
+    op.add_column('file', sa.Column('placeholder', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('file', 'placeholder')
+    op.drop_column('file', 'preview_jpeg_path')
+    op.drop_column('file', 'preview_path')
+    op.drop_column('file', 'thumbnail_jpeg_path')
+    op.drop_column('file', 'thumbnail_path')
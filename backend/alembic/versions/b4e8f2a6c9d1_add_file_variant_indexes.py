@@ -0,0 +1,31 @@
+"""Index the variant paths of files for the garbage collection
+
+Revision ID: b4e8f2a6c9d1
+Revises: a9d3e5f7b2c4
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4e8f2a6c9d1'
+down_revision: Union[str, None] = 'a9d3e5f7b2c4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_file_thumbnail_path', 'file', ['thumbnail_path'], unique=False)
+    op.create_index('ix_file_thumbnail_jpeg_path', 'file', ['thumbnail_jpeg_path'], unique=False)
+    op.create_index('ix_file_preview_path', 'file', ['preview_path'], unique=False)
+    op.create_index('ix_file_preview_jpeg_path', 'file', ['preview_jpeg_path'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_file_preview_jpeg_path', table_name='file')
+    op.drop_index('ix_file_preview_path', table_name='file')
+    op.drop_index('ix_file_thumbnail_jpeg_path', table_name='file')
+    op.drop_index('ix_file_thumbnail_path', table_name='file')
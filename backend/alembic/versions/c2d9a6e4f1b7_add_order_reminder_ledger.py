@@ -0,0 +1,34 @@
+"""Add ledger for the reminder dispatcher
+
+Revision ID: c2d9a6e4f1b7
+Revises: b7e2f5a1c3d8
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2d9a6e4f1b7'
+down_revision: Union[str, None] = 'b7e2f5a1c3d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('order_reminder',
+    sa.Column('order_id', sa.String(length=36), nullable=False),
+    sa.Column('kind', sa.String(length=10), nullable=False),
+    sa.Column('sent_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['order_id'], ['order.order_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('order_id', 'kind')
+    )
+    op.create_index('ix_order_till_date', 'order', ['till_date'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_order_till_date', table_name='order')
+    op.drop_table('order_reminder')
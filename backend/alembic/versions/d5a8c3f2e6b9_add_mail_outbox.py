@@ -0,0 +1,42 @@
+"""Add outbox for mails
+
+Revision ID: d5a8c3f2e6b9
+Revises: c2d9a6e4f1b7
+Create Date: 2026-10-18 20:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a8c3f2e6b9'
+down_revision: Union[str, None] = 'c2d9a6e4f1b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('mail_outbox',
+    sa.Column('mail_id', sa.String(length=36), nullable=False),
+    sa.Column('idempotency_key', sa.String(length=120), nullable=False),
+    sa.Column('receiver', sa.String(length=120), nullable=False),
+    sa.Column('subject', sa.String(length=200), nullable=False),
+    sa.Column('body', sa.Text(), nullable=False),
+    sa.Column('status', sa.Enum('pending', 'sent', 'failed', name='mailstatus'), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('last_error', sa.String(length=500), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('send_after', sa.DateTime(), nullable=False),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('mail_id'),
+    sa.UniqueConstraint('idempotency_key')
+    )
+    op.create_index('ix_mail_outbox_status_send_after', 'mail_outbox', ['status', 'send_after'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_mail_outbox_status_send_after', table_name='mail_outbox')
+    op.drop_table('mail_outbox')
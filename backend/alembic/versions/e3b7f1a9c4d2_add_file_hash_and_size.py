@@ -0,0 +1,28 @@
+"""Add content hash and size to files
+
+Revision ID: e3b7f1a9c4d2
+Revises: d5a8c3f2e6b9
+Create Date: 2026-10-18 21:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3b7f1a9c4d2'
+down_revision: Union[str, None] = 'd5a8c3f2e6b9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('file', sa.Column('sha256', sa.String(length=64), nullable=True))
+    op.add_column('file', sa.Column('size', sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('file', 'size')
+    op.drop_column('file', 'sha256')
@@ -0,0 +1,40 @@
+"""Store file contents once per sha256
+
+Revision ID: f8c2d4e6a1b3
+Revises: e3b7f1a9c4d2
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f8c2d4e6a1b3'
+down_revision: Union[str, None] = 'e3b7f1a9c4d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('file_blob',
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('file_type', sa.Enum('picture', 'pdf', 'other', name='filetype'), nullable=False),
+    sa.Column('path', sa.String(length=600), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('sha256', 'file_type'),
+    sa.UniqueConstraint('path')
+    )
+    # files with the same content share their path
+    op.drop_index('path', table_name='file')
+    op.create_index('ix_file_path', 'file', ['path'], unique=False)
+    op.create_index('ix_file_sha256', 'file', ['sha256'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_file_sha256', table_name='file')
+    op.drop_index('ix_file_path', table_name='file')
+    op.create_index('path', 'file', ['path'], unique=True)
+    op.drop_table('file_blob')
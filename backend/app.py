@@ -1,90 +1,133 @@
 import graphene
-from sqlalchemy import inspect
-from flask_graphql import GraphQLView
-from flask import Flask, jsonify
+from datetime import timedelta
+from flask import Flask, jsonify, session
+from flask_cors import CORS
+from flask_session import Session
 from graphene_file_upload.flask import FileUploadGraphQLView as UploadView
-from argon2 import PasswordHasher
-
-from config import app, db, engine, application_root_user_name, application_root_user_password
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from config import db, get_engine, get_scheduler, reset_after_fork, database_url, engine_options, secret_key, scheduler_mode, preload_app, max_picture_size, max_pdf_size
+from leader_election import start_leader_election
+from outbox import enable_mail_delivery, outbox_metrics, schedule_outbox_dispatcher
+from db_pool import pool_metrics
+from password_hashing import hashing_metrics
+from scheduler import schedule_reminder_dispatcher
 from schema_queries import Query
 from schema_mutations import Mutations
-from models import Base, userRights
-from schema import UserModel, OrganizationModel, Organization_UserModel
-
-# Create tables if they don't exist
-inspector = inspect(engine)
-if not inspector.has_table('users'):
-    print("Creating tables")
-    Base.metadata.create_all(engine)
-
-# check if root organization exists
-root_organization = OrganizationModel.query.filter(OrganizationModel.name == "root_organization").first()
-if (root_organization is None):
-    root_organization = OrganizationModel(
-        name = "root_organization",
-        location = "application"
-    )
-
-    db.add(root_organization)
-    db.commit()
-
-# check if root user exists
-root_user = UserModel.query.filter(UserModel.email == application_root_user_name).first()
-if (root_user is None):
-    ph = PasswordHasher()
-    password_hashed = ph.hash(application_root_user_password)
-    root_user = UserModel(
-        first_name = "", 
-        last_name = "", 
-        email = application_root_user_name, 
-        password_hash = password_hashed
-    )
-
-    db.add(root_user)
-    db.commit()
-
-# check if root user is in root organization
-root_user_in_organization = Organization_UserModel.query.filter(Organization_UserModel.user == root_user and Organization_UserModel.organization == root_organization).first()
-if (root_user_in_organization is None):
-    root_user_in_organization = Organization_UserModel(
-        organization_id = root_organization.organization_id,
-        user_id = root_user.user_id,
-        rights = userRights.system_admin
+from authorization_check import is_authorised, reject_message
+from models import userRights
+from template_registry import legal_page_response
+from thumbnails import schedule_thumbnail_job
+from file_gc import schedule_file_gc
+
+##################################
+# Application factory            #
+##################################
+def create_app(start_services=True):
+    """
+    creates the flask app, the database is connected with the first request
+    the tables and the root user are created by python -m bootstrap
+    start_services=False leaves out the scheduled jobs and background threads (tests, scripts)
+    """
+    app = Flask(__name__)
+    app.debug = True
+
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1)
+
+    app.secret_key = secret_key
+    app.config['SESSION_TYPE'] = 'sqlalchemy'
+    # app.config['SESSION_PERMANENT'] = False
+    # app.config['SESSION_COOKIE_SAMESITE'] = 'None'
+    # app.config['SESSION_COOKIE_SECURE'] = False
+    # app.config['SESSION_COOKIE_HTTPONLY'] = False
+    app.permanent_session_lifetime = timedelta(hours=2)
+    # larger requests are rejected before they are read, 1 MB is left for the other fields of the upload
+    app.config['MAX_CONTENT_LENGTH'] = max(max_picture_size, max_pdf_size) + 1024 * 1024
+
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url()
+    # the sessions are stored with their own engine, its connections are checked and recycled like the others
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {key: value for key, value in engine_options().items() if key in ("pool_recycle", "pool_pre_ping")}
+
+    CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
+    Session(app)
+
+    schema = graphene.Schema(query=Query, mutation=Mutations)
+
+    app.add_url_rule(
+        '/graphql',
+        view_func=UploadView.as_view(
+            'graphql',
+            schema=schema,
+            graphiql=True
+        )
     )
 
-    db.add(root_user_in_organization)
-    db.commit()
-
-if (root_user_in_organization.rights != userRights.system_admin):
-    root_user_in_organization.rights = userRights.system_admin
-    db.commit()
-
-schema = graphene.Schema(query=Query, mutation=Mutations)
-
-app.add_url_rule(
-    '/graphql',
-    view_func=UploadView.as_view(
-        'graphql',
-        schema=schema,
-        graphiql=True
-    )
-)
-
-@app.teardown_appcontext
-def shutdown_session(exception=None):
-    db.remove()
-
-def check_for_return_dates():
-    pass
-
-@app.route("/")
-def hello():
-    return "<h1>Hello World</h1>"
-
-@app.route('/health')
-def health():
-    return jsonify(status="healthy"), 200
+    @app.teardown_appcontext
+    def shutdown_session(exception=None):
+        db.remove()
+
+    @app.route("/")
+    def hello():
+        return "<h1>Hello World</h1>"
+
+    @app.route('/health')
+    def health():
+        return jsonify(status="healthy"), 200
+
+    @app.route('/legal/<page>')
+    def legal_page(page):
+        return legal_page_response(page)
+
+    @app.route('/metrics')
+    def metrics():
+        # the metrics show the load and the queued mails, only system admins can read them
+        user_id = session.get('user_id')
+        if user_id is None:
+            return jsonify(info_text="Keine valide session vorhanden"), 419
+        if not is_authorised(userRights.system_admin, user_id):
+            return jsonify(info_text=reject_message), 403
+        return jsonify(outbox=outbox_metrics(), password_hashing=hashing_metrics(), database_pool=pool_metrics(get_engine())), 200
+
+    # with preload_app the master creates the app, the services are started in every worker by after_fork
+    if start_services and not preload_app:
+        start_background_services()
+    return app
+
+def after_fork(app):
+    """
+    prepares a gunicorn worker which was forked from the master after it created the app (post_fork in gunicorn.conf.py)
+    the worker gets its own database connections and starts its own background services
+    """
+    reset_after_fork()
+    # the sessions of flask are stored with a separate engine
+    with app.app_context():
+        app.session_interface.client.engine.dispose(close=False)
+    start_background_services()
+
+def start_background_services():
+    """
+    adds the periodic jobs and starts the background threads of this process
+    """
+    scheduler = get_scheduler()
+
+    # one periodic job queues the reminders of all orders, another one sends the mails of the outbox
+    schedule_reminder_dispatcher()
+    schedule_outbox_dispatcher()
+    # the variants of uploaded pictures are created in the background
+    schedule_thumbnail_job()
+    # files left behind by deleted objects and interrupted uploads are removed once a day
+    schedule_file_gc()
+
+    # mails of requests are sent by a background thread right after their commit
+    enable_mail_delivery()
+
+    # only the worker holding the lease executes the scheduled jobs
+    if scheduler_mode == "leader":
+        start_leader_election(scheduler)
 
 # for local testing
 if __name__ == '__main__':
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    from bootstrap import bootstrap
+
+    bootstrap()
+    create_app().run(host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,159 @@
+from datetime import date, datetime, time, timedelta
+
+from config import db
+from models import orderStatus, Group, Order, PhysicalObject, PhysicalObject_Order, Tag
+
+# orders in these states don't block their physical objects anymore
+released_statuses = (orderStatus.rejected, orderStatus.returned)
+
+##################################
+# Availability of objects        #
+##################################
+def to_interval(start, end):
+    """
+    returns the half open interval [start, end) as datetimes
+    dates are taken as whole days, so end date is included
+    """
+    if not isinstance(start, datetime) and isinstance(start, date):
+        start = datetime.combine(start, time.min)
+    if not isinstance(end, datetime) and isinstance(end, date):
+        end = datetime.combine(end + timedelta(days=1), time.min)
+    return start, end
+
+
+def blocking_orders_query(phys_ids, start, end, session=None):
+    """
+    query for (phys_id, order_id, from_date, till_date) of every order which blocks one of the given objects in [start, end)
+    rejected and returned objects don't block
+    """
+    session = session or db
+    start, end = to_interval(start, end)
+    return session.query(PhysicalObject_Order.phys_id, Order.order_id, Order.from_date, Order.till_date) \
+        .join(Order, Order.order_id == PhysicalObject_Order.order_id) \
+        .filter(PhysicalObject_Order.phys_id.in_(phys_ids),
+                PhysicalObject_Order.order_status.notin_(released_statuses),
+                Order.from_date < end,
+                Order.till_date > start)
+
+
+def unavailable_objects(phys_ids, start, end, exclude_order_id=None, session=None):
+    """
+    returns the set of the given phys_ids which are blocked by an order in [start, end)
+    exclude_order_id ignores the given order, e.g. when an order is moved
+    """
+    query = blocking_orders_query(phys_ids, start, end, session)
+    if exclude_order_id:
+        query = query.filter(Order.order_id != exclude_order_id)
+    return set(phys_id for phys_id, _, _, _ in query.all())
+
+
+def lock_physical_objects(phys_ids, session=None):
+    """
+    loads the given physical objects with SELECT ... FOR UPDATE
+    concurrent transactions booking one of them wait until this transaction ends,
+    the rows are locked in primary key order so two bookings can't deadlock
+    """
+    session = session or db
+    return session.query(PhysicalObject) \
+        .filter(PhysicalObject.phys_id.in_(phys_ids)) \
+        .order_by(PhysicalObject.phys_id) \
+        .with_for_update() \
+        .all()
+
+
+def is_available(phys_id, start, end, session=None):
+    """
+    checks a single object for a single range
+    """
+    return phys_id not in unavailable_objects([phys_id], start, end, session=session)
+
+
+def availability(phys_ids, ranges, session=None):
+    """
+    checks many objects for many ranges at once
+    ranges is a list of (start, end) tuples
+    returns a dict (phys_id, range index) -> is_available
+
+    all orders overlapping any of the ranges are fetched with one query and matched in memory
+    """
+    intervals = [to_interval(start, end) for start, end in ranges]
+    result = {(phys_id, index): True for phys_id in phys_ids for index in range(len(intervals))}
+    if not phys_ids or not intervals:
+        return result
+
+    window_start = min(start for start, _ in intervals)
+    window_end = max(end for _, end in intervals)
+
+    # intervals sorted by start, so every order only has to look at the ranges starting before it ends
+    sorted_intervals = sorted(enumerate(intervals), key=lambda interval: interval[1][0])
+    for phys_id, _, from_date, till_date in blocking_orders_query(phys_ids, window_start, window_end, session).all():
+        for index, (start, end) in sorted_intervals:
+            if start >= till_date:
+                break
+            if from_date < end:
+                result[(phys_id, index)] = False
+
+    return result
+
+
+##################################
+# Occupancy calendar             #
+##################################
+# longest window the calendar can be requested for
+max_calendar_days = 366
+
+def occupied_days(from_date, till_date):
+    """
+    returns the first and the last day an order occupies
+    an order ending exactly at midnight doesn't occupy that day (same as the [start, end) intervals above)
+    """
+    last_day = till_date.date()
+    if till_date.time() == time.min and till_date > from_date:
+        last_day -= timedelta(days=1)
+    return from_date.date(), last_day
+
+
+def occupancy_calendar(organization_id, start_date, end_date, tags=None, groups=None, session=None):
+    """
+    returns a list of (phys_id, name, occupancy) for every physical object of the organization
+    occupancy is a string with one character per day from start_date to end_date, "1" if the object is occupied on that day
+
+    the objects and all their orders in the window are fetched with one query each,
+    every order is rasterised into an integer bitmask with a single shift instead of looping over its days
+    """
+    session = session or db
+    days = (end_date - start_date).days + 1
+    if days < 1:
+        raise ValueError("Das Enddatum muss nach dem Startdatum liegen.")
+    if days > max_calendar_days:
+        raise ValueError("Der Kalender kann für maximal " + str(max_calendar_days) + " Tage abgefragt werden.")
+
+    objects = session.query(PhysicalObject.phys_id, PhysicalObject.name) \
+        .filter(PhysicalObject.organization_id == organization_id)
+    if tags:
+        objects = objects.filter(PhysicalObject.tags.any(Tag.tag_id.in_(tags)))
+    if groups:
+        objects = objects.filter(PhysicalObject.groups.any(Group.group_id.in_(groups)))
+
+    start, end = to_interval(start_date, end_date)
+    orders = session.query(PhysicalObject_Order.phys_id, Order.from_date, Order.till_date) \
+        .join(Order, Order.order_id == PhysicalObject_Order.order_id) \
+        .filter(Order.organization_id == organization_id,
+                PhysicalObject_Order.order_status.notin_(released_statuses),
+                Order.from_date < end,
+                Order.till_date > start)
+    if tags or groups:
+        orders = orders.filter(PhysicalObject_Order.phys_id.in_(objects.with_entities(PhysicalObject.phys_id)))
+
+    bitmaps = {}
+    for phys_id, from_date, till_date in orders.all():
+        first_day, last_day = occupied_days(from_date, till_date)
+        first = max((first_day - start_date).days, 0)
+        last = min((last_day - start_date).days, days - 1)
+        if first > last:
+            continue
+        bitmaps[phys_id] = bitmaps.get(phys_id, 0) | (((1 << (last - first + 1)) - 1) << first)
+
+    # bit 0 is the first day, so the binary representation has to be reversed
+    return [(phys_id, name, format(bitmaps.get(phys_id, 0), "0" + str(days) + "b")[::-1])
+            for phys_id, name in objects.order_by(PhysicalObject.name, PhysicalObject.phys_id).all()]
@@ -0,0 +1,117 @@
+from promise import Promise
+from promise.dataloader import DataLoader
+from sqlalchemy import inspect, tuple_
+from sqlalchemy.orm import object_session
+from sqlalchemy.orm.attributes import set_committed_value
+from graphene_sqlalchemy import SQLAlchemyObjectType
+from graphene_sqlalchemy.fields import BatchSQLAlchemyConnectionField
+
+from pagination import CountableConnection
+
+##################################
+# Batched relationship loading   #
+##################################
+class RelationshipLoader(DataLoader):
+    """
+    Collects all parents of one relationship that are resolved on the same level of a GraphQL request
+    and loads their children with a single IN (...) query.
+    DataLoader is thread local and cache is disabled, so nothing is shared between requests.
+    """
+    cache = False
+
+    def __init__(self, relationship_prop):
+        super(RelationshipLoader, self).__init__()
+        self.relationship_prop = relationship_prop
+
+    def batch_load_fn(self, parents):
+        relationship_prop = self.relationship_prop
+        key = relationship_prop.key
+
+        # only query the parents which don't have the relationship loaded yet
+        unloaded = {}
+        for parent in parents:
+            state = inspect(parent)
+            if key in state.unloaded and state.identity is not None:
+                unloaded[state.identity] = parent
+
+        if unloaded:
+            children = load_children(relationship_prop, object_session(parents[0]), list(unloaded.keys()))
+            for identity, parent in unloaded.items():
+                found = children.get(identity, [])
+                if relationship_prop.uselist:
+                    set_committed_value(parent, key, found)
+                else:
+                    set_committed_value(parent, key, found[0] if found else None)
+
+        return Promise.resolve([getattr(parent, key) for parent in parents])
+
+
+def load_children(relationship_prop, session, identities):
+    """
+    returns a dict of parent identity -> list of children for the given relationship
+    all children of all parents are fetched in one statement
+    """
+    parent_entity = relationship_prop.parent.entity
+    child_entity = relationship_prop.mapper.entity
+    primary_key = [getattr(parent_entity, relationship_prop.parent.get_property_by_column(column).key)
+                   for column in relationship_prop.parent.primary_key]
+
+    if len(primary_key) == 1:
+        key_filter = primary_key[0].in_([identity[0] for identity in identities])
+    else:
+        key_filter = tuple_(*primary_key).in_(identities)
+
+    rows = session.query(*primary_key, child_entity) \
+        .select_from(parent_entity) \
+        .join(getattr(parent_entity, relationship_prop.key)) \
+        .filter(key_filter) \
+        .all()
+
+    children = {}
+    for row in rows:
+        children.setdefault(tuple(row[:-1]), []).append(row[-1])
+    return children
+
+
+def get_batch_resolver(relationship_prop):
+    """
+    returns a graphene resolver which resolves the relationship through a RelationshipLoader
+    """
+    loader = RelationshipLoader(relationship_prop)
+
+    def resolve(root, info, **args):
+        return loader.load(root)
+
+    return resolve
+
+
+def batch_connection_field_factory(relationship_prop, registry, **field_kwargs):
+    """
+    connection_field_factory for 1:n and m:n relationships
+    """
+    model_type = registry.get_type_for_model(relationship_prop.mapper.entity)
+    return BatchSQLAlchemyConnectionField(model_type.connection, resolver=get_batch_resolver(relationship_prop), **field_kwargs)
+
+
+class BatchingObjectType(SQLAlchemyObjectType):
+    """
+    SQLAlchemyObjectType which resolves all relationships of its model in batches
+    (graphene_sqlalchemy's own batching option does not work with SQLAlchemy 1.4)
+    its connections additionally have a totalCount field
+    """
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def __init_subclass_with_meta__(cls, model=None, connection_field_factory=None, connection_class=None, **options):
+        # graphene_sqlalchemy picks up resolve_<name> for 1:1 and n:1 relationships
+        for relationship_prop in inspect(model).relationships:
+            if not relationship_prop.uselist and not hasattr(cls, "resolve_" + relationship_prop.key):
+                setattr(cls, "resolve_" + relationship_prop.key, staticmethod(get_batch_resolver(relationship_prop)))
+
+        super(BatchingObjectType, cls).__init_subclass_with_meta__(
+            model=model,
+            connection_field_factory=connection_field_factory or batch_connection_field_factory,
+            connection_class=connection_class or CountableConnection,
+            **options
+        )
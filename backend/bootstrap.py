@@ -0,0 +1,61 @@
+from sqlalchemy import inspect
+
+from config import db, get_engine, application_root_user_name, application_root_user_password
+from models import Base, userRights
+from password_hashing import hash_password
+from schema import UserModel, OrganizationModel, Organization_UserModel
+
+def bootstrap():
+    """
+    creates the tables if they don't exist and the root organization with the root user as system admin
+    runs once per deployment before the web app is started (python -m bootstrap), running it again changes nothing
+    """
+    # Create tables if they don't exist
+    inspector = inspect(get_engine())
+    if not inspector.has_table('user'):
+        print("Creating tables")
+        Base.metadata.create_all(get_engine())
+
+    # check if root organization exists
+    root_organization = OrganizationModel.query.filter(OrganizationModel.name == "root_organization").first()
+    if (root_organization is None):
+        root_organization = OrganizationModel(
+            name = "root_organization",
+            location = "application"
+        )
+
+        db.add(root_organization)
+        db.commit()
+
+    # check if root user exists
+    root_user = UserModel.query.filter(UserModel.email == application_root_user_name).first()
+    if (root_user is None):
+        password_hashed = hash_password(application_root_user_password)
+        root_user = UserModel(
+            first_name = "",
+            last_name = "",
+            email = application_root_user_name,
+            password_hash = password_hashed
+        )
+
+        db.add(root_user)
+        db.commit()
+
+    # check if root user is in root organization
+    root_user_in_organization = Organization_UserModel.query.filter(Organization_UserModel.user == root_user and Organization_UserModel.organization == root_organization).first()
+    if (root_user_in_organization is None):
+        root_user_in_organization = Organization_UserModel(
+            organization_id = root_organization.organization_id,
+            user_id = root_user.user_id,
+            rights = userRights.system_admin
+        )
+
+        db.add(root_user_in_organization)
+        db.commit()
+
+    if (root_user_in_organization.rights != userRights.system_admin):
+        root_user_in_organization.rights = userRights.system_admin
+        db.commit()
+
+if __name__ == '__main__':
+    bootstrap()
@@ -1,22 +1,18 @@
 from dotenv import load_dotenv
-from datetime import timedelta
 
-from flask import Flask
-from flask_cors import CORS
-from flask_session import Session
 import os
 import socket
+import threading
+from datetime import timedelta
 from sqlalchemy import create_engine
-from sqlalchemy.orm import scoped_session, sessionmaker
-import redis
+from sqlalchemy.orm import Session, scoped_session, sessionmaker
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
-from apscheduler.executors.pool import ThreadPoolExecutor
 import pytz
-from werkzeug.middleware.proxy_fix import ProxyFix
+
+from db_pool import MeteredQueuePool
 
 hostname = socket.gethostname()
-print("Hostname: ", hostname)
 
 # Read config file on host
 if not (hostname == "container"):
@@ -29,11 +25,15 @@ db_database = os.getenv('database_name')
 db_port     = os.getenv('database_port')
 db_user     = os.getenv('database_user')
 
-# Read database password from file or env variable
-db_pw = os.getenv('database_password')
-if db_pw is None or db_pw == "":
-    with open(os.getenv('database_password_location'), 'r') as f:
-        db_pw = f.read().strip()
+# Connection pool of every process, at most db_pool_size + db_max_overflow connections are open at the same time
+# and a request waits up to db_pool_timeout seconds for a free connection
+db_pool_size        = int(os.getenv('db_pool_size') or 5)
+db_max_overflow     = int(os.getenv('db_max_overflow') or 10)
+db_pool_timeout     = int(os.getenv('db_pool_timeout') or 30)
+# seconds after which a connection is replaced, has to be below wait_timeout of mysql (8 hours by default)
+db_pool_recycle     = int(os.getenv('db_pool_recycle') or 3600)
+# 1: connections are checked before they are used, connections closed by the server are replaced instead of failing the request
+db_pool_pre_ping    = int(os.getenv('db_pool_pre_ping') or 1)
 
 # Paths
 root_directory          = os.getenv('root_directory')
@@ -44,12 +44,38 @@ picture_directory       = os.path.join(root_directory, tmp_picture_directory)
 pdf_directory           = os.path.join(root_directory, tmp_pdf_directory)
 template_directory      = os.path.join(root_directory, tmp_template_directory)
 
+# Uploads
+# largest picture and pdf in MB, checked while the upload is written to disk
+max_picture_size        = int(os.getenv('max_picture_size') or 100) * 1024 * 1024
+max_pdf_size            = int(os.getenv('max_pdf_size') or 100) * 1024 * 1024
+# bytes read and written at once
+upload_chunk_size       = 1024 * 1024
+# processes creating the downscaled variants of pictures and seconds between two runs of the job
+image_workers           = int(os.getenv('image_workers') or 2)
+thumbnail_interval      = int(os.getenv('thumbnail_interval') or 30)
+# hours between two runs of the garbage collection of files without database entry
+# files younger than file_gc_min_age hours are kept, their upload may not be committed yet
+file_gc_interval        = int(os.getenv('file_gc_interval') or 24)
+file_gc_min_age         = int(os.getenv('file_gc_min_age') or 24)
+# orphaned files are moved to this directory instead of being deleted
+file_gc_quarantine_directory = os.getenv('file_gc_quarantine_directory') or None
+
 # Mail
 mail_server_address     = os.getenv('mail_server_address')
 mail_server_port        = os.getenv('mail_server_port')
 use_ssl                 = os.getenv('use_ssl')
 sender_email_address    = os.getenv('sender_email_address')
 sender_email_password   = os.getenv('sender_email_password')
+# connections to the mail server kept open per process
+mail_pool_size          = int(os.getenv('mail_pool_size') or 4)
+# seconds between two runs of the outbox dispatcher
+outbox_interval         = int(os.getenv('outbox_interval') or 10)
+# mails claimed by the outbox dispatcher at once
+outbox_batch_size       = int(os.getenv('outbox_batch_size') or 50)
+# failed mails are retried with exponential backoff until they failed this often
+outbox_max_attempts     = int(os.getenv('outbox_max_attempts') or 8)
+# sent and failed mails are deleted after this many days
+outbox_retention_days   = int(os.getenv('outbox_retention_days') or 30)
 
 # Secret key
 secret_key = os.getenv("secret_key")
@@ -57,6 +83,44 @@ secret_key = os.getenv("secret_key")
 # Timezone
 timezone_string         = os.getenv('timezone')
 
+# Scheduler
+# in_process: the scheduler of the web app executes the jobs (only one gunicorn worker possible)
+# worker: the web app only stores the jobs, they are executed by python -m worker
+# leader: the web worker holding the lease in the database executes the jobs
+scheduler_mode          = os.getenv('scheduler_mode') or "in_process"
+# seconds after which the worker looks for jobs added by the web app
+scheduler_poll_interval = int(os.getenv('scheduler_poll_interval') or 10)
+# seconds until the lease of the leader expires if it isn't renewed
+scheduler_lease_duration = int(os.getenv('scheduler_lease_duration') or 30)
+# minutes between two runs of the reminder dispatcher
+reminder_interval       = int(os.getenv('reminder_interval') or 5)
+
+# Gunicorn
+# 1: the gunicorn master imports the app once and forks the workers from it (gunicorn.conf.py),
+# the background services are then started in every worker after the fork
+preload_app             = int(os.getenv('preload_app') or 0)
+
+# Password hashing (argon2)
+# the defaults are the ones of argon2-cffi, hashes with other parameters are renewed at the next login
+argon2_time_cost        = int(os.getenv('argon2_time_cost') or 3)
+argon2_memory_cost      = int(os.getenv('argon2_memory_cost') or 65536)
+argon2_parallelism      = int(os.getenv('argon2_parallelism') or 4)
+# passwords hashed at the same time per process, further requests wait
+password_hash_workers   = int(os.getenv('password_hash_workers') or 2)
+# requests waiting for hashing per process, further requests are rejected, 0 for no limit
+password_hash_queue_limit = int(os.getenv('password_hash_queue_limit') or 32)
+
+# Rate limits as "<requests>/<seconds>", the requests can be used at once and are refilled evenly over the seconds
+login_rate_limit_ip         = os.getenv('login_rate_limit_ip') or "30/60"
+login_rate_limit_account    = os.getenv('login_rate_limit_account') or "10/60"
+reset_rate_limit_ip         = os.getenv('reset_rate_limit_ip') or "5/300"
+reset_rate_limit_account    = os.getenv('reset_rate_limit_account') or "3/3600"
+# memory: limits per process, or the url of a redis server shared by all processes (e.g. redis://redis:6379/0)
+rate_limit_storage          = os.getenv('rate_limit_storage') or "memory"
+
+# Seconds the rights of a user are cached across requests, 0 disables the cache
+authorization_cache_ttl = int(os.getenv('authorization_cache_ttl') or 0)
+
 # Testing
 testing_on = 0
 
@@ -64,40 +128,108 @@ testing_on = 0
 application_root_user_name      = os.getenv('root_user_name')
 application_root_user_password  = os.getenv('root_user_password')
 
-if not (int)(testing_on):
-    database_connection_string = 'mysql://' + db_user + ':' + db_pw + '@' + db_host + ":" + db_port + '/' + db_database
-else:
-    database_connection_string = 'sqlite:///:memory:'
-
-# Create engine depending on test mode
-engine = create_engine(database_connection_string, convert_unicode=True)
-
-db = scoped_session(sessionmaker(autocommit=False, autoflush=False, bind=engine))
+def database_url():
+    """
+    connection string of the database, the password is read from its file or env variable when it is needed
+    """
+    if (int)(testing_on):
+        return 'sqlite:///:memory:'
+
+    db_pw = os.getenv('database_password')
+    if db_pw is None or db_pw == "":
+        with open(os.getenv('database_password_location'), 'r') as f:
+            db_pw = f.read().strip()
+    return 'mysql://' + db_user + ':' + db_pw + '@' + db_host + ":" + db_port + '/' + db_database
+
+def engine_options():
+    """
+    settings of the connection pool, the sqlite database of the tests keeps its default pool
+    """
+    if (int)(testing_on):
+        return {}
+    return {
+        "poolclass": MeteredQueuePool,
+        "pool_size": db_pool_size,
+        "max_overflow": db_max_overflow,
+        "pool_timeout": db_pool_timeout,
+        "pool_recycle": db_pool_recycle,
+        "pool_pre_ping": bool(db_pool_pre_ping),
+    }
 
-# Create Flask app
-app = Flask(__name__)
-app.debug = True
-
-app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1)
-
-app.secret_key = secret_key
-app.config['SESSION_TYPE'] = 'sqlalchemy'
-# app.config['SESSION_PERMANENT'] = False
-# app.config['SESSION_COOKIE_SAMESITE'] = 'None'
-# app.config['SESSION_COOKIE_SECURE'] = False
-# app.config['SESSION_COOKIE_HTTPONLY'] = False
-app.permanent_session_lifetime = timedelta(hours=2)
-
-app.config['SQLALCHEMY_DATABASE_URI'] = database_connection_string
-
-CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
-server_session = Session(app)
+timezone = pytz.timezone('Europe/Berlin')
 
-# Create scheduler for automated mail sending
-jobstores = {
-    'default': SQLAlchemyJobStore(engine=engine)
+##################################
+# Database and scheduler         #
+##################################
+# importing this module doesn't connect to anything, the engine and the scheduler are created with their first use
+_engine = None
+_scheduler = None
+_lock = threading.RLock()
+
+def get_engine():
+    global _engine
+    with _lock:
+        if _engine is None:
+            _engine = create_engine(database_url(), convert_unicode=True, **engine_options())
+        return _engine
+
+class LazySession(Session):
+    """
+    Session which is bound to get_engine() with its first statement, unless it was bound to another engine (tests)
+    """
+
+    def get_bind(self, mapper=None, **kwargs):
+        if self.bind is None:
+            self.bind = get_engine()
+        return super().get_bind(mapper, **kwargs)
+
+db = scoped_session(sessionmaker(class_=LazySession, autocommit=False, autoflush=False))
+
+# jobs found late (e.g. by the worker polling the job store or after a restart) are still executed
+job_defaults = {
+    'misfire_grace_time': 60 * 60,
+    'coalesce': True
 }
 
-timezone = pytz.timezone('Europe/Berlin')
-scheduler = BackgroundScheduler(jobstores=jobstores, timezone=timezone)
-scheduler.start()
\ No newline at end of file
+def get_scheduler():
+    """
+    scheduler for automated mail sending, created and started with its first use
+    a paused scheduler still writes new jobs into the job store but doesn't execute them
+    """
+    global _scheduler
+    with _lock:
+        if _scheduler is None:
+            jobstores = {
+                'default': SQLAlchemyJobStore(engine=get_engine())
+            }
+            _scheduler = BackgroundScheduler(jobstores=jobstores, job_defaults=job_defaults, timezone=timezone)
+            _scheduler.start(paused=(scheduler_mode != "in_process"))
+        return _scheduler
+
+def add_periodic_job(job_id, name, func, **interval):
+    """
+    adds the interval job to the job store if it isn't there yet
+    every web worker and the scheduler worker call this on start, replacing the job would move its next run
+    behind the interval again each time, so a daily job would never run with more frequent restarts
+    a changed interval is applied to the stored job
+    """
+    scheduler = get_scheduler()
+    job = scheduler.get_job(job_id)
+    if job is None:
+        scheduler.add_job(id=job_id, name=name, func=func, trigger='interval', replace_existing=True, **interval)
+    elif getattr(job.trigger, "interval", None) != timedelta(**interval):
+        scheduler.reschedule_job(job_id, trigger='interval', **interval)
+
+def reset_after_fork():
+    """
+    called in a forked process, the connections of the parent are left to it and the scheduler is created again
+    (the thread of the parent's scheduler doesn't exist in the fork)
+    """
+    global _scheduler, _lock
+    # a thread of the parent may have held the lock while forking
+    _lock = threading.RLock()
+    # the session of the parent is dropped without returning its connection
+    db.registry.clear()
+    if _engine is not None:
+        _engine.dispose(close=False)
+    _scheduler = None
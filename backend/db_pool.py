@@ -0,0 +1,83 @@
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+class PoolMetrics:
+    """
+    Counters of a connection pool since the start of the process
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {"checkouts": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0, "timeouts": 0,
+                         "connects": 0, "closes": 0, "invalidated": 0}
+
+    def add(self, name, value=1):
+        with self.lock:
+            self.counters[name] += value
+
+    def record_checkout(self, seconds):
+        with self.lock:
+            self.counters["checkouts"] += 1
+            self.counters["wait_seconds"] += seconds
+            self.counters["max_wait_seconds"] = max(self.counters["max_wait_seconds"], seconds)
+
+
+class MeteredQueuePool(QueuePool):
+    """
+    QueuePool which measures how long checkouts wait for a connection and how many connections are opened and closed.
+    The waiting time includes opening a new connection and the pre ping.
+    The counters are kept when the pool is recreated (dispose, after a fork).
+    """
+
+    def __init__(self, creator, pool_size=5, max_overflow=10, **kwargs):
+        super().__init__(creator, pool_size=pool_size, max_overflow=max_overflow, **kwargs)
+        # -1 allows any number of overflow connections
+        self.capacity = pool_size + max_overflow if max_overflow >= 0 else None
+        self.metrics = PoolMetrics()
+        # a recreated pool takes over the listeners of the old one together with its metrics (recreate)
+        if "_dispatch" not in kwargs:
+            metrics = self.metrics
+            event.listen(self, "connect", lambda *args: metrics.add("connects"))
+            event.listen(self, "close", lambda *args: metrics.add("closes"))
+            event.listen(self, "invalidate", lambda *args: metrics.add("invalidated"))
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def connect(self):
+        start = time.monotonic()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.metrics.add("timeouts")
+            raise
+        self.metrics.record_checkout(time.monotonic() - start)
+        return connection
+
+    def snapshot(self):
+        with self.metrics.lock:
+            counters = dict(self.metrics.counters)
+        counters["average_wait_seconds"] = counters["wait_seconds"] / counters["checkouts"] if counters["checkouts"] else 0
+
+        # current state of the pool
+        counters["size"] = self.size()
+        counters["capacity"] = self.capacity
+        counters["checked_out"] = self.checkedout()
+        counters["checked_in"] = self.checkedin()
+        counters["overflow"] = max(self.overflow(), 0)
+        counters["utilisation"] = counters["checked_out"] / self.capacity if self.capacity else None
+        return counters
+
+
+def pool_metrics(engine):
+    """
+    metrics of the connection pool of the engine, empty for other pools (the sqlite database of the tests)
+    """
+    if isinstance(engine.pool, MeteredQueuePool):
+        return engine.pool.snapshot()
+    return {}
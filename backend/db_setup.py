@@ -1,5 +1,5 @@
 from datetime import datetime
-from config import engine, db
+from config import get_engine, db
 from models import *
 
 
@@ -44,7 +44,7 @@ from models import *
 # db.add(smoking)
 # db.commit()
 
-# Base.metadata.create_all(bind = engine)
+# Base.metadata.create_all(bind = get_engine())
 
 # game_tag        = Tag(name = "Game")
 # cooking_tag     = Tag(name = "Cooking")
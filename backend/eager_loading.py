@@ -0,0 +1,105 @@
+from graphene.utils.str_converters import to_snake_case
+from graphql.language.ast import Field, FragmentSpread, InlineFragment
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, load_only, selectinload
+
+# fields every object type has which don't belong to a column of the model
+GENERIC_FIELDS = ("id", "__typename")
+
+##################################
+# Eager loading from selections  #
+##################################
+def load_options(info, model):
+    """
+    returns the sqlalchemy loader options for the fields the client selected on the current field
+    1:1 and n:1 relationships get joined, 1:n and m:n relationships get loaded with one select ... in per relationship
+    only the selected columns (+ primary and foreign keys) are fetched
+    """
+    selections = collect_fields(info, [field_ast.selection_set for field_ast in info.field_asts])
+    return _options_for(info, model, selections, None)
+
+
+def connection_load_options(info, model):
+    """
+    same as load_options for fields which return a connection of the model
+    """
+    selections = connection_nodes(info, [field_ast.selection_set for field_ast in info.field_asts])
+    return _options_for(info, model, selections, None)
+
+
+def collect_fields(info, selection_sets):
+    """
+    merges the given selection sets into a dict of snake_case field name -> list of sub selection sets
+    fragments and inline fragments are resolved
+    """
+    fields = {}
+    for selection_set in selection_sets:
+        if selection_set is None:
+            continue
+        for selection in selection_set.selections:
+            if isinstance(selection, Field):
+                fields.setdefault(to_snake_case(selection.name.value), []).append(selection.selection_set)
+            elif isinstance(selection, FragmentSpread):
+                fragment = info.fragments.get(selection.name.value)
+                if fragment:
+                    for name, sub_selection_sets in collect_fields(info, [fragment.selection_set]).items():
+                        fields.setdefault(name, []).extend(sub_selection_sets)
+            elif isinstance(selection, InlineFragment):
+                for name, sub_selection_sets in collect_fields(info, [selection.selection_set]).items():
+                    fields.setdefault(name, []).extend(sub_selection_sets)
+    return fields
+
+
+def connection_nodes(info, selection_sets):
+    """
+    returns the fields selected on edges { node { ... } } of a connection
+    """
+    edges = collect_fields(info, selection_sets).get("edges", [])
+    return collect_fields(info, collect_fields(info, edges).get("node", []))
+
+
+def _options_for(info, model, selections, loader):
+    """
+    builds the options for the given model
+    loader is the relationship loader of the model or None for the queried model itself
+    """
+    mapper = inspect(model)
+    relationships = mapper.relationships
+    columns = mapper.column_attrs
+
+    options = []
+    load_all_columns = False
+    selected_columns = set()
+    for name, sub_selection_sets in selections.items():
+        if name in relationships:
+            relationship_prop = relationships[name]
+            attribute = getattr(model, name)
+            if relationship_prop.uselist:
+                child_loader = selectinload(attribute) if loader is None else loader.selectinload(attribute)
+                child_selections = connection_nodes(info, sub_selection_sets)
+            else:
+                child_loader = joinedload(attribute) if loader is None else loader.joinedload(attribute)
+                child_selections = collect_fields(info, sub_selection_sets)
+            options.extend(_options_for(info, relationship_prop.mapper.entity, child_selections, child_loader))
+        elif name in columns:
+            selected_columns.add(name)
+        elif name not in GENERIC_FIELDS:
+            # unknown field (e.g. a custom resolver) -> we can't know which columns it needs
+            load_all_columns = True
+
+    if not load_all_columns:
+        # foreign keys are needed for relationships which are resolved later on
+        for column_prop in columns:
+            if any(column.foreign_keys for column in column_prop.columns):
+                selected_columns.add(column_prop.key)
+
+        selected_attributes = [getattr(model, name) for name in sorted(selected_columns)]
+        if loader is None:
+            options.append(load_only(*selected_attributes))
+        else:
+            loader = loader.load_only(*selected_attributes)
+
+    if loader is not None:
+        options.append(loader)
+
+    return options
@@ -0,0 +1,170 @@
+import os
+import shutil
+import sys
+import time
+
+from config import db, add_periodic_job, file_gc_interval, file_gc_min_age, file_gc_quarantine_directory
+from models import File, FileBlob
+import file_storage
+
+# directory entries and blobs compared with the database at once
+batch_size = 1000
+
+job_id = "file_gc"
+
+# every column which references a file on disk
+referencing_columns = [
+    File.path,
+    File.thumbnail_path,
+    File.thumbnail_jpeg_path,
+    File.preview_path,
+    File.preview_jpeg_path,
+    FileBlob.path,
+]
+
+def schedule_file_gc():
+    """
+    adds the periodic job which removes the files without database entry
+    """
+    add_periodic_job(job_id, "File garbage collection", collect_garbage, hours=file_gc_interval)
+
+##################################
+# Unused blobs                   #
+##################################
+def release_unused_blobs(session=None, dry_run=False):
+    """
+    deletes the blobs without File, e.g. of objects which were deleted together with their files
+    their content is removed by the directory scan afterwards
+    returns the number of deleted blobs
+    """
+    session = session or db
+    unused = ~session.query(File.file_id) \
+        .filter(File.sha256 == FileBlob.sha256, File.file_type == FileBlob.file_type) \
+        .exists()
+    if dry_run:
+        count = session.query(FileBlob.sha256).filter(unused).count()
+        session.rollback()
+        return count
+
+    deleted = 0
+    while True:
+        candidates = session.query(FileBlob.sha256).filter(unused).limit(batch_size).all()
+        if not candidates:
+            session.rollback()
+            return deleted
+
+        # the blobs are locked like by an upload and checked again, an upload may have used them meanwhile
+        shas = [sha256 for sha256, in candidates]
+        blobs = session.query(FileBlob).filter(FileBlob.sha256.in_(shas)).with_for_update().all()
+        used = set(session.query(File.sha256, File.file_type).filter(File.sha256.in_(shas)).distinct().all())
+        for blob in blobs:
+            if (blob.sha256, blob.file_type) not in used:
+                session.delete(blob)
+                deleted += 1
+        session.commit()
+
+        if len(candidates) < batch_size:
+            return deleted
+
+##################################
+# Directory scan                 #
+##################################
+def unreferenced(names, session=None):
+    """
+    the names of a batch of directory entries which are not referenced by any File or blob
+    """
+    session = session or db
+    referenced = set()
+    for column in referencing_columns:
+        referenced.update(name for name, in session.query(column).filter(column.in_(names)).distinct())
+    # every batch reads the current state of the database, not the one of the first batch
+    session.commit()
+    return [name for name in names if name not in referenced]
+
+def old_files(directory, cutoff):
+    """
+    streams the names of the regular files in directory which were not modified since cutoff
+    """
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file(follow_symlinks=False) and entry.stat(follow_symlinks=False).st_mtime < cutoff:
+                    yield entry.name
+            except FileNotFoundError:
+                # removed while the directory is read
+                continue
+
+def dispose(directory, name, cutoff, quarantine_directory=None):
+    """
+    deletes the file or moves it to quarantine_directory
+    returns False if the file is gone or was written again since the scan, e.g. by a new upload of the same content
+    """
+    path = os.path.join(directory, name)
+    try:
+        if os.stat(path).st_mtime >= cutoff:
+            return False
+        if quarantine_directory:
+            os.makedirs(quarantine_directory, exist_ok=True)
+            # the quarantine may be on another file system
+            shutil.move(path, os.path.join(quarantine_directory, name))
+        else:
+            os.remove(path)
+    except FileNotFoundError:
+        return False
+    return True
+
+def collect_directory(directory, cutoff, quarantine_directory=None, dry_run=False, session=None):
+    """
+    compares the files of directory with the database in batches, so the memory used doesn't depend on the number of files
+    returns the number of scanned and removed files
+    """
+    scanned = removed = 0
+    if not os.path.isdir(directory):
+        # e.g. the volume is not mounted where the job runs, the other directory is still collected
+        print("File garbage collection skips the missing directory " + directory)
+        return {"scanned": scanned, "removed": removed}
+
+    def collect_batch(names):
+        orphans = unreferenced(names, session)
+        if dry_run:
+            return len(orphans)
+        return sum(dispose(directory, name, cutoff, quarantine_directory) for name in orphans)
+
+    batch = []
+    for name in old_files(directory, cutoff):
+        scanned += 1
+        batch.append(name)
+        if len(batch) == batch_size:
+            removed += collect_batch(batch)
+            batch = []
+    if batch:
+        removed += collect_batch(batch)
+
+    return {"scanned": scanned, "removed": removed}
+
+def collect_garbage(now=None, min_age=None, quarantine_directory=None, dry_run=False):
+    """
+    removes the files in picture_directory and pdf_directory which no File references, runs every file_gc_interval hours
+    these are left behind by objects deleted together with their files and by interrupted uploads
+    files younger than min_age hours are kept, they may belong to an upload which is not committed yet
+    with a quarantine directory the files are moved there instead of being deleted
+    returns the number of released blobs and of scanned and removed files per directory
+    """
+    now = now or time.time()
+    min_age = file_gc_min_age if min_age is None else min_age
+    quarantine_directory = quarantine_directory or file_gc_quarantine_directory
+    cutoff = now - min_age * 3600
+
+    try:
+        result = {"blobs": release_unused_blobs(dry_run=dry_run)}
+        for file_type, directory in (("picture", file_storage.picture_directory), ("pdf", file_storage.pdf_directory)):
+            quarantine = os.path.join(quarantine_directory, file_type) if quarantine_directory else None
+            result[file_type] = collect_directory(directory, cutoff, quarantine, dry_run)
+    finally:
+        db.remove()
+    return result
+
+
+if __name__ == '__main__':
+    # python -m file_gc --dry-run only counts the files which would be removed
+    print(collect_garbage(dry_run="--dry-run" in sys.argv))
@@ -0,0 +1,147 @@
+import hashlib
+import os
+import tempfile
+
+from sqlalchemy.exc import IntegrityError
+
+from config import db, picture_directory, pdf_directory, max_picture_size, max_pdf_size, upload_chunk_size
+from models import File, FileBlob
+
+class FileTooLarge(Exception):
+    """
+    raised when an upload exceeds the limit of its file type
+    """
+
+
+def directory_for(file_type):
+    return picture_directory if file_type == "picture" else pdf_directory
+
+def max_size_for(file_type):
+    return max_picture_size if file_type == "picture" else max_pdf_size
+
+def hash_stream(stream, max_size, chunk_size=upload_chunk_size):
+    """
+    sha256 and size of the stream without writing it anywhere
+    raises FileTooLarge as soon as more than max_size bytes were read
+    """
+    sha256 = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_size:
+            raise FileTooLarge("Die Datei ist zu groß. Maximal erlaubt sind " + str(max_size // (1024 * 1024)) + " MB.")
+        sha256.update(chunk)
+    return sha256.hexdigest(), size
+
+def store_upload(stream, directory, file_name, max_size, chunk_size=upload_chunk_size):
+    """
+    writes the stream to directory/file_name chunk by chunk, so the memory used doesn't depend on the file size
+    the upload is written to a temporary file next to the target and renamed when it is complete,
+    so a file is either missing or complete
+    raises FileTooLarge as soon as more than max_size bytes were read
+    returns the sha256 of the content and its size
+    """
+    sha256 = hashlib.sha256()
+    size = 0
+
+    descriptor, temp_path = tempfile.mkstemp(dir=directory, prefix=".upload-")
+    try:
+        with os.fdopen(descriptor, "wb") as temp_file:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise FileTooLarge("Die Datei ist zu groß. Maximal erlaubt sind " + str(max_size // (1024 * 1024)) + " MB.")
+                sha256.update(chunk)
+                temp_file.write(chunk)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+
+        # mkstemp only allows the owner to read, the files are served by the web server
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, os.path.join(directory, file_name))
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return sha256.hexdigest(), size
+
+
+##################################
+# Content addressed storage      #
+##################################
+def lock_blob(sha256, file_type, session=None):
+    session = session or db
+    return session.query(FileBlob) \
+        .filter(FileBlob.sha256 == sha256, FileBlob.file_type == file_type) \
+        .with_for_update() \
+        .first()
+
+def store_file(stream, file_type, file_name, session=None):
+    """
+    stores the content of an upload once, files with the same content share it
+    the upload is hashed first, so a duplicate is neither written nor stored again
+    the stream has to be seekable (werkzeug spools uploads to a temporary file)
+    returns the blob of the content, it is committed together with the File
+    """
+    session = session or db
+    max_size = max_size_for(file_type)
+    sha256, size = hash_stream(stream, max_size)
+
+    blob = lock_blob(sha256, file_type, session)
+    if blob and os.path.isfile(os.path.join(directory_for(file_type), blob.path)):
+        return blob
+
+    # the blob is named by its content, the extension lets the web server send the right content type
+    extension = file_name.rsplit(".", 1)[-1].lower() if "." in file_name else "bin"
+    path = blob.path if blob else sha256 + "." + extension
+    stream.seek(0)
+    store_upload(stream, directory_for(file_type), path, max_size)
+    if blob:
+        # the content was missing on disk
+        return blob
+
+    try:
+        with session.begin_nested():
+            blob = FileBlob(sha256=sha256, file_type=file_type, path=path, size=size)
+            session.add(blob)
+    except IntegrityError:
+        # the same content was uploaded at the same time
+        blob = lock_blob(sha256, file_type, session)
+    return blob
+
+def release_file(file, session=None):
+    """
+    deletes the File and the content if no other File references it
+    the content is removed while the blob is locked, so a concurrent upload of the same content writes it again
+    """
+    session = session or db
+    directory = directory_for("picture" if file.file_type == File.FileType.picture else "pdf")
+    blob = lock_blob(file.sha256, file.file_type, session) if file.sha256 else None
+
+    session.delete(file)
+    session.flush()
+
+    if blob:
+        references = session.query(File.file_id).filter(File.sha256 == blob.sha256, File.file_type == blob.file_type).count()
+        if references:
+            return
+        session.delete(blob)
+        path = blob.path
+    else:
+        # files of older versions have their own path, unless it was copied
+        if session.query(File.file_id).filter(File.path == file.path).count():
+            return
+        path = file.path
+
+    # the downscaled variants belong to the content
+    paths = set([path, file.thumbnail_path, file.thumbnail_jpeg_path, file.preview_path, file.preview_jpeg_path]) - set([None])
+    for path in paths:
+        if os.path.isfile(os.path.join(directory, path)):
+            os.remove(os.path.join(directory, path))
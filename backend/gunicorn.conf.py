@@ -0,0 +1,27 @@
+import multiprocessing
+import os
+
+# gunicorn loads this file from the working directory
+
+bind = "0.0.0.0:5000"
+
+# with scheduler_mode=worker or leader the web workers can scale with the cpu cores,
+# with scheduler_mode=in_process every worker would run the scheduled jobs, so there is only one
+scheduler_mode = os.getenv("scheduler_mode") or "in_process"
+if scheduler_mode == "in_process":
+    workers = int(os.getenv("WEB_CONCURRENCY") or 1)
+    if workers != 1:
+        raise RuntimeError("scheduler_mode=in_process needs WEB_CONCURRENCY=1, use scheduler_mode=worker or leader for more workers")
+else:
+    workers = int(os.getenv("WEB_CONCURRENCY") or multiprocessing.cpu_count() * 2 + 1)
+
+# preload_app=1: the master imports the app once and forks the workers from it,
+# so the workers start faster and share the memory of the imported modules
+preload_app = bool(int(os.getenv("preload_app") or 0))
+
+def post_fork(server, worker):
+    # connections and threads of the master can't be shared, every worker opens and starts its own
+    if server.cfg.preload_app:
+        from app import after_fork
+
+        after_fork(server.app.wsgi())
@@ -0,0 +1,150 @@
+import atexit
+import os
+import socket
+import threading
+import uuid
+
+from sqlalchemy import DateTime, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+from config import db, get_engine, scheduler_lease_duration
+from models import SchedulerLease
+
+# only one lease exists, it belongs to the scheduler
+lease_name = "scheduler"
+
+##################################
+# Lease in the database          #
+##################################
+class utc_after(FunctionElement):
+    """
+    the current utc time of the database plus the given seconds
+    the lease is compared with the clock of the database, so the clocks of the containers can differ
+    """
+    type = DateTime()
+    name = "utc_after"
+    inherit_cache = True
+
+@compiles(utc_after)
+def compile_utc_after(element, compiler, **kw):
+    return "TIMESTAMPADD(SECOND, %s, UTC_TIMESTAMP())" % compiler.process(element.clauses, **kw)
+
+@compiles(utc_after, "sqlite")
+def compile_utc_after_sqlite(element, compiler, **kw):
+    return "datetime('now', %s || ' seconds')" % compiler.process(element.clauses, **kw)
+
+def try_acquire(holder, duration, session=None):
+    """
+    takes or renews the lease for holder, returns True if holder is the leader afterwards
+    the lease is only taken over if it is expired, this is decided by a single UPDATE so two processes can't both win
+    """
+    session = session or db
+    try:
+        renewed = session.query(SchedulerLease) \
+            .filter(SchedulerLease.name == lease_name,
+                    or_(SchedulerLease.holder == holder, SchedulerLease.expires_at <= utc_after(0))) \
+            .update({SchedulerLease.holder: holder, SchedulerLease.expires_at: utc_after(int(duration))},
+                    synchronize_session=False)
+        if renewed:
+            session.commit()
+            return True
+
+        # first start, nobody held the lease yet
+        if session.query(SchedulerLease.name).filter(SchedulerLease.name == lease_name).first() is None:
+            session.add(SchedulerLease(name=lease_name, holder=holder, expires_at=utc_after(int(duration))))
+            session.commit()
+            return True
+
+        session.rollback()
+        return False
+    except IntegrityError:
+        # another process inserted the lease at the same time
+        session.rollback()
+        return False
+
+def release(holder, session=None):
+    """
+    gives the lease up so another process can take over immediately
+    """
+    session = session or db
+    session.query(SchedulerLease) \
+        .filter(SchedulerLease.name == lease_name, SchedulerLease.holder == holder) \
+        .update({SchedulerLease.expires_at: utc_after(0)}, synchronize_session=False)
+    session.commit()
+
+
+##################################
+# Leader election                #
+##################################
+class LeaderElection(threading.Thread):
+    """
+    runs in every web worker with scheduler_mode=leader
+    the scheduler is started paused everywhere and only resumed in the process holding the lease,
+    the lease is renewed every third of its duration, if the leader dies another worker takes over once it expired
+    """
+
+    def __init__(self, scheduler, duration=None, holder=None):
+        super(LeaderElection, self).__init__(name="LeaderElection", daemon=True)
+        self.scheduler = scheduler
+        self.duration = duration or scheduler_lease_duration
+        self.holder = holder or socket.gethostname() + ":" + str(os.getpid()) + ":" + uuid.uuid4().hex[:8]
+        self.is_leader = False
+        self.stopped = threading.Event()
+
+    def step(self):
+        """
+        one heartbeat, returns if this process is the leader afterwards
+        """
+        try:
+            leader = try_acquire(self.holder, self.duration)
+        except Exception as e:
+            # without a connection to the database nobody can be sure to be the leader
+            print("Scheduler lease could not be renewed: " + str(e))
+            leader = False
+        finally:
+            db.remove()
+
+        if leader and not self.is_leader:
+            print("Scheduler leader: " + self.holder)
+            self.scheduler.resume()
+        elif not leader and self.is_leader:
+            print("Scheduler leadership lost: " + self.holder)
+            self.scheduler.pause()
+        elif leader:
+            # jobs added by the other workers are picked up by looking into the job store regularly
+            self.scheduler.wakeup()
+
+        self.is_leader = leader
+        return leader
+
+    def run(self):
+        while True:
+            self.step()
+            if self.stopped.wait(self.duration / 3):
+                break
+
+        if self.is_leader:
+            self.scheduler.pause()
+            self.is_leader = False
+            try:
+                release(self.holder)
+            finally:
+                db.remove()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def start_leader_election(scheduler):
+    """
+    starts the leader election for the scheduler of this process
+    """
+    SchedulerLease.__table__.create(bind=get_engine(), checkfirst=True)
+    election = LeaderElection(scheduler)
+    election.start()
+    # give the lease up on a clean shutdown instead of letting it expire
+    atexit.register(election.stop)
+    return election
@@ -4,7 +4,7 @@ import uuid
 import graphene
 import json
 
-from config import db, engine
+from config import db
 from sqlalchemy import *
 from sqlalchemy.orm import *
 from sqlalchemy.ext.declarative import declarative_base
@@ -60,6 +60,14 @@ class orderStatus(enum.Enum):
     rejected = 5
     returned = 6
 
+class mailStatus(enum.Enum):
+    """
+    Enum for the delivery status of a mail in the outbox
+    """
+    pending = 1
+    sent    = 2
+    failed  = 3
+
 
 
 # m:n Relations go here ...
@@ -201,21 +209,47 @@ class File(Base):
         other   = 2
 
     __tablename__       = "file"
-    file_id             = Column(String(36),        primary_key = True, default=lambda: uuid.uuid4())
+    file_id             = Column(String(36),        primary_key = True, default=lambda: str(uuid.uuid4()))
     picture_id          = Column(String(36),       ForeignKey('physicalobject.phys_id'),        nullable = True)
     manual_id           = Column(String(36),       ForeignKey('physicalobject.phys_id'),        nullable = True)
     organization_id     = Column(String(36),       ForeignKey('organization.organization_id'),  nullable = True)
     group_id            = Column(String(36),       ForeignKey('group.group_id'),                nullable = True)
-    # String name for the file location
-    path                = Column(String(600),       unique = True, nullable = False)
+    # String name for the file location, files with the same content share it
+    path                = Column(String(600),       nullable = False)
     file_type           = Column(Enum(FileType),    nullable = False, default = 'other')
     show_index          = Column(Integer,           nullable = True)
+    # sha256 of the content and size in bytes, computed while uploading (empty for files of older versions)
+    sha256              = Column(String(64),        nullable = True)
+    size                = Column(BigInteger,        nullable = True)
+    # downscaled variants of pictures for list views, created in the background (empty until then)
+    thumbnail_path      = Column(String(600),       nullable = True)
+    thumbnail_jpeg_path = Column(String(600),       nullable = True)
+    preview_path        = Column(String(600),       nullable = True)
+    preview_jpeg_path   = Column(String(600),       nullable = True)
+    # tiny blurred version as data uri, shown while the picture is loading
+    placeholder         = Column(Text,              nullable = True)
 
     physicalobject_picture  = relationship("PhysicalObject",    back_populates = "pictures",    foreign_keys=[picture_id])
     physicalobject_manual   = relationship("PhysicalObject",    back_populates = "manual",      foreign_keys=[manual_id])
     group                   = relationship("Group",             back_populates = "pictures")
     organization            = relationship("Organization",      back_populates = "agb")
 
+    # the garbage collection of files looks up every file on disk in the path columns
+    __table_args__      = (Index('ix_file_path', 'path'), Index('ix_file_sha256', 'sha256'),
+                           Index('ix_file_thumbnail_path', 'thumbnail_path'), Index('ix_file_thumbnail_jpeg_path', 'thumbnail_jpeg_path'),
+                           Index('ix_file_preview_path', 'preview_path'), Index('ix_file_preview_jpeg_path', 'preview_jpeg_path'))
+
+class FileBlob(Base):
+    """
+    Content of uploaded files, stored once and shared by all files with the same sha256 and type
+    the references are the File rows with this sha256, the content is removed with the last of them
+    """
+    __tablename__       = "file_blob"
+    sha256              = Column(String(64),            primary_key = True)
+    file_type           = Column(Enum(File.FileType),   primary_key = True)
+    path                = Column(String(600),           unique = True, nullable = False)
+    size                = Column(BigInteger,            nullable = False)
+
 class Order(Base):
     """
     Orders are the actual borrowings of physical objects for a specific time
@@ -228,6 +262,10 @@ class Order(Base):
     deposit             = Column(Float,             unique = False, nullable = True)
     organization_id     = Column(String(36),        ForeignKey('organization.organization_id'), nullable=False)
 
+    # availability checks search orders by their time range, the reminder dispatcher by their start or end
+    __table_args__      = (Index('ix_order_from_date_till_date', 'from_date', 'till_date'),
+                           Index('ix_order_till_date', 'till_date'), )
+
     physicalobjects     = relationship("PhysicalObject_Order",                                  back_populates = "order", cascade="all, delete-orphan")
     users               = relationship("User",              secondary = user_order,             back_populates = "orders")
     organization        = relationship("Organization",                                          back_populates = "orders")
@@ -286,6 +324,43 @@ class User(Base):
     def __repr__(self):
         return "User ID: " + str(self.user_id) + "; Name: " + self.first_name + " " + self.last_name
 
+class OrderReminder(Base):
+    """
+    Ledger of the reminder mails sent for an order, every kind (pickup, return) is only sent once
+    """
+    __tablename__       = "order_reminder"
+    order_id            = Column(String(36),    ForeignKey('order.order_id', ondelete="CASCADE"), primary_key = True)
+    kind                = Column(String(10),    primary_key = True)
+    sent_at             = Column(DateTime,      unique = False, nullable = False)
+
+    def __repr__(self):
+        return "Order Reminder: " + str(self.order_id) + "; Kind: " + self.kind + "; Sent: " + str(self.sent_at)
+
+class MailOutbox(Base):
+    """
+    Mails waiting for delivery, they are written in the transaction of the action which causes them
+    and sent by the outbox dispatcher, failed deliveries are retried with exponential backoff
+    """
+    __tablename__       = "mail_outbox"
+    mail_id             = Column(String(36),        primary_key = True, default=lambda: str(uuid.uuid4()))
+    # the same mail is only queued once per key
+    idempotency_key     = Column(String(120),       unique = True,  nullable = False, default=lambda: str(uuid.uuid4()))
+    receiver            = Column(String(120),       unique = False, nullable = False)
+    subject             = Column(String(200),       unique = False, nullable = False)
+    body                = Column(Text,              unique = False, nullable = False)
+    status              = Column(Enum(mailStatus),  nullable = False, default = mailStatus.pending)
+    attempts            = Column(Integer,           unique = False, nullable = False, default = 0)
+    last_error          = Column(String(500),       unique = False, nullable = True)
+    created_at          = Column(DateTime,          unique = False, nullable = False)
+    send_after          = Column(DateTime,          unique = False, nullable = False)
+    sent_at             = Column(DateTime,          unique = False, nullable = True)
+
+    # the dispatcher looks for pending mails which are due
+    __table_args__      = (Index('ix_mail_outbox_status_send_after', 'status', 'send_after'), )
+
+    def __repr__(self):
+        return "Mail: " + str(self.mail_id) + "; To: " + self.receiver + "; Status: " + str(self.status)
+
 class Group(Base):
     """
     Group contains physical objects or groups
@@ -406,4 +481,17 @@ class Organization(Base):
         return None
 
     def __repr__(self):
-        return "Organization ID: " + str(self.organization_id) + "; Name: " + self.name
\ No newline at end of file
+        return "Organization ID: " + str(self.organization_id) + "; Name: " + self.name
+
+class SchedulerLease(Base):
+    """
+    Lease of the process which executes the scheduled jobs (scheduler_mode=leader)
+    the holder has to renew it before expires_at, otherwise another process takes over
+    """
+    __tablename__       = "scheduler_lease"
+    name                = Column(String(60),    primary_key = True)
+    holder              = Column(String(120),   unique = False, nullable = False)
+    expires_at          = Column(DateTime,      unique = False, nullable = False)
+
+    def __repr__(self):
+        return "Scheduler Lease: " + self.name + "; Holder: " + self.holder + "; Expires: " + str(self.expires_at)
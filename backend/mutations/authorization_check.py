@@ -1,7 +1,68 @@
 from argon2.exceptions import VerificationError
+from flask import g, has_request_context
+from threading import Lock
+from time import monotonic
 
+from config import authorization_cache_ttl, db
 from models import userRights
-from schema import UserModel, PhysicalObjectModel, TagModel, GroupModel, OrganizationModel, OrderModel
+from schema import PhysicalObjectModel, TagModel, GroupModel, OrderModel, Organization_UserModel
+
+# user_id -> (expiry, rights matrix), only used if authorization_cache_ttl is set
+_rights_cache = {}
+_rights_cache_lock = Lock()
+
+##################################
+# Rights matrix                  #
+##################################
+def get_user_rights(user_id):
+    """
+    returns the rights matrix {organization_id: userRights} of the user
+    it is loaded with one query and reused for the rest of the request,
+    with authorization_cache_ttl > 0 it is additionally kept for that many seconds across requests of the process
+    """
+    request_cache = g.setdefault("user_rights", {}) if has_request_context() else {}
+    if user_id in request_cache:
+        return request_cache[user_id]
+
+    user_rights = None
+    if authorization_cache_ttl > 0:
+        with _rights_cache_lock:
+            cached = _rights_cache.get(user_id)
+        if cached and cached[0] > monotonic():
+            user_rights = cached[1]
+
+    if user_rights is None:
+        user_rights = dict(db.query(Organization_UserModel.organization_id, Organization_UserModel.rights)
+                           .filter(Organization_UserModel.user_id == user_id)
+                           .all())
+        if authorization_cache_ttl > 0:
+            with _rights_cache_lock:
+                _rights_cache[user_id] = (monotonic() + authorization_cache_ttl, user_rights)
+
+    request_cache[user_id] = user_rights
+    return user_rights
+
+def invalidate_user_rights(user_id=None):
+    """
+    drops the cached rights of the user, or of all users if no user_id is given
+    has to be called after the rights of a user have changed
+    """
+    if has_request_context():
+        if user_id is None:
+            g.pop("user_rights", None)
+        else:
+            g.setdefault("user_rights", {}).pop(user_id, None)
+
+    with _rights_cache_lock:
+        if user_id is None:
+            _rights_cache.clear()
+        else:
+            _rights_cache.pop(user_id, None)
+
+
+##################################
+# Authorization checks           #
+##################################
 
 def is_authorised(required_rights, executive_user_id, phys_id=None, organization_id=None, tag_id=None, group_id=None, order_id=None):
     """
@@ -16,11 +77,11 @@ def is_authorised(required_rights, executive_user_id, phys_id=None, organization
 
     only one of the last 4 parameters can be set at once
     """
-    executive_user = UserModel.query.filter(UserModel.user_id == executive_user_id).first()
+    user_rights = get_user_rights(executive_user_id)
     
     # if user is system admin, he is always authorized
-    for user_org in executive_user.organizations:
-        if user_org.rights == userRights.system_admin:
+    for rights in user_rights.values():
+        if rights == userRights.system_admin:
             return True
 
     # Check if multiple parameters are set -> undefined behavior
@@ -37,115 +98,77 @@ def is_authorised(required_rights, executive_user_id, phys_id=None, organization
 
     # check rights for given physical object
     if phys_id:
-        return check_for_phys_object(executive_user, required_rights, phys_id)
+        return check_for_phys_object(user_rights, required_rights, phys_id)
 
     # check rights for given tag
     if tag_id:
-        return check_for_tag(executive_user, required_rights, tag_id)
+        return check_for_tag(user_rights, required_rights, tag_id)
 
     # check rights for given group
     if group_id:
-        return check_for_group(executive_user, required_rights, group_id)
+        return check_for_group(user_rights, required_rights, group_id)
     
     # check rights for given order
     if order_id:
-        return check_for_order(executive_user, required_rights, order_id)
+        return check_for_order(user_rights, required_rights, order_id)
     
     # check rights for given organization
     if organization_id:
-        return check_for_organization(executive_user, required_rights, organization_id)
+        return check_for_organization(user_rights, required_rights, organization_id)
 
     return False
 
 
-def check_for_phys_object(executive_user, required_rights, phys_id):
+def check_for_phys_object(user_rights, required_rights, phys_id):
     """ 
     For editing  physical object the user has to be minimum the required right in the owner organization 
     """
-    phys_obj = PhysicalObjectModel.query.filter(PhysicalObjectModel.phys_id == phys_id).first()
+    phys_obj = db.query(PhysicalObjectModel.organization_id).filter(PhysicalObjectModel.phys_id == phys_id).first()
     if not phys_obj:
         raise VerificationError("physikalisches Object nicht gefunden")
     
-    owner_organization = phys_obj.organization
-    for user in owner_organization.users:
-        if user.user_id == executive_user.user_id:
-            return user.rights <= required_rights
+    rights = user_rights.get(phys_obj.organization_id)
+    return rights is not None and rights <= required_rights
 
-    return False
-
-def check_for_tag(executive_user, required_rights, tag_id):
+def check_for_tag(user_rights, required_rights, tag_id):
     """
     tag can only be edited or deleted by user if he is hat least the required rights in all organizations to which the objects belonging to the tag belong
     """
-    tag = TagModel.query.filter(TagModel.tag_id == tag_id).first()
-
-    # get all related organizations
-    tag_phys_organizations = []
-    for phys_obj in tag.physicalobjects:
-        if not tag_phys_organizations.contains(phys_obj.organization_id):
-            tag_phys_organizations.append(phys_obj.organization_id)
+    objects = db.query(PhysicalObjectModel.organization_id) \
+        .filter(PhysicalObjectModel.tags.any(TagModel.tag_id == tag_id))
+    return not owned_outside(objects, user_rights, required_rights)
 
-    # check if user has the required rights in all organizations
-    for org_id in tag_phys_organizations:
-        organization = OrganizationModel.query.filter(OrganizationModel.organization_id == org_id).first()
-        user_relation = organization.users.filter(UserModel.user_id == executive_user.user_id).first()
-        
-        if not user_relation.user_rights > required_rights:
-            return False
-        
-    return True
-
-def check_for_group(executive_user, required_rights, group_id):
+def check_for_group(user_rights, required_rights, group_id):
     """
     group can only be edited or deleted by user if he is hat least the required rights in all organizations to which the objects belonging to the group belong
     """
-    group = GroupModel.query.filter(GroupModel.group_id == group_id).first()
-    
-    # get all related organizations
-    group_phys_organizations = []
-    for phys_obj in group.physicalobjects:
-        if not group_phys_organizations.contains(phys_obj.organization_id):
-            group_phys_organizations.append(phys_obj.organization_id)
-
-    # check if user has the required rights in all organizations
-    for org_id in group_phys_organizations:
-        organization = OrganizationModel.query.filter(OrganizationModel.organization_id == org_id).first()
-        user_relation = organization.users.filter(UserModel.user_id == executive_user.user_id).first()
-        
-        if not user_relation.user_rights > required_rights:
-            return False
+    objects = db.query(PhysicalObjectModel.organization_id) \
+        .filter(PhysicalObjectModel.groups.any(GroupModel.group_id == group_id))
+    return not owned_outside(objects, user_rights, required_rights)
 
-    return True
+def owned_outside(objects, user_rights, required_rights):
+    """
+    checks with a single query if one of the objects belongs to an organization where the user doesn't have the required rights
+    independent of the number of objects and organizations only one row is fetched
+    """
+    allowed_organizations = [organization_id for organization_id, rights in user_rights.items() if rights <= required_rights]
+    return objects.filter(PhysicalObjectModel.organization_id.notin_(allowed_organizations)).first() is not None
 
-def check_for_order(executive_user, required_rights, order_id):
+def check_for_order(user_rights, required_rights, order_id):
     """
-    order can only be edited or deleted by user if the user is part of  the order users
+    order can only be edited or deleted by user if the user is part of the organization of the order
     """
-    print("check order")
-    order = OrderModel.query.filter(OrderModel.order_id == order_id).first()
-    
-    organization = order.organization
-    user_right = organization.get_user_right(executive_user.user_id)
-    if not (user_right is None):
-        return True
-    
-    # check if user has requiered rights in the organization
-    user_right = organization.get_user_right(executive_user.user_id)
-    if (user_right is None):
+    order = db.query(OrderModel.organization_id).filter(OrderModel.order_id == order_id).first()
+    if not order:
         return False
-    
-    return user_right > required_rights
 
-def check_for_organization(executive_user, required_rights, organization_id):
+    return order.organization_id in user_rights
+
+def check_for_organization(user_rights, required_rights, organization_id):
     """
     organization can only be edited or deleted by user if the user has the required rights in the organization
     """
-    organization = OrganizationModel.query.filter(OrganizationModel.organization_id == organization_id).first()
-
-    for user in organization.users:
-        if user.user_id == executive_user.user_id:
-            return user.rights <= required_rights
-
-    return False
+    rights = user_rights.get(organization_id)
+    return rights is not None and rights <= required_rights
 
 reject_message = "Sie sind nicht autorisiert diese Aktion auszuführen"
\ No newline at end of file
@@ -1,12 +1,11 @@
 from flask import session
 import graphene
 from graphene_file_upload.scalars import Upload
-import os
-import time
 import traceback
 
 from authorization_check import is_authorised, reject_message
-from config import db, pdf_directory, picture_directory
+from config import db
+from file_storage import FileTooLarge, release_file, store_file
 from models import userRights
 from schema import File, FileModel, GroupModel, OrganizationModel, PhysicalObjectModel
 
@@ -67,34 +66,26 @@ class upload_file(graphene.Mutation):
             if type == None:
                 return upload_file(ok=False, info_text="File type not supported.")
 
-            file_name = file.filename
-            file_name = file_name.replace(" ", "_")
-            time_stamp = str(time.time())
-            file_name = time_stamp + "_" + file_name
-            if type == 'picture':
-                # Prüfe Dateigröße
-                file.seek(0, os.SEEK_END)
-                file_size = file.tell()
-                file.seek(0)
-
-                if file_size > (100 * 1024 * 1024): #100MB
-                    return upload_file(ok=False, info_text="Die Datei ist zu groß. Maximal erlaubt sind 100 MB.")
-                
-                file.save(os.path.join(picture_directory, file_name))
-            elif type == 'pdf':
-                file.save(os.path.join(pdf_directory, file_name))
-
-            file = FileModel(path=file_name,
+            # the content is only stored once, the size is checked before anything is written
+            try:
+                blob = store_file(file.stream, type, file.filename)
+            except FileTooLarge as e:
+                return upload_file(ok=False, info_text=str(e), status_code=413)
+
+            file = FileModel(path=blob.path,
                              organization=organization,
                              group=group,
-                             file_type=type)
+                             file_type=type,
+                             sha256=blob.sha256,
+                             size=blob.size)
 
             if physical_object and phys_picture_id:
                 physical_object.pictures.append(file)
             if physical_object and phys_manual_id:
                 physical_object.manual.append(file)
             if organization:
-                organization.agb = file
+                # the new agb replaces the old one
+                organization.agb = [file]
             if group:
                 group.pictures.append(file)
             if show_index:
@@ -182,15 +173,8 @@ class delete_file(graphene.Mutation):
 
         file = FileModel.query.filter(FileModel.file_id == file_id).first()
         if file:
-            if file.file_type == File.FileType.picture:
-                path = os.path.join(picture_directory, file.path)
-            else:
-                path = os.path.join(pdf_directory, file.path)
-
-            if os.path.isfile(path):
-                os.remove(path)
-
-            db.delete(file)
+            # the content is only removed with its last file
+            release_file(file)
             db.commit()
             return delete_file(ok=True, info_text="File successfully removed.", status_code=200)
         else:
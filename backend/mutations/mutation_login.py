@@ -1,9 +1,10 @@
-from argon2 import PasswordHasher
 from argon2.exceptions import VerificationError, InvalidHashError
 from flask import session
 import graphene
 
 from config import db
+from password_hashing import PasswordHashingBusy, hash_password, needs_rehash, verify_password
+from rate_limit import limit_request
 from schema import UserModel
 
 ##################################
@@ -20,23 +21,33 @@ class login(graphene.Mutation):
 
     @staticmethod
     def mutate(self, info, email, password):
+        # rejected before the user is loaded and the password is hashed
+        rejected = limit_request("login", email)
+        if rejected:
+            return login(ok=False, info_text=rejected, status_code=429)
+
         user = UserModel.query.filter(UserModel.email == email).first()
 
         if not user:
             return login(ok=False, info_text="Der Nutzer mit der angegeben E-Mail existiert nicht.", status_code=404)
         else:
             try:
-                ph = PasswordHasher()
-                ph.verify(user.password_hash, password)
+                verify_password(user.password_hash, password)
             except VerificationError:
                 return login(ok=False, info_text="Die Anmeldung ist fehlgeschlagen!", status_code=401)
             except InvalidHashError:
                 return login(ok=False, info_text="Die Anmeldung ist fehlgeschlagen!", status_code=401)
+            except PasswordHashingBusy as e:
+                return login(ok=False, info_text=str(e), status_code=503)
 
-            if ph.check_needs_rehash(user.password_hash):
-                user.password_hash = ph.hash(password)
-                db.add(user)
-                db.commit()
+            # hashes with old argon2 parameters are renewed, if the pool is busy with a later login
+            if needs_rehash(user.password_hash):
+                try:
+                    user.password_hash = hash_password(password)
+                    db.add(user)
+                    db.commit()
+                except PasswordHashingBusy:
+                    db.rollback()
 
             session['user_id'] = user.user_id
             return login(ok=True, info_text="Die Anmeldung war erfolgreich!", status_code=200)
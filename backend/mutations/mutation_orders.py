@@ -3,10 +3,11 @@ from flask import session
 import graphene
 import traceback
 
-from authorization_check import is_authorised, reject_message
+from availability import lock_physical_objects, to_interval, unavailable_objects
+from authorization_check import invalidate_user_rights, is_authorised, reject_message
 from config import db, timezone
 from models import userRights, orderStatus
-from scheduler import AddJob, CancelJob, status_change
+from scheduler import CancelJob, reset_reminders, status_change
 from schema import Order, OrderModel, OrganizationModel, Organization_UserModel, PhysicalObjectModel, PhysicalObject_Order, PhysicalObject_OrderModel, UserModel
 
 ##################################
@@ -41,15 +42,28 @@ class create_order(graphene.Mutation):
             return create_order(ok=False, info_text="Keine valide session vorhanden", status_code=419)
         
         try:
-            physicalobjects = db.query(PhysicalObjectModel).filter(PhysicalObjectModel.phys_id.in_(physicalobjects)).all()
+            if till_date <= from_date:
+                return create_order(ok=False, info_text="Das Enddatum muss nach dem Startdatum liegen.", status_code=400)
+
+            # Lock the physical objects, concurrent orders for them wait until this transaction is committed
+            phys_ids = physicalobjects
+            physicalobjects = lock_physical_objects(phys_ids)
             if not physicalobjects:
+                db.rollback()
                 return create_order(ok=False, info_text="Physical Objects not found.", status_code=404)
             
             # Check if all physical objects are from the same organization
             organization_id = physicalobjects[0].organization_id
-            organization = db.query(OrganizationModel).filter(OrganizationModel.organization_id == organization_id).first()
             if len(set([phys_obj.organization_id for phys_obj in physicalobjects])) > 1:
+                db.rollback()
                 return create_order(ok=False, info_text="Alle Objekte müssen der selben Organisation angehören.", status_code=400)
+
+            # Check if the physical objects are already booked in this time
+            if unavailable_objects(phys_ids, from_date, till_date):
+                db.rollback()
+                return create_order(ok=False, info_text="Mindestens ein Objekt ist in diesem Zeitraum bereits ausgeliehen.", status_code=409)
+
+            organization = physicalobjects[0].organization
             
             # Check if User is part of the organization
             executive_user = db.query(UserModel).filter(UserModel.user_id == session_user_id).first()
@@ -60,10 +74,10 @@ class create_order(graphene.Mutation):
                     break
             
 
-            # add User to organization if not present
+            # add User to organization if not present, committed together with the order
             if not is_in_organization:
                 organization.add_user(executive_user)
-                db.commit()
+                db.flush()
 
             # Create order
             order = OrderModel(
@@ -90,13 +104,15 @@ class create_order(graphene.Mutation):
                     order.deposit = 0
 
             db.add(order)
+            # releases the locks, the reminders are sent by the reminder dispatcher
             db.commit()
+            if not is_in_organization:
+                invalidate_user_rights(session_user_id)
 
-            # Add jobs for email reminders for this order
-            AddJob(order.order_id)
             return create_order(ok=True, info_text="Order erfolgreich erstellt.", order=order, status_code=200)
 
         except Exception as e:
+            db.rollback()
             print(e)
             tb = traceback.format_exc()
             return create_order(ok=False, info_text="Order konnte nicht erstellt werden. " + str(e) + "\n" + str(tb), status_code=500)
@@ -133,19 +149,30 @@ class update_order(graphene.Mutation):
         if not is_authorised(userRights.customer, session_user_id, order_id=order_id):
                 return update_order(ok=False, info_text=reject_message, status_code=403)
         
-        # Remove all email reminders for this order
-        CancelJob(order_id)
-
         try:            
             order = OrderModel.query.filter(OrderModel.order_id == order_id).first()
             # Abort if object does not exist
             if not order:
                 return update_order(ok=False, info_text="Order nicht gefunden.", status_code=404)
 
-            if from_date:
-                order.from_date = from_date
-            if till_date:
-                order.till_date = till_date
+            if from_date or till_date:
+                new_from_date = from_date or order.from_date
+                new_till_date = till_date or order.till_date
+                start, end = to_interval(new_from_date, new_till_date)
+                if end <= start:
+                    return update_order(ok=False, info_text="Das Enddatum muss nach dem Startdatum liegen.", status_code=400)
+
+                # Lock the physical objects like create_order, the new dates must not overlap other orders of them
+                phys_ids = [phys_order.phys_id for phys_order in order.physicalobjects]
+                lock_physical_objects(phys_ids)
+                if unavailable_objects(phys_ids, new_from_date, new_till_date, exclude_order_id=order_id):
+                    db.rollback()
+                    return update_order(ok=False, info_text="Mindestens ein Objekt ist in diesem Zeitraum bereits ausgeliehen.", status_code=409)
+
+                order.from_date = new_from_date
+                order.till_date = new_till_date
+                # send the reminders again for the new dates
+                reset_reminders(order_id)
             if users:
                 db_users = db.query(UserModel).filter(UserModel.user_id.in_(users)).all()
                 order.users = db_users
@@ -153,16 +180,13 @@ class update_order(graphene.Mutation):
             if deposit:
                 order.deposit = deposit
 
-            db.commit()
-
-            # add new email reminders for modified job
-            AddJob(order_id)
             status_change(order)
+            db.commit()
 
             return update_order(ok=True, info_text="OrderStatus aktualisiert.", order=order, status_code=200)
 
         except Exception as e:
-            AddJob(order_id)
+            db.rollback()
             print(e)
             tb = traceback.format_exc()
             return update_order(ok=False, info_text="Fehler beim Aktualisieren der Orders. " + str(e) + " traceback: " + str(tb), status_code=500)
@@ -215,8 +239,8 @@ class update_order_status(graphene.Mutation):
                 if return_notes:
                     order.return_notes = return_notes
 
-            db.commit()
             status_change(phys_order[0].order)
+            db.commit()
             return update_order_status(ok=True, info_text="OrderStatus aktualisiert.", phys_order=phys_order, status_code=200)
 
         except Exception as e:
@@ -258,14 +282,24 @@ class add_physical_object_to_order(graphene.Mutation):
             if not order:
                 return add_physical_object_to_order(ok=False, info_text="Order nicht gefunden.", status_code=404)
             
-            db_physicalobjects = db.query(PhysicalObjectModel).filter(PhysicalObjectModel.phys_id.in_(physicalObjects)).all()
+            # Lock the physical objects, concurrent orders for them wait until this transaction is committed
+            db_physicalobjects = lock_physical_objects(physicalObjects)
+            if not db_physicalobjects:
+                db.rollback()
+                return add_physical_object_to_order(ok=False, info_text="Physical Objects not found.", status_code=404)
 
             # check if all physical objects are in the same organization
             organization = order.organization
             for phys_obj in db_physicalobjects:
                 if phys_obj.organization_id != organization.organization_id:
+                    db.rollback()
                     return add_physical_object_to_order(ok=False, info_text="Physical Objects not in the same organization as the order.", status_code=400)
 
+            # Check if the physical objects are already booked in the time of the order
+            if unavailable_objects(physicalObjects, order.from_date, order.till_date, exclude_order_id=order_id):
+                db.rollback()
+                return add_physical_object_to_order(ok=False, info_text="Mindestens ein Objekt ist in diesem Zeitraum bereits ausgeliehen.", status_code=409)
+
 
             for physObj in db_physicalobjects:
                 order.addPhysicalObject(physObj)
@@ -279,11 +313,12 @@ class add_physical_object_to_order(graphene.Mutation):
 
             order.deposit = min(phys_deposit, max_deposit)
 
-            db.commit()
             status_change(order)
+            db.commit()
             return add_physical_object_to_order(ok=True, info_text="Physical Objects added to Order.", phys_order=order.physicalobjects, status_code=200)
 
         except Exception as e:
+            db.rollback()
             print(e)
             tb = traceback.format_exc()
             return add_physical_object_to_order(ok=False, info_text="Error adding Physical Objects to Order. " + str(e) + "traceback: " + str(tb), status_code=500)
@@ -337,8 +372,8 @@ class remove_physical_object_from_order(graphene.Mutation):
 
             order.deposit = min(phys_deposit, max_deposit)
 
-            db.commit()
             status_change(order)
+            db.commit()
             return remove_physical_object_from_order(ok=True, info_text="Physical Objects removed from Order.",
                                                      phys_order=order.physicalobjects, status_code=200)
 
@@ -377,16 +412,16 @@ class delete_order(graphene.Mutation):
         order = OrderModel.query.filter(OrderModel.order_id == order_id).first()
         if order:
             try:
-                # remove email reminders for deleted order
+                # remove email jobs and sent reminders of the deleted order
                 CancelJob(order_id)
+                reset_reminders(order_id)
 
                 order.removeAllPhysicalObjects()
                 db.delete(order)
                 db.commit()
                 return delete_order(ok=True, info_text="Order erfolgreich entfernt.", status_code=200)
             except Exception as e:
-                # Re-add the job for email reminders because the deletion failed
-                AddJob(order_id)
+                db.rollback()
                 print(e)
                 tb = traceback.format_exc()
                 return delete_order(ok=False, info_text="Fehler beim Entfernen der Order. " + str(e) + "\n" + str(tb), status_code=500)
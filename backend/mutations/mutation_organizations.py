@@ -3,7 +3,7 @@ import graphene
 import traceback
 import os
 
-from authorization_check import is_authorised, reject_message
+from authorization_check import invalidate_user_rights, is_authorised, reject_message
 from config import picture_directory, pdf_directory
 from models import db, userRights, File
 from schema import FileModel, Organization, OrganizationModel, Organization_User, Organization_UserModel, PhysicalObjectModel, UserModel
@@ -89,6 +89,7 @@ class create_organization(graphene.Mutation):
 
 
             db.commit()
+            invalidate_user_rights()
             return create_organization(ok=True, info_text="Organisation erfolgreich erstellt.", organization=organization, status_code=200)
 
         except Exception as e:
@@ -259,6 +260,7 @@ class add_user_to_organization(graphene.Mutation):
 
             db.add(organization_user)
             db.commit()
+            invalidate_user_rights(user_id)
             return add_user_to_organization(ok=True, info_text="User erfolgreich zur Organisation hinzugefügt.", organization_user=organization_user, status_code=200)
         except Exception as e:
             print(e)
@@ -302,6 +304,7 @@ class remove_user_from_organization(graphene.Mutation):
 
             organization.remove_user(user)
             db.commit()
+            invalidate_user_rights(user_id)
 
             return remove_user_from_organization(ok=True, info_text="User erfolgreich aus der Organisation entfernt.", organization=organization, status_code=200)
         except Exception as e:
@@ -352,6 +355,7 @@ class update_user_rights(graphene.Mutation):
                 organization.set_user_right(user.user_id, userRights[new_rights])
 
             db.commit()
+            invalidate_user_rights(user_id)
             return update_user_rights(ok=True, info_text="Rechte erfolgreich aktualisiert.", organization=organization, status_code=200)
         except Exception as e:
             print(e)
@@ -459,6 +463,7 @@ class delete_organization(graphene.Mutation):
         if organization:
             db.delete(organization)
             db.commit()
+            invalidate_user_rights()
             return delete_organization(ok=True, info_text="Organisation erfolgreich entfernt.", status_code=200)
         else:
             return delete_organization(ok=False, info_text="Organisation konnte nicht entfernt werden.", status_code=404)
@@ -3,6 +3,7 @@ import graphene
 import traceback
 
 from authorization_check import is_authorised, reject_message
+from availability import availability, is_available
 from config import db
 from models import userRights
 from schema import FileModel, GroupModel, OrderModel, PhysicalObject, PhysicalObjectModel, TagModel
@@ -276,15 +277,61 @@ class is_physical_object_available(graphene.Mutation):
     
 
         # Check if object is available
-        phys_orders = physical_object.orders
-
-        for phys_order in phys_orders:
-            order = phys_order.order
-            from_date = order.from_date.date()
-            till_date = order.till_date.date()
-            print("From Date: ", from_date)
-            print("Till Date: ", till_date)
-            if from_date <= end_date and till_date >= start_date:
-                return is_physical_object_available(ok=True, info_text="Objekt nicht verfügbar.", is_available=False, status_code=200)
+        if not is_available(phys_id, start_date, end_date):
+            return is_physical_object_available(ok=True, info_text="Objekt nicht verfügbar.", is_available=False, status_code=200)
         
         return is_physical_object_available(ok=True, info_text="Objekt verfügbar.", is_available=True, status_code=200)
+
+
+class DateRange(graphene.InputObjectType):
+    start_date  = graphene.Date(required=True)
+    end_date    = graphene.Date(required=True)
+
+
+class PhysicalObjectAvailability(graphene.ObjectType):
+    phys_id         = graphene.String()
+    start_date      = graphene.Date()
+    end_date        = graphene.Date()
+    is_available    = graphene.Boolean()
+
+
+class are_physical_objects_available(graphene.Mutation):
+    """
+    Checks for every given physical object and every given date range if the object is available.
+    """
+
+    class Arguments:
+        phys_ids    = graphene.List(graphene.String, required=True)
+        date_ranges = graphene.List(DateRange, required=True)
+
+    ok              = graphene.Boolean()
+    info_text       = graphene.String()
+    status_code     = graphene.Int()
+    availabilities  = graphene.List(PhysicalObjectAvailability)
+
+    @staticmethod
+    def mutate(self, info, phys_ids, date_ranges):
+        # Check if user is authorised
+        try:
+            session_user_id = session['user_id']
+        except:
+            return are_physical_objects_available(ok=False, info_text="Keine valide session vorhanden", status_code=419)
+
+        organization_ids = db.query(PhysicalObjectModel.phys_id, PhysicalObjectModel.organization_id).filter(PhysicalObjectModel.phys_id.in_(phys_ids)).all()
+        if len(organization_ids) != len(set(phys_ids)):
+            return are_physical_objects_available(ok=False, info_text="Objekt nicht gefunden.", status_code=404)
+
+        for organization_id in set(organization_id for _, organization_id in organization_ids):
+            if not is_authorised(userRights.customer, session_user_id, organization_id=organization_id):
+                return are_physical_objects_available(ok=False, info_text=reject_message, status_code=403)
+
+
+        ranges = [(date_range.start_date, date_range.end_date) for date_range in date_ranges]
+        available = availability(list(set(phys_ids)), ranges)
+
+        availabilities = [
+            PhysicalObjectAvailability(phys_id=phys_id, start_date=start_date, end_date=end_date, is_available=available[(phys_id, index)])
+            for phys_id in phys_ids
+            for index, (start_date, end_date) in enumerate(ranges)
+        ]
+        return are_physical_objects_available(ok=True, info_text="Verfügbarkeit geprüft.", availabilities=availabilities, status_code=200)
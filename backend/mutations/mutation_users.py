@@ -1,15 +1,15 @@
-from argon2 import PasswordHasher
 from flask import session
 import graphene
-import os
-from string import Template
 import traceback
 import uuid
 
-from authorization_check import reject_message
-from config import db, template_directory
+from authorization_check import invalidate_user_rights, reject_message
+from config import db
 from schema import User, UserModel
-from sendMail import sendMail
+from outbox import enqueue_mail
+from password_hashing import PasswordHashingBusy, hash_password
+from rate_limit import limit_request
+from template_registry import template_registry
 
 ##################################
 # Mutations for Users            #
@@ -53,8 +53,10 @@ class create_user(graphene.Mutation):
             if user_exists:
                 return create_user(ok=False, info_text="Die angegebene E-Mail wird bereits verwendet.", status_code=409)
             else:
-                ph = PasswordHasher()
-                password_hashed = ph.hash(password)
+                try:
+                    password_hashed = hash_password(password)
+                except PasswordHashingBusy as e:
+                    return create_user(ok=False, info_text=str(e), status_code=503)
                 user = UserModel(first_name=first_name, last_name=last_name, email=email, password_hash=password_hashed)
 
                 if country:
@@ -132,8 +134,11 @@ class update_user(graphene.Mutation):
             if first_name:
                 user.first_name = first_name
             if password:
-                ph = PasswordHasher()
-                user.password_hash = ph.hash(password)
+                try:
+                    user.password_hash = hash_password(password)
+                except PasswordHashingBusy as e:
+                    db.rollback()
+                    return update_user(ok=False, info_text=str(e), status_code=503)
 
             if country:
                 user.country = country
@@ -170,22 +175,26 @@ class reset_password(graphene.Mutation):
 
     @staticmethod
     def mutate(self, info, email):
+        # rejected before the user is loaded, so nobody can flood the mail server
+        rejected = limit_request("reset_password", email)
+        if rejected:
+            return reset_password(ok=False, info_text=rejected, status_code=429)
+
         user = db.query(UserModel).filter(UserModel.email == email).first()
         if not user:
             return reset_password(ok=False, info_text="User not found", status_code=404)
         
         # generate random password
         new_password = str(uuid.uuid4())
-        ph = PasswordHasher()
-        user.password_hash = ph.hash(new_password)
-        db.commit()
-
-        # read template text
-        with open(os.path.join(template_directory, "password_reset_template.html"), encoding="utf-8") as file:
-            template_password = Template(file.read())
+        try:
+            user.password_hash = hash_password(new_password)
+        except PasswordHashingBusy as e:
+            db.rollback()
+            return reset_password(ok=False, info_text=str(e), status_code=503)
 
-        # send mail
-        sendMail(receiver=email, subject="Ihr Password wurde zurückgesetzt", body=template_password.substitute(password=new_password))
+        # the mail is only queued if the new password is saved, it is sent in the background after the commit
+        enqueue_mail(receiver=email, subject="Ihr Password wurde zurückgesetzt", body=template_registry.render("password_reset_template.html", password=new_password))
+        db.commit()
 
         return reset_password(ok=True, info_text="New password was send by mail", status_code=200)
 
@@ -219,6 +228,7 @@ class delete_user(graphene.Mutation):
         if user:
             db.delete(user)
             db.commit()
+            invalidate_user_rights(user_id)
             return delete_user(ok=True, info_text="Nutzer erfolgreich entfernt.", status_code=200)
         else:
             return delete_user(ok=False, info_text="Nutzer konnte nicht entfernt werden.", status_code=404)
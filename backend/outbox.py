@@ -0,0 +1,295 @@
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, func
+from sqlalchemy.exc import IntegrityError
+
+from config import db, add_periodic_job, timezone, outbox_interval, outbox_batch_size, outbox_max_attempts, outbox_retention_days, mail_pool_size
+from models import MailOutbox, mailStatus
+from sendMail import send_mails
+
+# first retry after 1 minute, then 2, 4, 8, ... minutes, never more than 6 hours
+backoff_base    = timedelta(minutes=1)
+backoff_max     = timedelta(hours=6)
+# claimed mails which are not finished in this time (e.g. the process died) are sent again
+claim_timeout   = timedelta(minutes=10)
+
+dispatcher_job_id = "outbox_dispatcher"
+purge_job_id = "outbox_purge"
+# finished mails deleted with one statement
+purge_batch_size = 1000
+
+# counters of this process, the state of the outbox itself is read from the database
+_metrics = {"sent": 0, "retried": 0, "failed": 0, "runs": 0}
+_metrics_lock = threading.Lock()
+
+def local_now():
+    # dates are stored as local times without timezone like the dates of orders
+    return datetime.now(timezone).replace(tzinfo=None)
+
+##################################
+# Queueing mails                 #
+##################################
+def enqueue_mail(receiver, subject, body, key=None, send_after=None, session=None, deduplicate=True):
+    """
+    adds a mail to the outbox, it is committed together with the rest of the transaction
+    mails with a key which is already in the outbox are not queued again, also if another transaction queues it at the same time
+    (deduplicate=False skips the lookup if the caller ensures unique keys, a duplicate then fails the commit)
+    returns the queued mail or None for a duplicate
+    """
+    session = session or db
+    if key and deduplicate:
+        # the session doesn't flush automatically, so mails of this transaction are looked up in the session
+        if any(isinstance(mail, MailOutbox) and mail.idempotency_key == key for mail in session.new) or \
+                session.query(MailOutbox.mail_id).filter(MailOutbox.idempotency_key == key).first():
+            return None
+
+    now = local_now()
+    # with the primary key set here the mails of one flush are inserted with a single statement
+    mail_id = str(uuid.uuid4())
+    mail = MailOutbox(mail_id=mail_id, idempotency_key=key or mail_id, receiver=receiver, subject=subject, body=body,
+                      created_at=now, send_after=send_after or now, attempts=0, status=mailStatus.pending)
+    if key and deduplicate:
+        # a concurrent transaction may queue the same key after the lookup, the mail is inserted in a savepoint
+        # so the duplicate only discards the mail and not the change of the caller
+        session.flush()
+        try:
+            with session.begin_nested():
+                session.add(mail)
+        except IntegrityError as e:
+            if "idempotency_key" not in str(e.orig):
+                raise
+            return None
+    else:
+        session.add(mail)
+
+    # mails which are due now wake the mail delivery after the commit
+    if send_after is None:
+        session.info["mails_queued"] = True
+    return mail
+
+def cancel_mails(key_prefix, session=None):
+    """
+    removes the mails which were not sent yet and whose key starts with key_prefix
+    """
+    session = session or db
+    return session.query(MailOutbox) \
+        .filter(MailOutbox.idempotency_key.like(key_prefix + "%"), MailOutbox.status == mailStatus.pending) \
+        .delete(synchronize_session=False)
+
+
+##################################
+# Outbox dispatcher              #
+##################################
+def schedule_outbox_dispatcher():
+    """
+    adds the periodic jobs which send the mails of the outbox and delete the old finished ones
+    """
+    add_periodic_job(dispatcher_job_id, "Outbox dispatcher", drain_outbox, seconds=outbox_interval)
+    add_periodic_job(purge_job_id, "Outbox purge", purge_outbox, hours=1)
+
+def backoff(attempts):
+    # the exponent is limited, 2 ** 20 minutes are far above backoff_max
+    return min(backoff_base * (2 ** min(attempts - 1, 20)), backoff_max)
+
+def claim_mails(now, batch_size):
+    """
+    reserves the next due mails for this dispatcher by moving their send_after behind the claim timeout
+    locked rows of other dispatchers are skipped
+    """
+    mails = db.query(MailOutbox) \
+        .filter(MailOutbox.status == mailStatus.pending, MailOutbox.send_after <= now) \
+        .order_by(MailOutbox.send_after) \
+        .limit(batch_size) \
+        .with_for_update(skip_locked=True) \
+        .all()
+    claimed = [(mail.mail_id, mail.receiver, mail.subject, mail.body) for mail in mails]
+    for mail in mails:
+        mail.send_after = now + claim_timeout
+    db.commit()
+    return claimed
+
+def drain_outbox(now=None, batch_size=None, send=send_mails, workers=None):
+    """
+    sends the due mails of the outbox, runs every outbox_interval seconds
+    the mails are split between workers threads, each sends its part over one pooled connection
+    failed mails are retried with exponential backoff until outbox_max_attempts is reached
+    returns the number of sent mails
+    """
+    now = now or local_now()
+    batch_size = batch_size or outbox_batch_size
+    workers = workers or mail_pool_size
+
+    sent = 0
+    try:
+        while True:
+            claimed = claim_mails(now, batch_size)
+            if not claimed:
+                break
+
+            chunks = [claimed[i::workers] for i in range(workers) if claimed[i::workers]]
+            with ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+                results = list(executor.map(lambda chunk: list(zip(chunk, send([mail[1:] for mail in chunk]))), chunks))
+
+            errors = {mail[0]: error for result in results for mail, error in result}
+            for mail in db.query(MailOutbox).filter(MailOutbox.mail_id.in_(list(errors.keys()))).all():
+                record_attempt(mail, errors[mail.mail_id], now)
+                sent += errors[mail.mail_id] is None
+            db.commit()
+
+            if len(claimed) < batch_size:
+                break
+    finally:
+        db.remove()
+
+    with _metrics_lock:
+        _metrics["runs"] += 1
+    return sent
+
+def record_attempt(mail, error, now):
+    mail.attempts += 1
+    if error is None:
+        mail.status = mailStatus.sent
+        mail.sent_at = now
+        mail.last_error = None
+        # the body isn't needed anymore and may contain secrets like the new password of a reset
+        mail.body = ""
+        metric = "sent"
+    elif mail.attempts >= outbox_max_attempts:
+        mail.status = mailStatus.failed
+        mail.last_error = str(error)[:500]
+        mail.body = ""
+        metric = "failed"
+    else:
+        mail.send_after = now + backoff(mail.attempts)
+        mail.last_error = str(error)[:500]
+        metric = "retried"
+
+    with _metrics_lock:
+        _metrics[metric] += 1
+
+def purge_outbox(now=None, retention_days=None):
+    """
+    deletes the sent and failed mails which were finished more than retention_days ago, runs every hour
+    the claim of the last attempt set send_after right before it finished, so the mails are found with the (status, send_after) index
+    they are deleted in batches to keep the transactions short
+    returns the number of deleted mails
+    """
+    now = now or local_now()
+    retention_days = outbox_retention_days if retention_days is None else retention_days
+    cutoff = now - timedelta(days=retention_days)
+
+    deleted = 0
+    try:
+        for status in (mailStatus.sent, mailStatus.failed):
+            while True:
+                mail_ids = [mail_id for mail_id, in db.query(MailOutbox.mail_id)
+                            .filter(MailOutbox.status == status, MailOutbox.send_after < cutoff)
+                            .limit(purge_batch_size)]
+                if mail_ids:
+                    deleted += db.query(MailOutbox).filter(MailOutbox.mail_id.in_(mail_ids)).delete(synchronize_session=False)
+                db.commit()
+                if len(mail_ids) < purge_batch_size:
+                    break
+    finally:
+        db.remove()
+    return deleted
+
+
+##################################
+# Immediate delivery             #
+##################################
+class MailDelivery(threading.Thread):
+    """
+    Sends the queued mails right after the transaction which queued them was committed,
+    so they don't wait for the next run of the outbox dispatcher.
+    Requests only wake this thread, they never wait for the mail server.
+    """
+
+    def __init__(self, drain=drain_outbox):
+        super().__init__(name="mail-delivery", daemon=True)
+        self.drain = drain
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+
+    def notify(self):
+        self.wake.set()
+
+    def run(self):
+        while True:
+            self.wake.wait()
+            if self.stopped.is_set():
+                return
+            # mails queued while the outbox is drained wake the thread again
+            self.wake.clear()
+            try:
+                self.drain()
+            except Exception as e:
+                # the outbox dispatcher sends the mails later
+                print("Mail delivery failed: " + str(e))
+
+    def stop(self):
+        self.stopped.set()
+        self.wake.set()
+
+
+mail_delivery = None
+_mail_delivery_enabled = False
+_mail_delivery_lock = threading.Lock()
+
+def enable_mail_delivery():
+    """
+    lets the commits of this process send their mails immediately
+    the thread is started with the first mail, so it also runs in processes forked after this call
+    """
+    global _mail_delivery_enabled
+    _mail_delivery_enabled = True
+
+def notify_mail_delivery():
+    global mail_delivery
+    if not _mail_delivery_enabled:
+        return
+    with _mail_delivery_lock:
+        if mail_delivery is None or not mail_delivery.is_alive():
+            mail_delivery = MailDelivery()
+            mail_delivery.start()
+    mail_delivery.notify()
+
+@event.listens_for(db, "after_commit")
+def mails_committed(session):
+    if session.info.pop("mails_queued", False):
+        notify_mail_delivery()
+
+@event.listens_for(db, "after_rollback")
+def mails_rolled_back(session):
+    session.info.pop("mails_queued", None)
+
+
+##################################
+# Metrics                        #
+##################################
+def outbox_metrics():
+    """
+    size of the outbox and the delivery counters of this process
+    """
+    now = local_now()
+    # one count per status reads only its range of the (status, send_after) index
+    counts = {status: db.query(func.count()).select_from(MailOutbox).filter(MailOutbox.status == status).scalar()
+              for status in mailStatus}
+    oldest = db.query(func.min(MailOutbox.send_after)) \
+        .filter(MailOutbox.status == mailStatus.pending, MailOutbox.send_after <= now) \
+        .scalar()
+
+    with _metrics_lock:
+        process = dict(_metrics)
+
+    return {
+        "pending": counts.get(mailStatus.pending, 0),
+        "sent": counts.get(mailStatus.sent, 0),
+        "failed": counts.get(mailStatus.failed, 0),
+        # how long the oldest due mail is waiting already
+        "oldest_due_seconds": (now - oldest).total_seconds() if oldest else 0,
+        "process": process,
+    }
@@ -0,0 +1,102 @@
+import base64
+import json
+
+import graphene
+from graphene import relay
+from graphene.relay.connection import PageInfo
+from sqlalchemy import inspect, tuple_
+
+# page size if neither first nor last is given and upper bound for both
+default_page_size   = 50
+max_page_size       = 500
+
+##################################
+# Connections with total count   #
+##################################
+class CountableConnection(relay.Connection):
+    """
+    relay connection which additionally returns the number of all matching nodes
+    """
+    class Meta:
+        abstract = True
+
+    total_count = graphene.Int(description="Number of all nodes matching the filter, independent of the page")
+
+    @staticmethod
+    def resolve_total_count(root, info):
+        count_query = getattr(root, "count_query", None)
+        if count_query is not None:
+            # only count when the client asks for it, eager loads are useless for counting
+            return count_query.enable_eagerloads(False).order_by(None).count()
+        return getattr(root, "length", None)
+
+
+def encode_cursor(values):
+    return base64.b64encode(("cursor:" + json.dumps(values)).encode("utf-8")).decode("utf-8")
+
+def decode_cursor(cursor):
+    try:
+        prefix, values = base64.b64decode(cursor).decode("utf-8").split(":", 1)
+        if prefix != "cursor":
+            raise ValueError
+        return json.loads(values)
+    except Exception:
+        raise ValueError("Ungültiger Cursor: " + str(cursor))
+
+
+def paginate(query, model, connection_type, first=None, after=None, last=None, before=None):
+    """
+    keyset pagination over the primary key of the model
+    only the rows of the requested page (+1 to detect further pages) are fetched
+    """
+    primary_key = [getattr(model, inspect(model).get_property_by_column(column).key) for column in inspect(model).primary_key]
+
+    def key_of(values):
+        if len(primary_key) == 1:
+            return primary_key[0], values[0]
+        return tuple_(*primary_key), tuple_(*values)
+
+    def cursor_of(node):
+        return encode_cursor([getattr(node, attribute.key) for attribute in primary_key])
+
+    for size in (first, last):
+        if size is not None and size < 0:
+            raise ValueError("first und last dürfen nicht negativ sein")
+
+    page = query
+    if after:
+        key, value = key_of(decode_cursor(after))
+        page = page.filter(key > value)
+    if before:
+        key, value = key_of(decode_cursor(before))
+        page = page.filter(key < value)
+
+    if last is not None and first is None:
+        # walk backwards from the end (or from before)
+        limit = min(last, max_page_size)
+        nodes = page.order_by(*[attribute.desc() for attribute in primary_key]).limit(limit + 1).all()
+        has_previous_page = len(nodes) > limit
+        nodes = list(reversed(nodes[:limit]))
+        has_next_page = bool(before)
+    else:
+        limit = min(first if first is not None else default_page_size, max_page_size)
+        nodes = page.order_by(*primary_key).limit(limit + 1).all()
+        has_next_page = len(nodes) > limit
+        nodes = nodes[:limit]
+        has_previous_page = bool(after)
+        if last is not None and len(nodes) > last:
+            nodes = nodes[len(nodes) - last:]
+            has_previous_page = True
+
+    edges = [connection_type.Edge(node=node, cursor=cursor_of(node)) for node in nodes]
+    connection = connection_type(
+        edges=edges,
+        page_info=PageInfo(
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+            has_previous_page=has_previous_page,
+            has_next_page=has_next_page,
+        ),
+    )
+    connection.count_query = query
+    return connection
@@ -0,0 +1,108 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from argon2 import PasswordHasher
+
+from config import argon2_time_cost, argon2_memory_cost, argon2_parallelism, password_hash_workers, password_hash_queue_limit
+
+class PasswordHashingBusy(Exception):
+    """
+    raised when more passwords are waiting for hashing than password_hash_queue_limit
+    """
+
+
+class HashingPool:
+    """
+    Runs the argon2 hashing and verification of passwords on a bounded number of threads.
+    argon2 releases the GIL, so at most workers passwords are hashed in parallel and the other
+    threads of the process keep running. At most queue_limit passwords wait, further calls are rejected.
+    The threads are started with the first password, so the pool also works in forked processes.
+    """
+
+    def __init__(self, hasher, workers=2, queue_limit=32):
+        self.hasher = hasher
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.executor = None
+        self.lock = threading.Lock()
+        self.waiting = 0
+        self.counters = {"calls": 0, "rejected": 0, "queue_seconds": 0.0, "max_queue_seconds": 0.0, "hash_seconds": 0.0}
+
+    def run(self, function, *args):
+        """
+        runs function(*args) on the pool and returns its result, exceptions are raised in the caller
+        """
+        with self.lock:
+            if self.queue_limit and self.waiting >= self.queue_limit + self.workers:
+                self.counters["rejected"] += 1
+                raise PasswordHashingBusy("Zu viele gleichzeitige Anfragen, bitte versuchen Sie es gleich noch einmal.")
+            self.waiting += 1
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hashing")
+            executor = self.executor
+
+        submitted = time.perf_counter()
+        times = {}
+
+        def timed():
+            times["started"] = time.perf_counter()
+            try:
+                return function(*args)
+            finally:
+                times["finished"] = time.perf_counter()
+
+        try:
+            return executor.submit(timed).result()
+        finally:
+            with self.lock:
+                self.waiting -= 1
+                if "started" in times:
+                    queue_seconds = times["started"] - submitted
+                    self.counters["calls"] += 1
+                    self.counters["queue_seconds"] += queue_seconds
+                    self.counters["max_queue_seconds"] = max(self.counters["max_queue_seconds"], queue_seconds)
+                    self.counters["hash_seconds"] += times["finished"] - times["started"]
+
+    def hash(self, password):
+        return self.run(self.hasher.hash, password)
+
+    def verify(self, password_hash, password):
+        """
+        raises argon2.exceptions.VerificationError or InvalidHashError like PasswordHasher.verify
+        """
+        return self.run(self.hasher.verify, password_hash, password)
+
+    def check_needs_rehash(self, password_hash):
+        # only parses the hash, it doesn't need the pool
+        return self.hasher.check_needs_rehash(password_hash)
+
+    def metrics(self):
+        with self.lock:
+            counters = dict(self.counters)
+            counters["waiting"] = self.waiting
+        counters["workers"] = self.workers
+        counters["average_queue_seconds"] = counters["queue_seconds"] / counters["calls"] if counters["calls"] else 0
+        return counters
+
+    def shutdown(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor:
+            executor.shutdown()
+
+
+password_hasher = PasswordHasher(time_cost=argon2_time_cost, memory_cost=argon2_memory_cost, parallelism=argon2_parallelism)
+hashing_pool = HashingPool(password_hasher, workers=password_hash_workers, queue_limit=password_hash_queue_limit)
+
+def hash_password(password):
+    return hashing_pool.hash(password)
+
+def verify_password(password_hash, password):
+    return hashing_pool.verify(password_hash, password)
+
+def needs_rehash(password_hash):
+    return hashing_pool.check_needs_rehash(password_hash)
+
+def hashing_metrics():
+    return hashing_pool.metrics()
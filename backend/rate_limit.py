@@ -0,0 +1,139 @@
+import math
+import threading
+import time
+
+import redis
+from flask import has_request_context, request
+
+from config import login_rate_limit_ip, login_rate_limit_account, reset_rate_limit_ip, reset_rate_limit_account, rate_limit_storage
+
+def parse_limit(limit):
+    """
+    "<requests>/<seconds>" -> (capacity, tokens per second)
+    """
+    requests, seconds = limit.split("/")
+    return int(requests), int(requests) / float(seconds)
+
+# action -> limits per ip and per account
+rate_limits = {
+    "login": (parse_limit(login_rate_limit_ip), parse_limit(login_rate_limit_account)),
+    "reset_password": (parse_limit(reset_rate_limit_ip), parse_limit(reset_rate_limit_account)),
+}
+
+##################################
+# Token bucket storage           #
+##################################
+class MemoryBucketStore:
+    """
+    Token buckets in the memory of this process
+    """
+
+    def __init__(self, max_buckets=100000):
+        self.buckets = {}
+        self.max_buckets = max_buckets
+        self.lock = threading.Lock()
+
+    def take(self, key, capacity, rate, now, cost=1):
+        """
+        takes cost tokens from the bucket if it has enough, returns (allowed, tokens left)
+        """
+        with self.lock:
+            tokens, updated = self.buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + max(0, now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self.buckets[key] = (tokens, now)
+
+            if len(self.buckets) > self.max_buckets:
+                self.prune(now)
+        return allowed, tokens
+
+    def prune(self, now):
+        # buckets unused for an hour are full again for all configured limits
+        self.buckets = {key: bucket for key, bucket in self.buckets.items() if now - bucket[1] < 3600}
+
+
+class RedisBucketStore:
+    """
+    Token buckets in redis, shared by all processes
+    the bucket is read and updated by one script, so concurrent requests can't take the same token
+    """
+
+    script = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local cost = tonumber(ARGV[4])
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = tonumber(bucket[1]) or capacity
+    local updated = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+    local allowed = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, client, prefix="rate_limit:"):
+        self.prefix = prefix
+        self.take_tokens = client.register_script(self.script)
+
+    def take(self, key, capacity, rate, now, cost=1):
+        allowed, tokens = self.take_tokens(keys=[self.prefix + key], args=[capacity, rate, now, cost])
+        return bool(allowed), float(tokens)
+
+
+##################################
+# Rate limiter                   #
+##################################
+class RateLimiter:
+    """
+    Token bucket rate limits per ip and per account
+    """
+
+    def __init__(self, store, clock=time.time):
+        self.store = store
+        self.clock = clock
+
+    def retry_after(self, action, ip, account):
+        """
+        takes a token from the buckets of the ip and the account
+        returns 0 if the request is allowed, otherwise the seconds until it is allowed again
+        """
+        ip_limit, account_limit = rate_limits[action]
+        now = self.clock()
+        for key, (capacity, rate) in ((action + ":ip:" + str(ip), ip_limit),
+                                       (action + ":account:" + account.strip().lower(), account_limit)):
+            try:
+                allowed, tokens = self.store.take(key, capacity, rate, now)
+            except redis.RedisError as e:
+                # without the store requests are not limited rather than rejected
+                print("Rate limit not available: " + str(e))
+                return 0
+            if not allowed:
+                return max(1, math.ceil((1 - tokens) / rate))
+        return 0
+
+
+def create_store(storage):
+    if storage == "memory":
+        return MemoryBucketStore()
+    return RedisBucketStore(redis.Redis.from_url(storage, socket_timeout=1))
+
+limiter = RateLimiter(create_store(rate_limit_storage))
+
+def limit_request(action, account):
+    """
+    checks the rate limits of the action for the client of the request (ProxyFix sets the forwarded address) and the account
+    returns the message for the rejected request or None if it is allowed
+    """
+    ip = request.remote_addr if has_request_context() else None
+    seconds = limiter.retry_after(action, ip, account)
+    if seconds:
+        return "Zu viele Anfragen, bitte versuchen Sie es in " + str(seconds) + " Sekunden erneut."
+    return None
@@ -7,10 +7,30 @@ from schema_queries import Query
 from schema_mutations import Mutations
 import Tests.filter_tests as filter
 import Tests.mutations_tests as mutations
+import Tests.batching_tests as batching
+import Tests.pagination_tests as pagination
+import Tests.availability_tests as availability
+import Tests.order_tests as orders
+import Tests.authorization_tests as authorization
+import Tests.leader_election_tests as leader_election
+import Tests.scheduler_tests as scheduler
+import Tests.mail_tests as mail
+import Tests.outbox_tests as outbox
+import Tests.template_tests as templates
+import Tests.password_hashing_tests as password_hashing
+import Tests.rate_limit_tests as rate_limit
+import Tests.file_tests as files
+import Tests.thumbnail_tests as thumbnails
+import Tests.file_gc_tests as file_gc
+import Tests.bootstrap_tests as bootstrap
+import Tests.fork_tests as fork
+import Tests.db_pool_tests as db_pool
 
 from Tests.db_test_setups import testDB_base
 
-from config import engine as test_engine, db as test_db, testing_on
+from config import get_engine, db as test_db, testing_on
+
+test_engine = get_engine()
 
 class Test(unittest.TestCase):
     def setUp(self):
@@ -43,6 +63,96 @@ class Test(unittest.TestCase):
     def test_mutation_create_user(self):
         mutations.test_mutation_create_user(self.client, test_db)
 
+    def test_filter_query_count(self):
+        batching.test_filter_query_count(self.client, test_db)
+
+    def test_filter_eager_loading(self):
+        batching.test_filter_eager_loading(self.client, test_db)
+
+    def test_filter_connection_pagination(self):
+        pagination.test_filter_connection_pagination(self.client, test_db)
+
+    def test_availability(self):
+        availability.test_availability(self.client, test_db)
+
+    def test_availability_calendar(self):
+        availability.test_availability_calendar(self.client, test_db)
+
+    def test_concurrent_order_creation(self):
+        orders.test_concurrent_order_creation(self.client, test_db)
+
+    def test_order_update_availability(self):
+        orders.test_order_update_availability(self.client, test_db)
+
+    def test_authorization_cache(self):
+        authorization.test_authorization_cache(self.client, test_db)
+
+    def test_tag_group_authorization(self):
+        authorization.test_tag_group_authorization(self.client, test_db)
+
+    def test_metrics_authorization(self):
+        authorization.test_metrics_authorization(self.client, test_db)
+
+    def test_leader_election(self):
+        leader_election.test_leader_election(self.client, test_db)
+
+    def test_lease_clock_skew(self):
+        leader_election.test_lease_clock_skew(self.client, test_db)
+
+    def test_reminder_dispatcher(self):
+        scheduler.test_reminder_dispatcher(self.client, test_db)
+
+    def test_status_mails(self):
+        scheduler.test_status_mails(self.client, test_db)
+
+    def test_periodic_jobs(self):
+        scheduler.test_periodic_jobs(self.client, test_db)
+
+    def test_mail_pool(self):
+        mail.test_mail_pool(self.client, test_db)
+
+    def test_mail_outbox(self):
+        outbox.test_mail_outbox(self.client, test_db)
+
+    def test_concurrent_mail_key(self):
+        outbox.test_concurrent_mail_key(self.client, test_db)
+
+    def test_mail_delivery(self):
+        outbox.test_mail_delivery(self.client, test_db)
+
+    def test_template_registry(self):
+        templates.test_template_registry(self.client, test_db)
+
+    def test_password_hashing(self):
+        password_hashing.test_password_hashing(self.client, test_db)
+
+    def test_rehash_busy(self):
+        password_hashing.test_rehash_busy(self.client, test_db)
+
+    def test_rate_limit(self):
+        rate_limit.test_rate_limit(self.client, test_db)
+
+    def test_file_upload(self):
+        files.test_file_upload(self.client, test_db)
+
+    def test_file_deduplication(self):
+        files.test_file_deduplication(self.client, test_db)
+
+    def test_picture_variants(self):
+        thumbnails.test_picture_variants(self.client, test_db)
+
+    def test_file_garbage_collection(self):
+        file_gc.test_file_garbage_collection(self.client, test_db)
+
+    def test_bootstrap(self):
+        bootstrap.test_bootstrap(self.client, test_db)
+
+    def test_after_fork(self):
+        fork.test_after_fork(self.client, test_db)
+
+    def test_pool_metrics(self):
+        db_pool.test_pool_metrics(self.client, test_db)
+
     def tearDown(self):
         # Drop all tables in the database
         Base.metadata.drop_all(test_engine)
@@ -1,81 +1,194 @@
-import os
-
-from config import scheduler, template_directory, timezone
+from apscheduler.jobstores.base import JobLookupError
+from config import db, add_periodic_job, get_scheduler, timezone, reminder_interval
 from datetime import datetime, timedelta
 from schema import *
+from outbox import cancel_mails, enqueue_mail
 from sendMail import sendMail
-from string import Template
+from sqlalchemy import and_, exists, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, selectinload
+from template_registry import template_registry
+
+from models import OrderReminder
+
+# every order has at most one status mail job, its id is "<order_id>:status"
+job_kinds = ("status", )
+
+# reminders are sent when the pickup or return is less than this ahead
+reminder_lead_time = timedelta(days=1)
 
-def AddJob(order_id):
-    order = OrderModel.query.filter(OrderModel.order_id == order_id).first()
-    reminder_pickup(order, order_id)
-    reminder_return(order, order_id)
+dispatcher_job_id = "reminder_dispatcher"
+
+def job_id(order_id, kind):
+    return str(order_id) + ":" + kind
 
 def CancelJob(order_id):
-    for job in scheduler.get_jobs():
-        if job.name == order_id:
-            scheduler.remove_job(job.id)
-
-###################
-# Reminder pickup #
-###################
-def reminder_pickup(order, order_id):
-    schedule_date = order.from_date - timedelta(days=1)
-
-    # Reminder pickup
-    if (datetime.now(timezone) < schedule_date):
-        organization_name = order.physicalobjects[0].physicalobject.organization.name
-        receiver_mail = order.users[0].email
-
-        # read template text
-        with open(os.path.join(template_directory, "reminder_pickup_template.html"), encoding="utf-8") as file:
-            template_pickup = Template(file.read())
-
-        scheduler.add_job(
-                        name=order_id,
-                        func=sendMail, 
-                        args=(receiver_mail, "Ovgu Ausleihsystem Reminder", 
-                                template_pickup.substitute(time=str(schedule_date.time())[:5], organization_name=organization_name)), 
-                        trigger='date', 
-                        run_date=schedule_date)
-
-###################
-# Reminder return #
-###################
-def reminder_return(order, order_id):
-    schedule_date = order.till_date - timedelta(days=1)
-
-    # Reminder pickup
-    if (datetime.now(timezone) < schedule_date):
-        organization_name = order.physicalobjects[0].physicalobject.organization.name
-        receiver_mail = order.users[0].email
-
-        # read template text
-        with open(os.path.join(template_directory, "reminder_return_template.html"), encoding="utf-8") as file:
-            template_return = Template(file.read())
-
-        scheduler.add_job(
-                        name=order_id,
-                        func=sendMail, 
-                        args=(receiver_mail, "Ovgu Ausleihsystem Reminder", 
-                                template_return.substitute(time=str(schedule_date.time())[:5], organization_name=organization_name)), 
-                        trigger='date', 
-                        run_date=schedule_date)
-        
+    """
+    removes all jobs of the order, every job is deleted by its primary key
+    mails of the order which are still in the outbox are removed as well
+    """
+    for kind in job_kinds:
+        remove_job(job_id(order_id, kind))
+    cancel_mails(str(order_id) + ":")
+
+def remove_job(scheduled_id):
+    try:
+        get_scheduler().remove_job(scheduled_id)
+    except JobLookupError:
+        pass
+
+def local_time(value):
+    """
+    dates of orders are stored without timezone, they are local times
+    """
+    if value.tzinfo is None:
+        return timezone.localize(value)
+    return value
+
+def reset_reminders(order_id):
+    """
+    forgets the sent reminders of the order, e.g. after it was moved to another time
+    the deletion is committed together with the order, reminders for the old dates which are still in the outbox are removed
+    """
+    db.query(OrderReminder).filter(OrderReminder.order_id == order_id).delete(synchronize_session=False)
+    for kind in ("pickup", "return"):
+        cancel_mails(str(order_id) + ":" + kind + ":")
+
+
+##################################
+# Reminder dispatcher            #
+##################################
+def schedule_reminder_dispatcher():
+    """
+    adds the periodic job sending the pickup and return reminders, there is only one for all orders
+    """
+    add_periodic_job(dispatcher_job_id, "Reminder dispatcher", dispatch_reminders, minutes=reminder_interval)
+
+def due_reminders_query(now, session=None):
+    """
+    orders which start or end within the lead time and didn't get the reminder for it yet
+    """
+    session = session or db
+    horizon = now + reminder_lead_time
+
+    def not_sent(kind):
+        return ~exists().where(and_(OrderReminder.order_id == OrderModel.order_id, OrderReminder.kind == kind))
+
+    return session.query(OrderModel) \
+        .options(selectinload(OrderModel.users), joinedload(OrderModel.organization)) \
+        .filter(or_(and_(OrderModel.from_date > now, OrderModel.from_date <= horizon, not_sent("pickup")),
+                    and_(OrderModel.till_date > now, OrderModel.till_date <= horizon, not_sent("return"))))
+
+def dispatch_reminders(now=None):
+    """
+    queues all due pickup and return reminders in the outbox, runs every reminder_interval minutes
+    the reminders are recorded in the ledger in the same transaction, so two dispatchers can't send the same reminder twice
+    returns the number of queued reminders
+    """
+    # dates of orders are local times without timezone
+    now = now or datetime.now(timezone).replace(tzinfo=None)
+    horizon = now + reminder_lead_time
+
+    try:
+        orders = due_reminders_query(now).all()
+
+        templates = {kind: template_registry.get("reminder_" + kind + "_template.html") for kind in ("pickup", "return")}
+
+        sent = set((order_id, kind) for order_id, kind in
+                   db.query(OrderReminder.order_id, OrderReminder.kind)
+                   .filter(OrderReminder.order_id.in_([order.order_id for order in orders])).all())
+
+        queued = 0
+        for order in orders:
+            for kind, date in (("pickup", order.from_date), ("return", order.till_date)):
+                if not (now < date <= horizon) or (order.order_id, kind) in sent:
+                    continue
+
+                db.add(OrderReminder(order_id=order.order_id, kind=kind, sent_at=now))
+                # the ledger makes sure that every reminder is queued only once
+                if order.users:
+                    enqueue_mail(order.users[0].email, "Ovgu Ausleihsystem Reminder",
+                                 templates[kind].render(time=date.strftime("%H:%M"), organization_name=order.organization.name),
+                                 key=str(order.order_id) + ":" + kind + ":" + now.isoformat(), deduplicate=False)
+                    queued += 1
+
+        db.commit()
+    except IntegrityError:
+        # another dispatcher recorded the same reminders at the same time
+        db.rollback()
+        return 0
+    finally:
+        db.remove()
+
+    return queued
+
 
 ##################
 # Status change  #
 ##################
 def status_change(order):
+    """
+    queues the status mail of the order in the outbox, it is committed together with the change
+    several changes within a minute only send one mail
+    """
     receiver_mail = order.users[0].email
 
-    # read template text
-    with open(os.path.join(template_directory, "order_status_change_template.html"), encoding="utf-8") as file:
-        template_status = Template(file.read())
+    now = datetime.now(timezone).replace(tzinfo=None)
+    enqueue_mail(receiver_mail, "Ovgu Ausleihsystem Statusänderung", template_registry.render("order_status_change_template.html"),
+                 key=job_id(order.order_id, "status") + ":" + now.strftime("%Y%m%d%H%M"),
+                 send_after=now + timedelta(minutes=1))
+
+
+##################################
+# Migration of old jobs          #
+##################################
+def migrate_jobs(now=None):
+    """
+    migrates the jobs of older versions, has to be run once
+    it is the only place which loads all jobs of the job store
+    - status mails get their "<order_id>:status" id
+    - pickup and return reminders are removed, the dispatcher sends them now
+      reminders which were already sent by these jobs are recorded in the ledger so the dispatcher doesn't repeat them
+    returns the number of migrated jobs
+    """
+    now = now or datetime.now(timezone).replace(tzinfo=None)
+
+    scheduler = get_scheduler()
+    migrated = 0
+    pending_reminders = set()
+    for job in scheduler.get_jobs():
+        if job.func is not sendMail or job.id.endswith(":status"):
+            continue
+
+        order = OrderModel.query.filter(OrderModel.order_id == job.name).first()
+        if not order:
+            continue
+
+        if "Statusänderung" in job.args[1]:
+            scheduler.add_job(
+                            id=job_id(order.order_id, "status"),
+                            name=job.name,
+                            func=job.func,
+                            args=job.args,
+                            trigger=job.trigger,
+                            replace_existing=True)
+        elif job.trigger.run_date == local_time(order.from_date) - reminder_lead_time:
+            pending_reminders.add((order.order_id, "pickup"))
+        else:
+            pending_reminders.add((order.order_id, "return"))
+
+        scheduler.remove_job(job.id)
+        migrated += 1
+
+    # due reminders without a pending job were sent by the old jobs
+    for order in due_reminders_query(now).all():
+        for kind, date in (("pickup", order.from_date), ("return", order.till_date)):
+            if now < date <= now + reminder_lead_time and (order.order_id, kind) not in pending_reminders:
+                db.add(OrderReminder(order_id=order.order_id, kind=kind, sent_at=now))
+    db.commit()
+
+    return migrated
 
-    scheduler.add_job(
-                    name=order.order_id,
-                    func=sendMail, 
-                    args=(receiver_mail, "Ovgu Ausleihsystem Statusänderung", template_status.substitute()), 
-                    trigger='date', 
-                    run_date=datetime.now(timezone) + timedelta(minutes=1))
\ No newline at end of file
+# python -m scheduler migrates the jobs of the job store
+if __name__ == '__main__':
+    print("Migrated jobs: " + str(migrate_jobs()))
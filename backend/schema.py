@@ -1,5 +1,6 @@
+import graphene
 from graphene import relay
-from graphene_sqlalchemy import SQLAlchemyObjectType
+from batching import BatchingObjectType
 
 # Import all models here
 # Like this ...
@@ -23,57 +24,75 @@ from models import (PhysicalObject as PhysicalObjectModel,
 #         model = ContactModel
 #         interfaces = (relay.Node, )
 
-class PhysicalObject(SQLAlchemyObjectType):
+class PhysicalObject(BatchingObjectType):
     class Meta:
         model = PhysicalObjectModel
         interfaces = (relay.Node, )
         description = PhysicalObjectModel.__doc__
 
-class Tag(SQLAlchemyObjectType):
+class Tag(BatchingObjectType):
     class Meta:
         model = TagModel
         interfaces = (relay.Node, )
         description = TagModel.__doc__
 
-class Organization(SQLAlchemyObjectType):
+class Organization(BatchingObjectType):
     class Meta:
         model = OrganizationModel
         interfaces = (relay.Node, )
         description = OrganizationModel.__doc__
 
-class Order(SQLAlchemyObjectType):
+class Order(BatchingObjectType):
     class Meta:
         model = OrderModel
         interfaces = (relay.Node, )
         description = OrderModel.__doc__
 
-class User(SQLAlchemyObjectType):
+class User(BatchingObjectType):
     class Meta:
         model = UserModel
         exclude_fields = ('password_hash', )
         interfaces = (relay.Node, )
         description = UserModel.__doc__
 
-class Group(SQLAlchemyObjectType):
+class Group(BatchingObjectType):
     class Meta:
         model = GroupModel
         interfaces = (relay.Node,)
         description = GroupModel.__doc__
 
-class Organization_User(SQLAlchemyObjectType):
+class Organization_User(BatchingObjectType):
     class Meta:
         model = Organization_UserModel
         interfaces = (relay.Node,)
         description = Organization_UserModel.__doc__
 
-class File(SQLAlchemyObjectType):
+class File(BatchingObjectType):
     class Meta:
         model = FileModel
         interfaces = (relay.Node,)
         description = FileModel.__doc__
 
-class PhysicalObject_Order(SQLAlchemyObjectType):
+class PhysicalObject_Order(BatchingObjectType):
     class Meta:
         model = PhysicalObject_OrderModel
         interfaces = (relay.Node,)
-        description = PhysicalObject_OrderModel.__doc__
\ No newline at end of file
+        description = PhysicalObject_OrderModel.__doc__
+
+class PhysicalObjectOccupancy(graphene.ObjectType):
+    """
+    occupancy of a physical object for every day of an availability calendar
+    """
+    phys_id     = graphene.String()
+    name        = graphene.String()
+    occupancy   = graphene.String(description="One character per day of the calendar, 1 = occupied, 0 = available")
+
+class AvailabilityCalendar(graphene.ObjectType):
+    """
+    occupancy of all physical objects of an organization in a date window
+    """
+    organization_id     = graphene.String()
+    start_date          = graphene.Date()
+    end_date            = graphene.Date()
+    days                = graphene.Int()
+    physical_objects    = graphene.List(PhysicalObjectOccupancy)
@@ -1,11 +1,431 @@
 import graphene
-import os
 from typing import Union, List
 
-from config import template_directory
+from availability import occupancy_calendar
+from eager_loading import connection_load_options, load_options
 from models import orderStatus
+from pagination import paginate
 from schema import *
 from sqlalchemy import func
+from template_registry import template_registry
+
+# Filter arguments, shared by the list and the connection fields
+tags_filter_arguments = dict(
+    #uuid params
+    tag_id              = graphene.Argument(type=graphene.String, required=False),
+    #string params
+    name                = graphene.Argument(type=graphene.String, required=False),
+    #list params for the relationships
+    physicalobjects     = graphene.Argument(type=graphene.List(graphene.String), required=False),
+)
+
+physical_objects_filter_arguments = dict(
+    #uuid params
+    phys_id             = graphene.Argument(type=graphene.String, required=False),
+    inv_num_internal    = graphene.Argument(type=graphene.Int, required=False),
+    inv_num_external    = graphene.Argument(type=graphene.Int, required=False),
+    deposit             = graphene.Argument(type=graphene.Int, required=False, description="Deposit has to be == to this value"),
+    max_deposit         = graphene.Argument(type=graphene.Int, required=False, description="Deposit has to be <= to this value"),
+    #string params
+    storage_location    = graphene.Argument(type=graphene.String, required=False),
+    faults              = graphene.Argument(type=graphene.String, required=False),
+    name                = graphene.Argument(type=graphene.String, required=False),
+    obj_description     = graphene.Argument(type=graphene.String, required=False),
+    #list params for the relationships
+    pictures            = graphene.Argument(type=graphene.List(graphene.String), required=False),
+    tags                = graphene.Argument(type=graphene.List(graphene.String), required=False),
+    orders              = graphene.Argument(type=graphene.List(graphene.String), required=False),
+    groups              = graphene.Argument(type=graphene.List(graphene.String), required=False),
+    organizations       = graphene.Argument(type=graphene.List(graphene.String), required=False),
+)
+
+orders_filter_arguments = dict(
+    #uuid params
+    order_id            = graphene.Argument(type=graphene.String, required=False),
+    #date params
+    from_date           = graphene.Argument(type=graphene.DateTime, required=False),
+    till_date           = graphene.Argument(type=graphene.DateTime, required=False),
+    return_date         = graphene.Argument(type=graphene.DateTime, required=False, description="return_date has to be before this date"),
+    creation_date       = graphene.Argument(type=graphene.DateTime, required=False),
+
+    from_day            = graphene.Argument(type=graphene.Date, required=False),
+    till_day            = graphene.Argument(type=graphene.Date, required=False),
+    return_day          = graphene.Argument(type=graphene.Date, required=False),
+    creation_day        = graphene.Argument(type=graphene.Date, required=False),
+    # float params
+    deposit             = graphene.Argument(type=graphene.Float, required=False),
+    #list params for the relationships
+    order_status        = graphene.Argument(type=graphene.List(graphene.String), required=False),
+    physicalobjects     = graphene.Argument(type=graphene.List(graphene.String), required=False),
+    users               = graphene.Argument(type=graphene.List(graphene.String), required=False),
+    organizations       = graphene.Argument(type=graphene.List(graphene.String), required=False),
+)
+
+users_filter_arguments = dict(
+    #uuid params
+    user_id             = graphene.Argument(type=graphene.String, required=False),
+    #string params
+    first_name          = graphene.Argument(type=graphene.String, required=False),
+    last_name           = graphene.Argument(type=graphene.String, required=False),
+    email               = graphene.Argument(type=graphene.String, required=False),
+    #additional User information
+    country             = graphene.Argument(type=graphene.String, required=False),
+    postcode            = graphene.Argument(type=graphene.Int,    required=False),
+    city                = graphene.Argument(type=graphene.String, required=False),
+    street              = graphene.Argument(type=graphene.String, required=False),
+    house_number        = graphene.Argument(type=graphene.Int,    required=False),
+
+    phone_number        = graphene.Argument(type=graphene.Int,    required=False),
+    matricle_number     = graphene.Argument(type=graphene.Int,    required=False),
+    #list params for the relationships
+    orders              = graphene.Argument(type=graphene.List(graphene.String), required=False),
+    organizations       = graphene.Argument(type=graphene.List(graphene.String), required=False),
+)
+
+groups_filter_arguments = dict(
+    #uuid params
+    group_id            = graphene.Argument(type=graphene.String, required=False),
+    #string params
+    name                = graphene.Argument(type=graphene.String, required=False),
+    #list params for the relationships
+    physicalobjects     = graphene.Argument(type=graphene.List(graphene.String), required=False),
+    pictures            = graphene.Argument(type=graphene.List(graphene.String), required=False),
+    organizations       = graphene.Argument(type=graphene.List(graphene.String), required=False),
+)
+
+organizations_filter_arguments = dict(
+    #uuid params
+    organization_id     = graphene.Argument(type=graphene.String, required=False),
+    #string params
+    name                = graphene.Argument(type=graphene.String, required=False),
+    location            = graphene.Argument(type=graphene.String, required=False),
+    #list params for the relationships
+    agb                 = graphene.Argument(type=graphene.List(graphene.String), required=False),
+    users               = graphene.Argument(type=graphene.List(graphene.String), required=False),
+    physicalobjects     = graphene.Argument(type=graphene.List(graphene.String), required=False),
+)
+
+files_filter_arguments = dict(
+    #uuid params
+    file_id             = graphene.Argument(type=graphene.String, required=False),
+    # list params for the relationships
+    physicalobjects    = graphene.Argument(type=graphene.List(graphene.String), required=False),
+    groups             = graphene.Argument(type=graphene.List(graphene.String), required=False),
+    organizations      = graphene.Argument(type=graphene.List(graphene.String), required=False),
+)
+
+physical_object_order_filter_arguments = dict(
+    #uuid params
+    order_id            = graphene.Argument(type=graphene.String, required=False),
+    phys_id             = graphene.Argument(type=graphene.String, required=False),
+    order_status        = graphene.Argument(type=graphene.String, required=False),
+    return_notes        = graphene.Argument(type=graphene.String, required=False),
+    return_date         = graphene.Argument(type=graphene.DateTime, required=False),
+)
+
+# Filters, shared by the list and the connection resolvers
+def filter_tags_query(
+    query,
+    # uuid params
+    tag_id: Union[str, None] = None,
+    # string params
+    name: Union[str, None] = None,
+    # list params for the relationships
+    physicalobjects: Union[List[str], None] = None,
+):
+    """
+    applies the filter arguments of filter_tags to the given query
+    """
+    if tag_id:
+        query = query.filter(TagModel.tag_id == tag_id)
+    if name:
+        query = query.filter(TagModel.name == name)
+    # list params for the relationships .any() returns union (OR Statement)
+    if physicalobjects:
+        query = query.filter(TagModel.physicalobjects.any(PhysicalObjectModel.phys_id.in_(physicalobjects)))
+
+    return query
+
+
+def filter_physical_objects_query(
+    query,
+    # uuid params
+    phys_id: Union[str, None] = None,
+    inv_num_internal: Union[int, None] = None,
+    inv_num_external: Union[int, None] = None,
+    deposit: Union[int, None] = None,
+    max_deposit: Union[int, None] = None,
+    # string params
+    storage_location: Union[str, None] = None,
+    faults: Union[str, None] = None,
+    name: Union[str, None] = None,
+    obj_description: Union[str, None] = None,
+    return_notes: Union[str, None] = None,
+    # list params for the relationships
+    pictures: Union[List[str], None] = None,
+    tags: Union[List[str], None] = None,
+    orders: Union[List[str], None] = None,
+    groups: Union[List[str], None] = None,
+    organizations: Union[List[str], None] = None,
+):
+    """
+    applies the filter arguments of filter_physical_objects to the given query
+    """
+    if phys_id:
+        query = query.filter(PhysicalObjectModel.phys_id == phys_id)
+    if inv_num_internal:
+        query = query.filter(PhysicalObjectModel.inv_num_internal == inv_num_internal)
+    if inv_num_external:
+        query = query.filter(PhysicalObjectModel.inv_num_external == inv_num_external)
+    if deposit:
+        query = query.filter(PhysicalObjectModel.deposit == deposit)
+    if max_deposit:
+        query = query.filter(PhysicalObjectModel.deposit <= max_deposit)
+    if storage_location:
+        query = query.filter(PhysicalObjectModel.storage_location == storage_location)
+    if faults:
+        query = query.filter(PhysicalObjectModel.faults == faults)
+    if name:
+        query = query.filter(PhysicalObjectModel.name.like(f"%{name}%"))
+    if obj_description:
+        query = query.filter(PhysicalObjectModel.description == obj_description)
+    # list params for the relationships .any() returns union (OR Statement)
+    if pictures:
+        query = query.filter(PhysicalObjectModel.pictures.any(FileModel.file_id.in_(pictures)))
+    if tags:
+        query = query.filter(PhysicalObjectModel.tags.any(TagModel.tag_id.in_(tags)))
+    if orders:
+        query = query.filter(PhysicalObjectModel.orders.any(PhysicalObject_OrderModel.order_id.in_(orders)))
+    if groups:
+        query = query.filter(PhysicalObjectModel.groups.any(GroupModel.group_id.in_(groups)))
+    if organizations:
+        query = query.filter(PhysicalObjectModel.organization.has(OrganizationModel.organization_id.in_(organizations)))
+
+    return query
+
+
+def filter_orders_query(
+    query,
+    # uuid params
+    order_id: Union[str, None] = None,
+    # date params
+    from_date: Union[str, None] = None,
+    till_date: Union[str, None] = None,
+    return_date: Union[str, None] = None,
+    creation_date: Union[str, None] = None,
+
+    from_day: Union[str, None] = None,
+    till_day: Union[str, None] = None,
+    return_day: Union[str, None] = None,
+    creation_day: Union[str, None] = None,
+    # int params
+    deposit: Union[float, None] = None,
+    # list params for the relationships
+    order_status: Union[List[str], None] = None,
+    physicalobjects: Union[List[str], None] = None,
+    users: Union[List[str], None] = None,
+    organizations: Union[List[str], None] = None,
+):
+    """
+    applies the filter arguments of filter_orders to the given query
+    """
+    if order_id:
+        query = query.filter(OrderModel.order_id == order_id)
+
+    # date params
+    if from_date:
+        query = query.filter(OrderModel.from_date == from_date)
+    if till_date:
+        query = query.filter(OrderModel.till_date == till_date)
+    if return_date:
+        query = query.filter(OrderModel.physicalobjects.any(PhysicalObject_OrderModel.return_date <= return_date))
+    if creation_date:
+        query = query.filter(OrderModel.creation_time == creation_date)
+    
+    if from_day:
+        query = query.filter(func.date(OrderModel.from_date) == from_day)
+
+    if till_day:
+        query = query.filter(func.date(OrderModel.till_date) == till_day)
+
+    if return_day:
+        query = query.filter(func.date(OrderModel.physicalobjects.any(PhysicalObject_OrderModel.return_date)) == return_day)
+
+    if creation_day:
+        query = query.filter(func.date(OrderModel.creation_time) == creation_day)
+
+    if deposit:
+        query = query.filter(OrderModel.deposit == deposit)
+    # list params for the relationships .any() returns union (OR Statement)
+    if order_status:
+        orderStatus_ = []
+        for os in order_status:
+            orderStatus_.append(orderStatus[os.lower()])
+        query = query.filter(OrderModel.physicalobjects.any(PhysicalObject_OrderModel.order_status.in_(orderStatus_)))
+    if physicalobjects:
+        query = query.filter(OrderModel.physicalobjects.any(PhysicalObject_OrderModel.phys_id.in_(physicalobjects)))
+    if users:
+        query = query.filter(OrderModel.users.any(UserModel.user_id.in_(users)))
+    if organizations:
+        query = query.filter(OrderModel.organization.has(OrganizationModel.organization_id.in_(organizations)))
+
+    return query
+
+
+def filter_users_query(
+    query,
+    # uuid params
+    user_id: Union[str, None] = None,
+    # string params
+    first_name: Union[str, None] = None,
+    last_name: Union[str, None] = None,
+    email: Union[str, None] = None,
+    #additional User information
+    country: Union[str, None] = None,
+    postcode: Union[int, None] = None,
+    city: Union[str, None] = None,
+    street: Union[str, None] = None,
+    house_number: Union[int, None] = None,
+    phone_number: Union[int, None] = None,
+    matricle_number: Union[int, None] = None,
+    # list params for the relationships
+    orders: Union[List[str], None] = None,
+    organizations: Union[List[str], None] = None,
+):
+    """
+    applies the filter arguments of filter_users to the given query
+    """
+    if user_id:
+        query = query.filter(UserModel.user_id == user_id)
+    if first_name:
+        query = query.filter(UserModel.first_name == first_name)
+    if last_name:
+        query = query.filter(UserModel.last_name == last_name)
+    if email:
+        query = query.filter(UserModel.email == email)
+    if country:
+        query = query.filter(UserModel.address.country == country)
+    if postcode:
+        query = query.filter(UserModel.address.postcode == postcode)
+    if city:
+        query = query.filter(UserModel.address.city == city)
+    if street:
+        query = query.filter(UserModel.address.street == street)
+    if house_number:
+        query = query.filter(UserModel.address.house_number == house_number)
+    if phone_number:
+        query = query.filter(UserModel.phone_number == phone_number)
+    if matricle_number:
+        query = query.filter(UserModel.matricle_number == matricle_number)
+    # list params for the relationships .any() returns union (OR Statement)
+    if orders:
+        query = query.filter(UserModel.orders.any(OrderModel.order_id.in_(orders)))
+    if organizations:
+        query = query.filter(UserModel.organizations.any(Organization_UserModel.organization_id.in_(organizations)))
+
+    return query
+
+
+def filter_groups_query(
+    query,
+    # uuid params
+    group_id: Union[str, None] = None,
+    # string params
+    name: Union[str, None] = None,
+    # list params for the relationships
+    physicalobjects: Union[List[str], None] = None,
+    pictures: Union[List[str], None] = None,
+    organizations: Union[List[str], None] = None,
+):
+    """
+    applies the filter arguments of filter_groups to the given query
+    """
+    if group_id:
+        query = query.filter(GroupModel.group_id == group_id)
+    if name:
+        query = query.filter(GroupModel.name == name)
+    # list params for the relationships .any() returns union (OR Statement)
+    if physicalobjects:
+        query = query.filter(GroupModel.physicalobjects.any(PhysicalObjectModel.phys_id.in_(physicalobjects)))
+    if pictures:
+        query = query.filter(GroupModel.pictures.any(FileModel.file_id.in_(pictures)))
+    if organizations:
+        query = query.filter(GroupModel.organization.has(OrganizationModel.organization_id.in_(organizations)))
+
+    return query
+
+
+def filter_organizations_query(
+    query,
+    # uuid params
+    organization_id: Union[str, None] = None,
+    # string params
+    name: Union[str, None] = None,
+    location: Union[str, None] = None,
+    # list params for the relationships
+    agb: Union[List[str], None] = None,
+    users: Union[List[str], None] = None,
+    physicalobjects: Union[List[str], None] = None,
+):
+    """
+    applies the filter arguments of filter_organizations to the given query
+    """
+    if organization_id:
+        query = query.filter(OrganizationModel.organization_id == organization_id)
+    if name:
+        query = query.filter(OrganizationModel.name == name)
+    if location:
+        query = query.filter(OrganizationModel.location == location)
+    # list params for the relationships .any() returns union (OR Statement)
+    if agb:
+        query = query.filter(OrganizationModel.agb.any(FileModel.file_id.in_(agb)))
+    if users:
+        query = query.filter(OrganizationModel.users.any(Organization_UserModel.user_id.in_(users)))
+    if physicalobjects:
+        query = query.filter(OrganizationModel.physicalobjects.any(PhysicalObjectModel.phys_id.in_(physicalobjects)))
+
+    return query
+
+
+def filter_files_query(
+    query,
+    # uuid params
+    file_id: Union[str, None] = None,
+):
+    """
+    applies the filter arguments of filter_files to the given query
+    """
+    if file_id:
+        query = query.filter(FileModel.file_id == file_id)
+
+    return query
+
+
+def filter_physical_object_order_query(
+    query,
+    # uuid params
+    order_id: Union[str, None] = None,
+    phys_id: Union[str, None] = None,
+    order_status: Union[str, None] = None,
+    return_notes: Union[str, None] = None,
+    return_date: Union[str, None] = None,
+):
+    """
+    applies the filter arguments of filter_physical_object_order to the given query
+    """
+    if order_id:
+        query = query.filter(PhysicalObject_OrderModel.order_id == order_id)
+    if phys_id:
+        query = query.filter(PhysicalObject_OrderModel.phys_id == phys_id)
+    if order_status:
+        query = query.filter(PhysicalObject_OrderModel.order_status == orderStatus[order_status.lower()])
+    if return_notes or return_notes == "":
+        query = query.filter(PhysicalObject_OrderModel.return_notes.like(f"%{return_notes}%"), PhysicalObject_OrderModel.return_notes != None)
+    if return_date:
+        query = query.filter(PhysicalObject_OrderModel.return_date == return_date)
+
+    return query
+
 
 # Api Queries go here
 class Query(graphene.ObjectType):
@@ -14,138 +434,125 @@ class Query(graphene.ObjectType):
     filter_tags = graphene.List(
         #return type
         Tag,
-        #uuid params
-        tag_id              = graphene.Argument(type=graphene.String, required=False),
-        #string params
-        name                = graphene.Argument(type=graphene.String, required=False),
-        #list params for the relationships
-        physicalobjects     = graphene.Argument(type=graphene.List(graphene.String), required=False),
         description         = "Returns all tags with the given parameters, List arguments get OR-ed together",
+        **tags_filter_arguments,
+    )
+
+    filter_tags_connection = relay.ConnectionField(
+        #return type
+        Tag.connection,
+        description         = "Returns one page of all tags with the given parameters, List arguments get OR-ed together. Paginated with first/after or last/before",
+        **tags_filter_arguments,
     )
 
     filter_physical_objects = graphene.List(
         #return type
         PhysicalObject,
-        #uuid params
-        phys_id             = graphene.Argument(type=graphene.String, required=False),
-        inv_num_internal    = graphene.Argument(type=graphene.Int, required=False),
-        inv_num_external    = graphene.Argument(type=graphene.Int, required=False),
-        deposit             = graphene.Argument(type=graphene.Int, required=False, description="Deposit has to be == to this value"),
-        max_deposit         = graphene.Argument(type=graphene.Int, required=False, description="Deposit has to be <= to this value"),
-        #string params
-        storage_location    = graphene.Argument(type=graphene.String, required=False),
-        faults              = graphene.Argument(type=graphene.String, required=False),
-        name                = graphene.Argument(type=graphene.String, required=False),
-        obj_description     = graphene.Argument(type=graphene.String, required=False),
-        #list params for the relationships
-        pictures            = graphene.Argument(type=graphene.List(graphene.String), required=False),
-        tags                = graphene.Argument(type=graphene.List(graphene.String), required=False),
-        orders              = graphene.Argument(type=graphene.List(graphene.String), required=False),
-        groups              = graphene.Argument(type=graphene.List(graphene.String), required=False),
-        organizations       = graphene.Argument(type=graphene.List(graphene.String), required=False),
         description         = "Returns all physical objects with the given parameters, List arguments get OR-ed together",
+        **physical_objects_filter_arguments,
+    )
+
+    filter_physical_objects_connection = relay.ConnectionField(
+        #return type
+        PhysicalObject.connection,
+        description         = "Returns one page of all physical objects with the given parameters, List arguments get OR-ed together. Paginated with first/after or last/before",
+        **physical_objects_filter_arguments,
     )
 
     filter_orders = graphene.List(
         #return type
         Order,
-        #uuid params
-        order_id            = graphene.Argument(type=graphene.String, required=False),
-        #date params
-        from_date           = graphene.Argument(type=graphene.DateTime, required=False),
-        till_date           = graphene.Argument(type=graphene.DateTime, required=False),
-        return_date         = graphene.Argument(type=graphene.DateTime, required=False, description="return_date has to be before this date"),
-        creation_date       = graphene.Argument(type=graphene.DateTime, required=False),
-
-        from_day            = graphene.Argument(type=graphene.Date, required=False),
-        till_day            = graphene.Argument(type=graphene.Date, required=False),
-        return_day          = graphene.Argument(type=graphene.Date, required=False),
-        creation_day        = graphene.Argument(type=graphene.Date, required=False),
-        # float params
-        deposit             = graphene.Argument(type=graphene.Float, required=False),
-        #list params for the relationships
-        order_status        = graphene.Argument(type=graphene.List(graphene.String), required=False),
-        physicalobjects     = graphene.Argument(type=graphene.List(graphene.String), required=False),
-        users               = graphene.Argument(type=graphene.List(graphene.String), required=False),
-        organizations       = graphene.Argument(type=graphene.List(graphene.String), required=False),
         description         = "Returns all orders with the given parameters, List arguments get OR-ed together",
+        **orders_filter_arguments,
+    )
+
+    filter_orders_connection = relay.ConnectionField(
+        #return type
+        Order.connection,
+        description         = "Returns one page of all orders with the given parameters, List arguments get OR-ed together. Paginated with first/after or last/before",
+        **orders_filter_arguments,
     )
 
     filter_users = graphene.List(
         #return type
         User,
-        #uuid params
-        user_id             = graphene.Argument(type=graphene.String, required=False),
-        #string params
-        first_name          = graphene.Argument(type=graphene.String, required=False),
-        last_name           = graphene.Argument(type=graphene.String, required=False),
-        email               = graphene.Argument(type=graphene.String, required=False),
-        #additional User information
-        country             = graphene.Argument(type=graphene.String, required=False),
-        postcode            = graphene.Argument(type=graphene.Int,    required=False),
-        city                = graphene.Argument(type=graphene.String, required=False),
-        street              = graphene.Argument(type=graphene.String, required=False),
-        house_number        = graphene.Argument(type=graphene.Int,    required=False),
-
-        phone_number        = graphene.Argument(type=graphene.Int,    required=False),
-        matricle_number     = graphene.Argument(type=graphene.Int,    required=False),
-        #list params for the relationships
-        orders              = graphene.Argument(type=graphene.List(graphene.String), required=False),
-        organizations       = graphene.Argument(type=graphene.List(graphene.String), required=False),
         description         = "Returns all users with the given parameters, List arguments get OR-ed together",
+        **users_filter_arguments,
+    )
+
+    filter_users_connection = relay.ConnectionField(
+        #return type
+        User.connection,
+        description         = "Returns one page of all users with the given parameters, List arguments get OR-ed together. Paginated with first/after or last/before",
+        **users_filter_arguments,
     )
 
     filter_groups = graphene.List(
         #return type
         Group,
-        #uuid params
-        group_id            = graphene.Argument(type=graphene.String, required=False),
-        #string params
-        name                = graphene.Argument(type=graphene.String, required=False),
-        #list params for the relationships
-        physicalobjects     = graphene.Argument(type=graphene.List(graphene.String), required=False),
-        pictures            = graphene.Argument(type=graphene.List(graphene.String), required=False),
-        organizations       = graphene.Argument(type=graphene.List(graphene.String), required=False),
         description         = "Returns all groups with the given parameters, List arguments get OR-ed together",
-    )  
+        **groups_filter_arguments,
+    )
+
+    filter_groups_connection = relay.ConnectionField(
+        #return type
+        Group.connection,
+        description         = "Returns one page of all groups with the given parameters, List arguments get OR-ed together. Paginated with first/after or last/before",
+        **groups_filter_arguments,
+    )
 
     filter_organizations = graphene.List(
         #return type
         Organization,
-        #uuid params
-        organization_id     = graphene.Argument(type=graphene.String, required=False),
-        #string params
-        name                = graphene.Argument(type=graphene.String, required=False),
-        location            = graphene.Argument(type=graphene.String, required=False),
-        #list params for the relationships
-        agb                 = graphene.Argument(type=graphene.List(graphene.String), required=False),
-        users               = graphene.Argument(type=graphene.List(graphene.String), required=False),
-        physicalobjects     = graphene.Argument(type=graphene.List(graphene.String), required=False),
         description         = "Returns all organizations with the given parameters, List arguments get OR-ed together",
+        **organizations_filter_arguments,
+    )
+
+    filter_organizations_connection = relay.ConnectionField(
+        #return type
+        Organization.connection,
+        description         = "Returns one page of all organizations with the given parameters, List arguments get OR-ed together. Paginated with first/after or last/before",
+        **organizations_filter_arguments,
     )
 
     filter_files = graphene.List(
         #return type
         File,
-        #uuid params
-        file_id             = graphene.Argument(type=graphene.String, required=False),
-        # list params for the relationships
-        physicalobjects    = graphene.Argument(type=graphene.List(graphene.String), required=False),
-        groups             = graphene.Argument(type=graphene.List(graphene.String), required=False),
-        organizations      = graphene.Argument(type=graphene.List(graphene.String), required=False),
         description         = "Returns all files with the given parameters, List arguments get OR-ed together",
+        **files_filter_arguments,
+    )
+
+    filter_files_connection = relay.ConnectionField(
+        #return type
+        File.connection,
+        description         = "Returns one page of all files with the given parameters, List arguments get OR-ed together. Paginated with first/after or last/before",
+        **files_filter_arguments,
     )
 
     filter_physical_object_order = graphene.List(
         #return type
         PhysicalObject_Order,
-        #uuid params
-        order_id            = graphene.Argument(type=graphene.String, required=False),
-        phys_id             = graphene.Argument(type=graphene.String, required=False),
-        order_status        = graphene.Argument(type=graphene.String, required=False),
-        return_notes        = graphene.Argument(type=graphene.String, required=False),
-        return_date         = graphene.Argument(type=graphene.DateTime, required=False),
         description         = "Returns all physical object orders with the given parameters, List arguments get OR-ed together",
+        **physical_object_order_filter_arguments,
+    )
+
+    filter_physical_object_order_connection = relay.ConnectionField(
+        #return type
+        PhysicalObject_Order.connection,
+        description         = "Returns one page of all physical object orders with the given parameters, List arguments get OR-ed together. Paginated with first/after or last/before",
+        **physical_object_order_filter_arguments,
+    )
+
+    availability_calendar = graphene.Field(
+        #return type
+        AvailabilityCalendar,
+        organization_id     = graphene.Argument(type=graphene.String, required=True),
+        start_date          = graphene.Argument(type=graphene.Date, required=True),
+        end_date            = graphene.Argument(type=graphene.Date, required=True),
+        #list params for the relationships
+        tags                = graphene.Argument(type=graphene.List(graphene.String), required=False),
+        groups              = graphene.Argument(type=graphene.List(graphene.String), required=False),
+        description         = "Returns the daily occupancy of all physical objects of the organization between start_date and end_date, List arguments get OR-ed together",
     )
 
     get_imprint = graphene.String(
@@ -161,336 +568,123 @@ class Query(graphene.ObjectType):
     )
 
     @staticmethod
-    def resolve_filter_tags(
-        args,
-        info,
-        # uuid params
-        tag_id: Union[str, None] = None,
-        # string params
-        name: Union[str, None] = None,
-        # list params for the relationships
-        physicalobjects: Union[List[str], None] = None,
-    ):
-        query = Tag.get_query(info=info)
-
-        if tag_id:
-            query = query.filter(TagModel.tag_id == tag_id)
-        if name:
-            query = query.filter(TagModel.name == name)
-        # list params for the relationships .any() returns union (OR Statement)
-        if physicalobjects:
-            query = query.filter(TagModel.physicalobjects.any(PhysicalObjectModel.phys_id.in_(physicalobjects)))
-        
-        tags = query.all()
-        return tags
+    def resolve_filter_tags(args, info, **filters):
+        query = Tag.get_query(info=info).options(*load_options(info, TagModel))
+        return filter_tags_query(query, **filters).all()
 
     @staticmethod
-    def resolve_filter_physical_objects(
-        args,
-        info,
-        # uuid params
-        phys_id: Union[str, None] = None,
-        inv_num_internal: Union[int, None] = None,
-        inv_num_external: Union[int, None] = None,
-        deposit: Union[int, None] = None,
-        max_deposit: Union[int, None] = None,
-        # string params
-        storage_location: Union[str, None] = None,
-        faults: Union[str, None] = None,
-        name: Union[str, None] = None,
-        obj_description: Union[str, None] = None,
-        return_notes: Union[str, None] = None,
-        # list params for the relationships
-        pictures: Union[List[str], None] = None,
-        tags: Union[List[str], None] = None,
-        orders: Union[List[str], None] = None,
-        groups: Union[List[str], None] = None,
-        organizations: Union[List[str], None] = None,
-    ):
-        query = PhysicalObject.get_query(info=info)
-
-        if phys_id:
-            query = query.filter(PhysicalObjectModel.phys_id == phys_id)
-        if inv_num_internal:
-            query = query.filter(PhysicalObjectModel.inv_num_internal == inv_num_internal)
-        if inv_num_external:
-            query = query.filter(PhysicalObjectModel.inv_num_external == inv_num_external)
-        if deposit:
-            query = query.filter(PhysicalObjectModel.deposit == deposit)
-        if max_deposit:
-            query = query.filter(PhysicalObjectModel.deposit <= max_deposit)
-        if storage_location:
-            query = query.filter(PhysicalObjectModel.storage_location == storage_location)
-        if faults:
-            query = query.filter(PhysicalObjectModel.faults == faults)
-        if name:
-            query = query.filter(PhysicalObjectModel.name.like(f"%{name}%"))
-        if obj_description:
-            query = query.filter(PhysicalObjectModel.description == obj_description)
-        # list params for the relationships .any() returns union (OR Statement)
-        if pictures:
-            query = query.filter(PhysicalObjectModel.pictures.any(FileModel.file_id.in_(pictures)))
-        if tags:
-            query = query.filter(PhysicalObjectModel.tags.any(TagModel.tag_id.in_(tags)))
-        if orders:
-            query = query.filter(PhysicalObjectModel.orders.any(PhysicalObject_OrderModel.order_id.in_(orders)))
-        if groups:
-            query = query.filter(PhysicalObjectModel.groups.any(GroupModel.group_id.in_(groups)))
-        if organizations:
-            query = query.filter(PhysicalObjectModel.organization.has(OrganizationModel.organization_id.in_(organizations)))
-        
-        physical_objects = query.all()
-        return physical_objects
-    
+    def resolve_filter_tags_connection(args, info, first=None, after=None, last=None, before=None, **filters):
+        query = Tag.get_query(info=info).options(*connection_load_options(info, TagModel))
+        return paginate(filter_tags_query(query, **filters), TagModel, Tag.connection, first, after, last, before)
+
     @staticmethod
-    def resolve_filter_orders(
-        args,
-        info,
-        # uuid params
-        order_id: Union[str, None] = None,
-        # date params
-        from_date: Union[str, None] = None,
-        till_date: Union[str, None] = None,
-        return_date: Union[str, None] = None,
-        creation_date: Union[str, None] = None,
-
-        from_day: Union[str, None] = None,
-        till_day: Union[str, None] = None,
-        return_day: Union[str, None] = None,
-        creation_day: Union[str, None] = None,
-        # int params
-        deposit: Union[float, None] = None,
-        # list params for the relationships
-        order_status: Union[List[str], None] = None,
-        physicalobjects: Union[List[str], None] = None,
-        users: Union[List[str], None] = None,
-        organizations: Union[List[str], None] = None,
-    ):
-        query = Order.get_query(info=info)
-
-        if order_id:
-            query = query.filter(OrderModel.order_id == order_id)
-
-        # date params
-        if from_date:
-            query = query.filter(OrderModel.from_date == from_date)
-        if till_date:
-            query = query.filter(OrderModel.till_date == till_date)
-        if return_date:
-            query = query.filter(OrderModel.physicalobjects.any(PhysicalObject_OrderModel.return_date <= return_date))
-        if creation_date:
-            query = query.filter(OrderModel.creation_time == creation_date)
-        
-        if from_day:
-            query = query.filter(func.date(OrderModel.from_date) == from_day)
-
-        if till_day:
-            query = query.filter(func.date(OrderModel.till_date) == till_day)
-
-        if return_day:
-            query = query.filter(func.date(OrderModel.physicalobjects.any(PhysicalObject_OrderModel.return_date)) == return_day)
-
-        if creation_day:
-            query = query.filter(func.date(OrderModel.creation_time) == creation_day)
-
-        if deposit:
-            query = query.filter(OrderModel.deposit == deposit)
-        # list params for the relationships .any() returns union (OR Statement)
-        if order_status:
-            orderStatus_ = []
-            for os in order_status:
-                orderStatus_.append(orderStatus[os.lower()])
-            query = query.filter(OrderModel.physicalobjects.any(PhysicalObject_OrderModel.order_status.in_(orderStatus_)))
-        if physicalobjects:
-            query = query.filter(OrderModel.physicalobjects.any(PhysicalObject_OrderModel.phys_id.in_(physicalobjects)))
-        if users:
-            query = query.filter(OrderModel.users.any(UserModel.user_id.in_(users)))
-        if organizations:
-            query = query.filter(OrderModel.organization.has(OrganizationModel.organization_id.in_(organizations)))
-        
-        orders = query.all()
-        return orders
-    
+    def resolve_filter_physical_objects(args, info, **filters):
+        query = PhysicalObject.get_query(info=info).options(*load_options(info, PhysicalObjectModel))
+        return filter_physical_objects_query(query, **filters).all()
+
     @staticmethod
-    def resolve_filter_users(
-        args,
-        info,
-        # uuid params
-        user_id: Union[str, None] = None,
-        # string params
-        first_name: Union[str, None] = None,
-        last_name: Union[str, None] = None,
-        email: Union[str, None] = None,
-        #additional User information
-        country: Union[str, None] = None,
-        postcode: Union[int, None] = None,
-        city: Union[str, None] = None,
-        street: Union[str, None] = None,
-        house_number: Union[int, None] = None,
-        phone_number: Union[int, None] = None,
-        matricle_number: Union[int, None] = None,
-        # list params for the relationships
-        orders: Union[List[str], None] = None,
-        organizations: Union[List[str], None] = None,
-    ):
-        query = User.get_query(info=info)
-
-        if user_id:
-            query = query.filter(UserModel.user_id == user_id)
-        if first_name:
-            query = query.filter(UserModel.first_name == first_name)
-        if last_name:
-            query = query.filter(UserModel.last_name == last_name)
-        if email:
-            query = query.filter(UserModel.email == email)
-        if country:
-            query = query.filter(UserModel.address.country == country)
-        if postcode:
-            query = query.filter(UserModel.address.postcode == postcode)
-        if city:
-            query = query.filter(UserModel.address.city == city)
-        if street:
-            query = query.filter(UserModel.address.street == street)
-        if house_number:
-            query = query.filter(UserModel.address.house_number == house_number)
-        if phone_number:
-            query = query.filter(UserModel.phone_number == phone_number)
-        if matricle_number:
-            query = query.filter(UserModel.matricle_number == matricle_number)
-        # list params for the relationships .any() returns union (OR Statement)
-        if orders:
-            query = query.filter(UserModel.orders.any(OrderModel.order_id.in_(orders)))
-        if organizations:
-            query = query.filter(UserModel.organizations.any(Organization_UserModel.organization_id.in_(organizations)))
-        
-        users = query.all()
-        return users
-    
+    def resolve_filter_physical_objects_connection(args, info, first=None, after=None, last=None, before=None, **filters):
+        query = PhysicalObject.get_query(info=info).options(*connection_load_options(info, PhysicalObjectModel))
+        return paginate(filter_physical_objects_query(query, **filters), PhysicalObjectModel, PhysicalObject.connection, first, after, last, before)
+
     @staticmethod
-    def resolve_filter_groups(
-        args,
-        info,
-        # uuid params
-        group_id: Union[str, None] = None,
-        # string params
-        name: Union[str, None] = None,
-        # list params for the relationships
-        physicalobjects: Union[List[str], None] = None,
-        pictures: Union[List[str], None] = None,
-        organizations: Union[List[str], None] = None,
-    ):
-        query = Group.get_query(info=info)
-
-        if group_id:
-            query = query.filter(GroupModel.group_id == group_id)
-        if name:
-            query = query.filter(GroupModel.name == name)
-        # list params for the relationships .any() returns union (OR Statement)
-        if physicalobjects:
-            query = query.filter(GroupModel.physicalobjects.any(PhysicalObjectModel.phys_id.in_(physicalobjects)))
-        if pictures:
-            query = query.filter(GroupModel.pictures.any(FileModel.file_id.in_(pictures)))
-        if organizations:
-            query = query.filter(GroupModel.organization.has(OrganizationModel.organization_id.in_(organizations)))
-
-        groups = query.all()
-        return groups
-    
+    def resolve_filter_orders(args, info, **filters):
+        query = Order.get_query(info=info).options(*load_options(info, OrderModel))
+        return filter_orders_query(query, **filters).all()
+
     @staticmethod
-    def resolve_filter_organizations(
-        args,
-        info,
-        # uuid params
-        organization_id: Union[str, None] = None,
-        # string params
-        name: Union[str, None] = None,
-        location: Union[str, None] = None,
-        # list params for the relationships
-        agb: Union[List[str], None] = None,
-        users: Union[List[str], None] = None,
-        physicalobjects: Union[List[str], None] = None,
-    ):
-        query = Organization.get_query(info=info)
-
-        if organization_id:
-            query = query.filter(OrganizationModel.organization_id == organization_id)
-        if name:
-            query = query.filter(OrganizationModel.name == name)
-        if location:
-            query = query.filter(OrganizationModel.location == location)
-        # list params for the relationships .any() returns union (OR Statement)
-        if agb:
-            query = query.filter(OrganizationModel.agb.any(FileModel.file_id.in_(agb)))
-        if users:
-            query = query.filter(OrganizationModel.users.any(Organization_UserModel.user_id.in_(users)))
-        if physicalobjects:
-            query = query.filter(OrganizationModel.physicalobjects.any(PhysicalObjectModel.phys_id.in_(physicalobjects)))
-        
-        organizations = query.all()
-        return organizations
-    
+    def resolve_filter_orders_connection(args, info, first=None, after=None, last=None, before=None, **filters):
+        query = Order.get_query(info=info).options(*connection_load_options(info, OrderModel))
+        return paginate(filter_orders_query(query, **filters), OrderModel, Order.connection, first, after, last, before)
+
     @staticmethod
-    def resolve_filter_files(
-        args,
-        info,
-        # uuid params
-        file_id: Union[str, None] = None,
-    ):
-        query = File.get_query(info=info)
+    def resolve_filter_users(args, info, **filters):
+        query = User.get_query(info=info).options(*load_options(info, UserModel))
+        return filter_users_query(query, **filters).all()
 
-        if file_id:
-            query = query.filter(FileModel.file_id == file_id)
-        
-        files = query.all()
-        return files
+    @staticmethod
+    def resolve_filter_users_connection(args, info, first=None, after=None, last=None, before=None, **filters):
+        query = User.get_query(info=info).options(*connection_load_options(info, UserModel))
+        return paginate(filter_users_query(query, **filters), UserModel, User.connection, first, after, last, before)
+
+    @staticmethod
+    def resolve_filter_groups(args, info, **filters):
+        query = Group.get_query(info=info).options(*load_options(info, GroupModel))
+        return filter_groups_query(query, **filters).all()
+
+    @staticmethod
+    def resolve_filter_groups_connection(args, info, first=None, after=None, last=None, before=None, **filters):
+        query = Group.get_query(info=info).options(*connection_load_options(info, GroupModel))
+        return paginate(filter_groups_query(query, **filters), GroupModel, Group.connection, first, after, last, before)
+
+    @staticmethod
+    def resolve_filter_organizations(args, info, **filters):
+        query = Organization.get_query(info=info).options(*load_options(info, OrganizationModel))
+        return filter_organizations_query(query, **filters).all()
+
+    @staticmethod
+    def resolve_filter_organizations_connection(args, info, first=None, after=None, last=None, before=None, **filters):
+        query = Organization.get_query(info=info).options(*connection_load_options(info, OrganizationModel))
+        return paginate(filter_organizations_query(query, **filters), OrganizationModel, Organization.connection, first, after, last, before)
 
     @staticmethod
-    def resolve_filter_physical_object_order(
+    def resolve_filter_files(args, info, **filters):
+        query = File.get_query(info=info).options(*load_options(info, FileModel))
+        return filter_files_query(query, **filters).all()
+
+    @staticmethod
+    def resolve_filter_files_connection(args, info, first=None, after=None, last=None, before=None, **filters):
+        query = File.get_query(info=info).options(*connection_load_options(info, FileModel))
+        return paginate(filter_files_query(query, **filters), FileModel, File.connection, first, after, last, before)
+
+    @staticmethod
+    def resolve_filter_physical_object_order(args, info, **filters):
+        query = PhysicalObject_Order.get_query(info=info).options(*load_options(info, PhysicalObject_OrderModel))
+        return filter_physical_object_order_query(query, **filters).all()
+
+    @staticmethod
+    def resolve_filter_physical_object_order_connection(args, info, first=None, after=None, last=None, before=None, **filters):
+        query = PhysicalObject_Order.get_query(info=info).options(*connection_load_options(info, PhysicalObject_OrderModel))
+        return paginate(filter_physical_object_order_query(query, **filters), PhysicalObject_OrderModel, PhysicalObject_Order.connection, first, after, last, before)
+
+    @staticmethod
+    def resolve_availability_calendar(
         args,
         info,
-        # uuid params
-        order_id: Union[str, None] = None,
-        phys_id: Union[str, None] = None,
-        order_status: Union[str, None] = None,
-        return_notes: Union[str, None] = None,
-        return_date: Union[str, None] = None,
+        organization_id: str,
+        start_date,
+        end_date,
+        # list params for the relationships
+        tags: Union[List[str], None] = None,
+        groups: Union[List[str], None] = None,
     ):
-        query = PhysicalObject_Order.get_query(info=info)
-
-        if order_id:
-            query = query.filter(PhysicalObject_OrderModel.order_id == order_id)
-        if phys_id:
-            query = query.filter(PhysicalObject_OrderModel.phys_id == phys_id)
-        if order_status:
-            query = query.filter(PhysicalObject_OrderModel.order_status == orderStatus[order_status.lower()])
-        if return_notes or return_notes == "":
-            query = query.filter(PhysicalObject_OrderModel.return_notes.like(f"%{return_notes}%"), PhysicalObject_OrderModel.return_notes != None)
-        if return_date:
-            query = query.filter(PhysicalObject_OrderModel.return_date == return_date)
-        
-        physical_object_orders = query.all()
-        return physical_object_orders    
+        physical_objects = occupancy_calendar(organization_id, start_date, end_date, tags=tags, groups=groups)
+
+        return AvailabilityCalendar(
+            organization_id=organization_id,
+            start_date=start_date,
+            end_date=end_date,
+            days=(end_date - start_date).days + 1,
+            physical_objects=[PhysicalObjectOccupancy(phys_id=phys_id, name=name, occupancy=occupancy) for phys_id, name, occupancy in physical_objects],
+        )
 
     @staticmethod
     def resolve_get_imprint(
         args,
         info,
     ):
-        with open(os.path.join(template_directory, "imprint.html"), encoding="utf-8") as file:
-            return file.read()
+        return template_registry.text("imprint.html")
         
     @staticmethod
     def resolve_get_privacy_policy(
         args,
         info,
     ):
-        with open(os.path.join(template_directory, "privacy_policy.html"), encoding="utf-8") as file:
-            return file.read()
+        return template_registry.text("privacy_policy.html")
         
     @staticmethod
     def resolve_get_contact_information(
         args,
         info,
     ):
-        with open(os.path.join(template_directory, "contact_information.html"), encoding="utf-8") as file:
-            return file.read()
\ No newline at end of file
+        return template_registry.text("contact_information.html")
\ No newline at end of file
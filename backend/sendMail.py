@@ -1,41 +1,151 @@
-import pytz
-
-from config import use_ssl, mail_server_address, mail_server_port, sender_email_address, sender_email_password, scheduler, timezone
+from config import db, use_ssl, mail_server_address, mail_server_port, mail_pool_size, sender_email_address, sender_email_password
 import smtplib, ssl
+import threading
+import time
+from contextlib import contextmanager
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from datetime import datetime, timedelta
 
-def sendMail(receiver, subject, body):
+##################################
+# Pool of smtp connections       #
+##################################
+def connect_mail_server(address=None, port=None, context=None):
+    """
+    opens a new connection to the mail server and logs in
+    """
+    address = address or mail_server_address
+    port = port or mail_server_port
+    if context is None and (int)(use_ssl):
+        context = ssl.create_default_context()
+
+    mail_server = smtplib.SMTP_SSL(address, port, context=context)
+    mail_server.login(sender_email_address, sender_email_password)
+    return mail_server
+
+
+class SMTPPool:
+    """
+    Thread safe pool of logged in connections to the mail server.
+    A connection is reused for many messages, after check_after seconds without use it is checked with NOOP
+    and after max_idle seconds it is replaced, because mail servers close idle sessions.
+    Connections which fail while sending are thrown away.
+    """
+
+    def __init__(self, connect=connect_mail_server, size=4, check_after=30, max_idle=300):
+        self.connect = connect
+        self.check_after = check_after
+        self.max_idle = max_idle
+        self.slots = threading.BoundedSemaphore(size)
+        self.lock = threading.Lock()
+        # (connection, time of the last use), the most recently used connection is at the end
+        self.idle = []
+
+    @contextmanager
+    def connection(self):
+        """
+        yields a logged in connection, at most size connections are used at the same time
+        """
+        with self.slots:
+            mail_server = self.acquire()
+            try:
+                yield mail_server
+            except BaseException:
+                close(mail_server)
+                raise
+            with self.lock:
+                self.idle.append((mail_server, time.monotonic()))
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                if not self.idle:
+                    break
+                mail_server, last_used = self.idle.pop()
+
+            idle_time = time.monotonic() - last_used
+            if idle_time > self.max_idle:
+                close(mail_server)
+            elif idle_time <= self.check_after or is_alive(mail_server):
+                return mail_server
+            else:
+                close(mail_server)
+
+        return self.connect()
+
+    def close(self):
+        """
+        closes all idle connections
+        """
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for mail_server, _ in idle:
+            close(mail_server)
+
+
+def is_alive(mail_server):
+    try:
+        return mail_server.noop()[0] == 250
+    except (smtplib.SMTPException, OSError):
+        return False
+
+def close(mail_server):
     try:
-        # create Mail Server
-        if (int)(use_ssl):
-            context = ssl.create_default_context()
-            mail_server = smtplib.SMTP_SSL(mail_server_address, mail_server_port, context=context)
-        else:
-            mail_server = smtplib.SMTP_SSL(mail_server_address, mail_server_port)
-
-        mail_server.login(sender_email_address, sender_email_password)
-
-        message = MIMEMultipart("alternative")
-        message["Subject"] = subject
-        message["From"] = sender_email_address
-        message["To"] = receiver
-
-        # HTML hier möglich
-        body_text = MIMEText(body, "HTML")
-        message.attach(body_text)
-
-        mail_server.sendmail(sender_email_address, receiver, message.as_string())
-    except Exception as e:
-        print("Was not able to send mail: " + str(e))
-
-        # Resend the mail again in 5 Minutes
-        # Attention: this schedule will not be cancelled using the CancelJob function from the scheduler file
-        scheduler.add_job(
-            name="sendMail retry",
-            func=sendMail,
-            args=(receiver, subject + " RETRY", body),
-            trigger='date',
-            run_date=datetime.now(timezone) + timedelta(minutes=5)
-        )
\ No newline at end of file
+        mail_server.quit()
+    except (smtplib.SMTPException, OSError):
+        mail_server.close()
+
+
+mail_pool = SMTPPool(size=mail_pool_size)
+
+##################################
+# Sending mails                  #
+##################################
+def sendMail(receiver, subject, body):
+    """
+    queues the mail in the outbox, it is sent by the outbox dispatcher
+    (jobs stored by older versions still call this function)
+    """
+    # imported here, because the outbox sends its mails with this module
+    from outbox import enqueue_mail
+
+    enqueue_mail(receiver, subject, body)
+    db.commit()
+
+def send_mails(mails):
+    """
+    sends a list of (receiver, subject, body) over one pooled connection
+    if the connection breaks it is replaced once
+    returns the error for every mail, None if it was sent
+    """
+    errors = [None] * len(mails)
+    position = 0
+    for attempt in range(2):
+        try:
+            with mail_pool.connection() as mail_server:
+                while position < len(mails):
+                    receiver, subject, body = mails[position]
+                    try:
+                        mail_server.sendmail(sender_email_address, receiver, build_message(receiver, subject, body))
+                    except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                        # the message was rejected, the connection is still fine
+                        errors[position] = e
+                    position += 1
+            return errors
+        except Exception as e:
+            print("Was not able to send mail: " + str(e))
+            error = e
+
+    for index in range(position, len(mails)):
+        errors[index] = error
+    return errors
+
+def build_message(receiver, subject, body):
+    message = MIMEMultipart("alternative")
+    message["Subject"] = subject
+    message["From"] = sender_email_address
+    message["To"] = receiver
+
+    # HTML hier möglich
+    body_text = MIMEText(body, "HTML")
+    message.attach(body_text)
+    return message.as_string()
@@ -0,0 +1,89 @@
+import hashlib
+import os
+import threading
+from datetime import datetime, timezone
+from string import Template
+
+from flask import Response, request
+
+from config import template_directory
+
+# static pages which are served by /legal/<page>
+legal_pages = {
+    "imprint": "imprint.html",
+    "privacy_policy": "privacy_policy.html",
+    "contact_information": "contact_information.html",
+}
+
+class CachedTemplate:
+    """
+    Text of a template file together with its compiled template and the validators for http caching
+    """
+
+    def __init__(self, text, mtime_ns, size):
+        self.text = text
+        # the templates use $placeholders, which are documented in the template files
+        self.template = Template(text)
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.etag = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        self.last_modified = datetime.fromtimestamp(mtime_ns / 1e9, timezone.utc).replace(microsecond=0)
+
+    def render(self, **values):
+        return self.template.substitute(**values)
+
+
+class TemplateRegistry:
+    """
+    Thread safe cache of the templates in template_directory.
+    Every template is read and compiled once, a template whose file changed
+    (modification time or size) is read again on its next use.
+    """
+
+    def __init__(self, directory=template_directory):
+        self.directory = directory
+        self.templates = {}
+        self.lock = threading.Lock()
+
+    def get(self, name):
+        path = os.path.join(self.directory, name)
+        stat = os.stat(path)
+
+        cached = self.templates.get(name)
+        if cached and cached.mtime_ns == stat.st_mtime_ns and cached.size == stat.st_size:
+            return cached
+
+        with open(path, encoding="utf-8") as file:
+            cached = CachedTemplate(file.read(), stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            self.templates[name] = cached
+        return cached
+
+    def render(self, name, /, **values):
+        # name is positional only, so templates can have a $name placeholder
+        return self.get(name).render(**values)
+
+    def text(self, name):
+        return self.get(name).text
+
+    def clear(self):
+        with self.lock:
+            self.templates = {}
+
+
+template_registry = TemplateRegistry()
+
+def legal_page_response(page):
+    """
+    serves a static page from memory, unchanged pages are answered with 304 Not Modified
+    """
+    if page not in legal_pages:
+        return Response("Seite nicht gefunden.", status=404)
+
+    cached = template_registry.get(legal_pages[page])
+    response = Response(cached.text, mimetype="text/html")
+    response.set_etag(cached.etag)
+    response.last_modified = cached.last_modified
+    # browsers have to ask again, but unchanged pages are not transferred
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
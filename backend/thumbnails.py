@@ -0,0 +1,173 @@
+import base64
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from config import db, add_periodic_job, image_workers, thumbnail_interval
+from models import File
+import file_storage
+
+# variant -> longest edge in pixels
+variant_sizes = {
+    "thumbnail": 320,
+    "preview": 960,
+}
+placeholder_size = 16
+
+# larger pictures are not decoded, a picture of 60 megapixels already needs about 180 MB as RGB
+max_pixels = 60 * 1000 * 1000
+
+# pictures processed per run, one per process at a time
+batch_size = 20
+
+job_id = "thumbnail_job"
+
+##################################
+# Image processing               #
+##################################
+def render_variants(source_path, directory, stem):
+    """
+    creates the webp and jpeg variants and the placeholder of a picture, runs in a separate process
+    returns the file names of the variants and the placeholder as data uri
+    """
+    with Image.open(source_path) as image:
+        # the size is known before the picture is decoded
+        if image.width * image.height > max_pixels:
+            raise Image.DecompressionBombError("Picture has " + str(image.width * image.height) + " pixels")
+        # photos of phones are often rotated by exif
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGB")
+
+        result = {}
+        for variant, size in variant_sizes.items():
+            scaled = image.copy()
+            scaled.thumbnail((size, size), Image.LANCZOS)
+            for extension, options in (("webp", {"quality": 80, "method": 4}), ("jpg", {"quality": 82, "progressive": True, "optimize": True})):
+                name = stem + "_" + str(size) + "." + extension
+                save_atomic(scaled, os.path.join(directory, name), options)
+                result[variant + ("_jpeg" if extension == "jpg" else "")] = name
+
+        tiny = image.copy()
+        tiny.thumbnail((placeholder_size, placeholder_size))
+        buffer = io.BytesIO()
+        tiny.save(buffer, format="JPEG", quality=50)
+        result["placeholder"] = "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+    return result
+
+def save_atomic(image, path, options):
+    temp_path = path + ".tmp"
+    image.save(temp_path, format="WEBP" if path.endswith(".webp") else "JPEG", **options)
+    os.replace(temp_path, path)
+
+
+##################################
+# Background job                 #
+##################################
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    """
+    the processes are started with the first picture, so they belong to the process running the job
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # forked processes start without importing the backend modules again
+            _executor = ProcessPoolExecutor(max_workers=image_workers, mp_context=multiprocessing.get_context("fork"))
+        return _executor
+
+def reset_executor(broken):
+    """
+    replaces the pool after one of its processes died (e.g. killed because of its memory), a broken pool doesn't accept pictures anymore
+    """
+    global _executor
+    with _executor_lock:
+        # pools passed by the caller are not replaced
+        if _executor is not broken:
+            return
+        _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+def schedule_thumbnail_job():
+    """
+    adds the periodic job which creates the variants of new pictures
+    """
+    add_periodic_job(job_id, "Picture variants", process_pending_pictures, seconds=thumbnail_interval)
+
+def variant_values(result):
+    return {
+        File.thumbnail_path: result["thumbnail"],
+        File.thumbnail_jpeg_path: result["thumbnail_jpeg"],
+        File.preview_path: result["preview"],
+        File.preview_jpeg_path: result["preview_jpeg"],
+        File.placeholder: result["placeholder"],
+    }
+
+# the next run continues after the last picture of this run, so pictures which can't be read yet don't block the others
+_next_path = ""
+
+def process_pending_pictures(limit=batch_size, executor=None):
+    """
+    creates the variants of pictures which don't have them yet, all files with the same content get the same variants
+    pictures which can't be decoded (svg, broken files, too many pixels) use the original picture as variant
+    pictures which can't be read (e.g. missing on this host) are tried again later
+    returns the number of processed pictures
+    """
+    global _next_path
+    executor = executor or get_executor()
+    directory = file_storage.picture_directory
+    try:
+        paths = [path for path, in db.query(File.path)
+                 .filter(File.file_type == File.FileType.picture, File.thumbnail_path == None, File.path > _next_path)
+                 .distinct().order_by(File.path).limit(limit).all()]
+        _next_path = paths[-1] if len(paths) == limit else ""
+        if not paths:
+            return 0
+
+        # contents uploaded again already have their variants
+        done = {file.path: file for file in db.query(File)
+                .filter(File.path.in_(paths), File.thumbnail_path != None).all()}
+
+        futures = {}
+        results = {}
+        broken = False
+        for path in paths:
+            if path in done:
+                file = done[path]
+                results[path] = {"thumbnail": file.thumbnail_path, "thumbnail_jpeg": file.thumbnail_jpeg_path,
+                                 "preview": file.preview_path, "preview_jpeg": file.preview_jpeg_path, "placeholder": file.placeholder}
+            elif not broken:
+                try:
+                    futures[path] = executor.submit(render_variants, os.path.join(directory, path), directory, os.path.splitext(path)[0])
+                except BrokenProcessPool:
+                    broken = True
+
+        for path, future in futures.items():
+            try:
+                results[path] = future.result()
+            except (UnidentifiedImageError, Image.DecompressionBombError) as e:
+                print("No variants for " + path + ": " + str(e))
+                results[path] = {"thumbnail": path, "thumbnail_jpeg": path, "preview": path, "preview_jpeg": path, "placeholder": ""}
+            except BrokenProcessPool:
+                broken = True
+            except OSError as e:
+                print("Picture " + path + " can't be read, it is tried again later: " + str(e))
+
+        if broken:
+            # the pictures of the broken pool stay pending for the next run
+            print("A process creating picture variants died, the pool is replaced")
+            reset_executor(executor)
+
+        for path, result in results.items():
+            db.query(File).filter(File.path == path, File.thumbnail_path == None) \
+                .update(variant_values(result), synchronize_session=False)
+        db.commit()
+        return len(results)
+    finally:
+        db.remove()
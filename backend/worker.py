@@ -0,0 +1,43 @@
+import signal
+import threading
+
+from config import get_scheduler, scheduler_poll_interval
+from outbox import schedule_outbox_dispatcher
+from scheduler import schedule_reminder_dispatcher
+from thumbnails import schedule_thumbnail_job
+from file_gc import schedule_file_gc
+
+##################################
+# Scheduler worker               #
+##################################
+def run():
+    """
+    executes the jobs of the job store until the process gets terminated
+    the web app only adds jobs (scheduler_mode=worker), so this has to run exactly once per deployment
+    """
+    stopped = threading.Event()
+
+    def stop(signum, frame):
+        stopped.set()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    scheduler = get_scheduler()
+    schedule_reminder_dispatcher()
+    schedule_outbox_dispatcher()
+    schedule_thumbnail_job()
+    schedule_file_gc()
+    scheduler.resume()
+    print("Scheduler worker started")
+
+    # the scheduler only knows the jobs it added itself,
+    # jobs added by the web app are picked up by looking into the job store regularly
+    while not stopped.wait(scheduler_poll_interval):
+        scheduler.wakeup()
+
+    scheduler.shutdown()
+    print("Scheduler worker stopped")
+
+if __name__ == '__main__':
+    run()